@@ -0,0 +1,714 @@
+# -*- coding: utf-8 -*-
+"""
+Rendering backends for protograf
+
+Notes:
+    * All protograf shapes draw onto a "canvas" that supports the ReportLab
+      Canvas API (paths, text, images, graphics state and pages); a backend
+      supplies that canvas.
+    * The 'reportlab' backend (the default) is a ReportLab Canvas, extended
+      with tiling patterns (see ReportLabCanvas).
+    * The 'pymupdf' backend is a PyMuPDFCanvas; this implements the part of
+      the Canvas API that protograf uses, and draws directly into a PyMuPDF
+      (fitz) document; pages can also be rasterized in-process.
+"""
+# lib
+import io
+import logging
+import math
+# third party
+import pymupdf
+from PIL import Image as PILImage, ImageChops
+from reportlab.graphics import renderPDF
+from reportlab.lib.colors import black, toColor
+from reportlab.lib.rl_accel import fp_str
+from reportlab.pdfbase import pdfdoc, pdfmetrics
+from reportlab.pdfgen import canvas as reportlab_canvas
+from reportlab.pdfgen.pathobject import PDFPathObject
+from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+# local
+from protograf.utils import fonts
+from protograf.utils.support import feedback
+
+log = logging.getLogger(__name__)
+DEBUG = False
+BACKENDS = ('reportlab', 'pymupdf')
+FILL_EVEN_ODD = 0
+# PDF "base 14" fonts, as named by ReportLab -> PyMuPDF
+BASE14_FONTS = {
+    'Helvetica': 'helv',
+    'Helvetica-Bold': 'hebo',
+    'Helvetica-Oblique': 'heit',
+    'Helvetica-BoldOblique': 'hebi',
+    'Times-Roman': 'tiro',
+    'Times-Bold': 'tibo',
+    'Times-Italic': 'tiit',
+    'Times-BoldItalic': 'tibi',
+    'Courier': 'cour',
+    'Courier-Bold': 'cobo',
+    'Courier-Oblique': 'coit',
+    'Courier-BoldOblique': 'cobi',
+    'Symbol': 'symb',
+    'ZapfDingbats': 'zadb',
+}
+
+
+def get_canvas(backend: str = 'reportlab', filename: str = None, pagesize: tuple = None):
+    """Create a canvas for the named backend."""
+    _backend = str(backend or 'reportlab').lower()
+    if _backend == 'reportlab':
+        return ReportLabCanvas(filename=filename, pagesize=pagesize)
+    if _backend in ['pymupdf', 'fitz']:
+        return PyMuPDFCanvas(filename=filename, pagesize=pagesize)
+    feedback(
+        f'Unable to use the backend "{backend}" - it must be one of:'
+        f' {", ".join(BACKENDS)}', True)
+
+
+def get_document(cnv):
+    """Return a canvas's pages as an open pymupdf document; no file is written.
+
+    Note:
+        * the 'pymupdf' backend already holds its document in memory; for
+          the 'reportlab' backend the PDF is created as bytes, in memory
+    """
+    if isinstance(cnv, PyMuPDFCanvas):
+        return cnv.finish()
+    return pymupdf.open(stream=cnv.getpdfdata(), filetype='pdf')
+
+
+def pattern_path() -> PDFPathObject:
+    """Return an empty path, for drawing the cell of a tiling pattern."""
+    return PDFPathObject()
+
+
+def pattern_code(cnv, cell: PDFPathObject, stroke: int = 1, fill: int = 0) -> str:
+    """PDF code to paint a pattern cell, using a canvas's current line and colors."""
+    ops = []
+    if fill:
+        ops.append('%s rg' % fp_str(*toColor(cnv._fillColorObj).rgb()))
+    if stroke:
+        ops.append('%s RG' % fp_str(*toColor(cnv._strokeColorObj).rgb()))
+        ops.append('%s w %d J %d j' % (fp_str(cnv._lineWidth), cnv._lineCap, cnv._lineJoin))
+        array, phase = cnv._dash
+        if array:
+            ops.append('[%s] %s d' % (fp_str(*array), fp_str(phase)))
+    ops.append(cell.getCode())
+    ops.append('B' if stroke and fill else 'S' if stroke else 'f')
+    return ' '.join(ops)
+
+
+def pattern_matrix(ctm: tuple, origin: tuple) -> tuple:
+    """Matrix mapping pattern space - with its origin at a point in user space
+    transformed by `ctm` - to the default page space.
+
+    Doc Test:
+
+    >>> pattern_matrix((1, 0, 0, 1, 10, 20), (5, 5))
+    (1, 0, 0, 1, 15, 25)
+    """
+    a, b, c, d, e, f = ctm
+    x, y = origin
+    return (a, b, c, d, x * a + y * c + e, x * b + y * d + f)
+
+
+def pattern_dictionary(cell_width: float, cell_height: float, matrix: tuple) -> dict:
+    """Entries of the dictionary of a (colored) tiling pattern."""
+    return {
+        'Type': '/Pattern',
+        'PatternType': 1,  # tiling
+        'PaintType': 1,  # colored
+        'TilingType': 1,  # constant spacing
+        'BBox': [0, 0, cell_width, cell_height],
+        'XStep': cell_width,
+        'YStep': cell_height,
+        'Matrix': list(matrix),
+    }
+
+
+def canvas_alphas(cnv) -> tuple:
+    """Current (stroke, fill) alpha of a canvas."""
+    if isinstance(cnv, PyMuPDFCanvas):
+        return cnv._stroke_alpha, cnv._fill_alpha
+    return cnv._extgstate.getValue('CA'), cnv._extgstate.getValue('ca')
+
+
+def draw_paragraph(cnv, para, x: float, y: float):
+    """Draw a wrapped ReportLab Paragraph onto a canvas, with its bottom at x,y."""
+    if isinstance(cnv, PyMuPDFCanvas):
+        cnv.drawParagraph(para, x, y)
+    else:
+        para.drawOn(cnv, x, y)
+
+
+def draw_drawing(cnv, drawing, x: float, y: float):
+    """Draw a ReportLab Drawing (e.g. a converted SVG) onto a canvas at x,y."""
+    if isinstance(cnv, PyMuPDFCanvas):
+        cnv.drawDrawing(drawing, x, y)
+    else:
+        renderPDF.draw(drawing, cnv, x=x, y=y)
+
+
+class ReportLabCanvas(reportlab_canvas.Canvas):
+    """ReportLab Canvas, extended with tiling pattern fills.
+
+    Notes:
+        * each distinct pattern is added, once, to the document; a page's
+          resources then refer to the patterns used on it
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._patterns = {}  # key: (name, reference)
+        self._patternsUsed = {}  # name: reference; for the current page
+
+    @property
+    def _dash(self) -> tuple:
+        """Current dash array and phase (kept with the graphics state)."""
+        return self._lineDash or ([], 0)
+
+    def setDash(self, array=[], phase=0):
+        super().setDash(array, phase)
+        if isinstance(array, (int, float)):
+            array, phase = [array, phase], 0
+        self._lineDash = (list(array), phase)
+
+    def fillPattern(self, cell, cell_width, cell_height, x, y, width, height,
+                    origin=(0, 0), stroke=1, fill=0):
+        """Fill a rectangle with a tiling pattern, made from a path in one cell.
+
+        The cell is painted using the current line and color settings; the
+        origin (bottom-left) of a cell is at `origin`, in user space.
+        """
+        code = pattern_code(self, cell, stroke, fill)
+        matrix = pattern_matrix(self._currentMatrix, origin)
+        key = (code, cell_width, cell_height, matrix)
+        if key not in self._patterns:
+            entries = pattern_dictionary(cell_width, cell_height, matrix)
+            entries['Type'] = pdfdoc.PDFName('Pattern')
+            for name in ['BBox', 'Matrix']:
+                entries[name] = pdfdoc.PDFArray(entries[name])
+            entries['Resources'] = pdfdoc.PDFDictionary({})
+            stream = pdfdoc.PDFStream(pdfdoc.PDFDictionary(entries), code)
+            name = f'P{len(self._patterns)}'
+            self._patterns[key] = (name, self._doc.Reference(stream))
+        name, reference = self._patterns[key]
+        self._patternsUsed[name] = reference
+        self.saveState()
+        self.setFillAlpha(1)  # pattern is painted as the fill "color"
+        self._code.append(f'/Pattern cs /{name} scn {fp_str(x, y, width, height)} re f')
+        self.restoreState()
+
+    def showPage(self):
+        """Close the current page; and add any patterns to its resources."""
+        patterns, self._patternsUsed = self._patternsUsed, {}
+        super().showPage()
+        if patterns:
+            page = self._doc.Pages.pages[-1]
+            page.check_format(self._doc)  # creates the page's (usual) Resources
+            page.Resources.Pattern = patterns
+
+
+class PyMuPDFPath(PDFPathObject):
+    """Path that records its operations, rather than PDF code.
+
+    Curved and compound parts - arc, ellipse, circle, roundRect etc. - are
+    inherited from ReportLab, so they create identical Bezier curves.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.ops = []
+
+    def moveTo(self, x, y):
+        self.ops.append(('m', x, y))
+
+    def lineTo(self, x, y):
+        self.ops.append(('l', x, y))
+
+    def curveTo(self, x1, y1, x2, y2, x3, y3):
+        self.ops.append(('c', x1, y1, x2, y2, x3, y3))
+
+    def rect(self, x, y, width, height):
+        self.moveTo(x, y)
+        self.lineTo(x + width, y)
+        self.lineTo(x + width, y + height)
+        self.lineTo(x, y + height)
+        self.close()
+
+    def close(self):
+        self.ops.append(('h',))
+
+
+class PyMuPDFCanvas():
+    """Canvas drawing directly into a PyMuPDF document.
+
+    Notes:
+        * co-ordinates are the same as for ReportLab i.e. points, with the
+          origin at the bottom-left of the page; a transformation matrix
+          tracks translate, rotate and scale operations
+        * drawing and text operations are grouped into a PyMuPDF Shape, which
+          is committed to the page at the end of the page, or before an image
+          is added, so that the drawing order is kept
+    """
+
+    def __init__(self, filename=None, pagesize=None, **kwargs):
+        self._filename = filename
+        self._pagesize = pagesize or (595.2755905511812, 841.8897637795277)  # A4
+        self.document = pymupdf.open()
+        self._page = None
+        self._shape = None
+        self._pending = False  # any operations since the last showPage?
+        self._stack = []
+        self._fonts = {}  # ReportLab font name -> (PyMuPDF name, font file)
+        self._patterns = {}  # key: (name, xref)
+        self.reset()
+
+    # ---- state
+
+    def reset(self):
+        """Reset graphics state (as for a new page)."""
+        self._ctm = pymupdf.Matrix(1, 0, 0, 1, 0, 0)
+        self._fillColorObj = black
+        self._strokeColorObj = black
+        self._fill_alpha = 1
+        self._stroke_alpha = 1
+        self._lineWidth = 1
+        self._lineCap = 0
+        self._lineJoin = 0
+        self._dash = ([], 0)
+        self._fontname = 'Helvetica'
+        self._fontsize = 12
+        self._leading = 14.4
+
+    def saveState(self):
+        self._stack.append((
+            self._ctm, self._fillColorObj, self._strokeColorObj,
+            self._fill_alpha, self._stroke_alpha, self._lineWidth, self._lineCap,
+            self._lineJoin, self._dash, self._fontname, self._fontsize, self._leading))
+
+    def restoreState(self):
+        (self._ctm, self._fillColorObj, self._strokeColorObj,
+         self._fill_alpha, self._stroke_alpha, self._lineWidth, self._lineCap,
+         self._lineJoin, self._dash, self._fontname, self._fontsize,
+         self._leading) = self._stack.pop()
+
+    def translate(self, dx, dy):
+        self._ctm = pymupdf.Matrix(1, 0, 0, 1, dx, dy) * self._ctm
+
+    def rotate(self, theta):
+        angle = math.radians(theta)
+        cos, sin = math.cos(angle), math.sin(angle)
+        self._ctm = pymupdf.Matrix(cos, sin, -sin, cos, 0, 0) * self._ctm
+
+    def scale(self, x, y):
+        self._ctm = pymupdf.Matrix(x, 0, 0, y, 0, 0) * self._ctm
+
+    def setFillColor(self, aColor, alpha=None):
+        self._fillColorObj = toColor(aColor)
+        self._fill_alpha = alpha if alpha is not None \
+            else getattr(self._fillColorObj, 'alpha', 1)
+        self._pending = True
+
+    def setStrokeColor(self, aColor, alpha=None):
+        self._strokeColorObj = toColor(aColor)
+        self._stroke_alpha = alpha if alpha is not None \
+            else getattr(self._strokeColorObj, 'alpha', 1)
+        self._pending = True
+
+    def setFillAlpha(self, alpha):
+        self._fill_alpha = alpha
+
+    def setStrokeAlpha(self, alpha):
+        self._stroke_alpha = alpha
+
+    def setLineWidth(self, width):
+        self._lineWidth = width
+
+    def setLineCap(self, mode):
+        self._lineCap = mode
+
+    def setLineJoin(self, mode):
+        self._lineJoin = mode
+
+    def setDash(self, array=[], phase=0):
+        if isinstance(array, (int, float)):
+            array, phase = [array, phase], 0
+        self._dash = (list(array), phase)
+
+    def setFont(self, psfontname, size, leading=None):
+        pdfmetrics.getFont(psfontname)  # raise KeyError if not registered
+        self._fontname = psfontname
+        self._fontsize = size
+        self._leading = leading if leading is not None else size * 1.2
+        self._pending = True
+
+    # ---- pages
+
+    def setPageSize(self, size):
+        self._pagesize = size
+
+    def get_page(self):
+        """Return the current page; create it if needed."""
+        if self._page is None:
+            self._page = self.document.new_page(
+                width=self._pagesize[0], height=self._pagesize[1])
+        self._pending = True
+        return self._page
+
+    def getPageNumber(self):
+        return self.document.page_count + (1 if self._page is None else 0)
+
+    def showPage(self):
+        self.get_page()
+        self.commit()
+        self._page = None
+        self._pending = False
+        self._stack = []
+        self.reset()
+
+    def finish(self):
+        """Complete any pending page; return the (in-memory) document."""
+        if self._pending:
+            self.showPage()
+        if self.document.page_count == 0:
+            self.showPage()
+        return self.document
+
+    def save(self):
+        self.finish()
+        if self._filename:
+            self.document.save(self._filename, garbage=3, deflate=True)
+
+    def get_pixmap(self, page: int = 0, dpi: int = 72, clip=None):
+        """Rasterize a page (zero-based) of the document, in-process."""
+        self.commit()
+        return self.document[page].get_pixmap(dpi=dpi, clip=clip)
+
+    def fillPattern(self, cell, cell_width, cell_height, x, y, width, height,
+                    origin=(0, 0), stroke=1, fill=0):
+        """Fill a rectangle with a tiling pattern, made from a path in one cell.
+
+        See ReportLabCanvas.fillPattern
+        """
+        code = pattern_code(self, cell, stroke, fill)
+        matrix = pattern_matrix(tuple(self._ctm), origin)
+        key = (code, cell_width, cell_height, matrix)
+        if key not in self._patterns:
+            entries = pattern_dictionary(cell_width, cell_height, matrix)
+            _entries = ' '.join(
+                f"/{name} [{fp_str(*value)}]" if isinstance(value, list)
+                else f"/{name} {value}" for name, value in entries.items())
+            xref = self.document.get_new_xref()
+            self.document.update_object(xref, f'<< {_entries} /Resources << >> >>')
+            self.document.update_stream(xref, code.encode())
+            self._patterns[key] = (f'P{len(self._patterns)}', xref)
+        name, xref = self._patterns[key]
+        page = self.get_page()
+        kind, value = self.document.xref_get_key(page.xref, 'Resources')
+        if kind == 'xref':  # resources are an indirect object
+            self.document.xref_set_key(
+                int(value.split()[0]), f'Pattern/{name}', f'{xref} 0 R')
+        else:
+            self.document.xref_set_key(
+                page.xref, f'Resources/Pattern/{name}', f'{xref} 0 R')
+        shape = self.get_shape()
+        shape.totalcont += (
+            f'\nq {fp_str(*tuple(self._ctm))} cm /Pattern cs /{name} scn'
+            f' {fp_str(x, y, width, height)} re f Q\n')
+
+    # ---- co-ordinates
+
+    def _point(self, x, y) -> pymupdf.Point:
+        """Convert user-space x,y (origin bottom-left) to a page Point."""
+        point = pymupdf.Point(x, y) * self._ctm
+        return pymupdf.Point(point.x, self._pagesize[1] - point.y)
+
+    def _rotation(self) -> float:
+        """Current (anti-clockwise) rotation of the user space, in degrees."""
+        return math.degrees(math.atan2(self._ctm.b, self._ctm.a))
+
+    # ---- paths
+
+    def beginPath(self):
+        return PyMuPDFPath()
+
+    def get_shape(self):
+        """Return the Shape used for drawing on the current page."""
+        if self._shape is None:
+            self._shape = self.get_page().new_shape()
+        return self._shape
+
+    def commit(self):
+        """Add any pending drawing operations to the page."""
+        if self._shape is not None:
+            if self._shape.totalcont:
+                self._shape.commit()
+            self._shape = None
+
+    def drawPath(self, aPath, stroke=1, fill=0, fillMode=None):
+        shape = self.get_shape()
+        current = start = None
+        closed = False
+        for op in aPath.ops:
+            if op[0] == 'm':
+                current = start = self._point(op[1], op[2])
+                closed = False
+            elif op[0] == 'l':
+                point = self._point(op[1], op[2])
+                if current is not None:
+                    shape.draw_line(current, point)
+                current = point
+                closed = False
+            elif op[0] == 'c':
+                points = [self._point(op[i], op[i + 1]) for i in (1, 3, 5)]
+                if current is not None:
+                    shape.draw_bezier(current, *points)
+                current = points[2]
+                closed = False
+            elif op[0] == 'h':
+                if current is not None and start is not None and current != start:
+                    shape.draw_line(current, start)
+                current = start
+                closed = True
+        if not shape.draw_cont:
+            return
+        fill_mode = fillMode if fillMode is not None \
+            else getattr(aPath, '_fillMode', FILL_EVEN_ODD)
+        dashes = None
+        if self._dash[0]:
+            dashes = f"[{' '.join(str(dash) for dash in self._dash[0])}] {self._dash[1]}"
+        shape.finish(
+            width=self._lineWidth if stroke else 0,
+            color=self._strokeColorObj.rgb() if stroke else None,
+            fill=self._fillColorObj.rgb() if fill else None,
+            lineCap=self._lineCap,
+            lineJoin=self._lineJoin,
+            dashes=dashes,
+            even_odd=fill_mode == FILL_EVEN_ODD,
+            closePath=closed,
+            fill_opacity=self._fill_alpha,
+            stroke_opacity=self._stroke_alpha)
+        self._pending = True
+
+    def line(self, x1, y1, x2, y2):
+        path = self.beginPath()
+        path.moveTo(x1, y1)
+        path.lineTo(x2, y2)
+        self.drawPath(path, stroke=1, fill=0)
+
+    def lines(self, linelist):
+        path = self.beginPath()
+        for x1, y1, x2, y2 in linelist:
+            path.moveTo(x1, y1)
+            path.lineTo(x2, y2)
+        self.drawPath(path, stroke=1, fill=0)
+
+    def grid(self, xlist, ylist):
+        y0, y1 = ylist[0], ylist[-1]
+        x0, x1 = xlist[0], xlist[-1]
+        lines = [(x, y0, x, y1) for x in xlist] + [(x0, y, x1, y) for y in ylist]
+        self.lines(lines)
+
+    def rect(self, x, y, width, height, stroke=1, fill=0):
+        path = self.beginPath()
+        path.rect(x, y, width, height)
+        self.drawPath(path, stroke=stroke, fill=fill)
+
+    def roundRect(self, x, y, width, height, radius, stroke=1, fill=0):
+        path = self.beginPath()
+        path.roundRect(x, y, width, height, radius)
+        self.drawPath(path, stroke=stroke, fill=fill)
+
+    def ellipse(self, x1, y1, x2, y2, stroke=1, fill=0):
+        path = self.beginPath()
+        path.ellipse(x1, y1, x2 - x1, y2 - y1)
+        self.drawPath(path, stroke=stroke, fill=fill)
+
+    def circle(self, x_cen, y_cen, r, stroke=1, fill=0):
+        self.ellipse(x_cen - r, y_cen - r, x_cen + r, y_cen + r, stroke, fill)
+
+    def arc(self, x1, y1, x2, y2, startAng=0, extent=90):
+        path = self.beginPath()
+        path.arc(x1, y1, x2, y2, startAng, extent)
+        self.drawPath(path, stroke=1, fill=0)
+
+    def wedge(self, x1, y1, x2, y2, startAng, extent, stroke=1, fill=0):
+        path = self.beginPath()
+        path.moveTo(0.5 * (x1 + x2), 0.5 * (y1 + y2))
+        path.arcTo(x1, y1, x2, y2, startAng, extent)
+        path.close()
+        self.drawPath(path, stroke=stroke, fill=fill)
+
+    def bezier(self, x1, y1, x2, y2, x3, y3, x4, y4):
+        path = self.beginPath()
+        path.moveTo(x1, y1)
+        path.curveTo(x2, y2, x3, y3, x4, y4)
+        self.drawPath(path, stroke=1, fill=0)
+
+    # ---- text
+
+    def _font(self, name: str) -> tuple:
+        """Return PyMuPDF font name and file for a (registered) ReportLab font."""
+        if name not in self._fonts:
+            if name in BASE14_FONTS:
+                self._fonts[name] = (BASE14_FONTS[name], None)
+            else:
+                face = pdfmetrics.getFont(name).face
+                alias = 'F%s' % fonts.font_key(name)
+                self._fonts[name] = (alias, getattr(face, 'filename', None))
+        return self._fonts[name]
+
+    def _runs(self, text: str) -> list:
+        """Split text into (font name, font file, text, width) runs.
+
+        As with ReportLab, characters missing from a standard (base 14) font
+        are drawn with its substitution fonts (Symbol and ZapfDingbats); each
+        run's text holds the font's own character codes.
+        """
+        fontname, fontfile = self._font(self._fontname)
+        if self._fontname not in BASE14_FONTS:
+            width = fonts.string_width(text, self._fontname, self._fontsize)
+            return [(fontname, fontfile, text, width)]
+        font = pdfmetrics.getFont(self._fontname)
+        runs = []
+        for _font, codes in pdfmetrics.unicode2T1(text, [font] + font.substitutionFonts):
+            width = sum(_font.widths[code] for code in codes) * self._fontsize / 1000.0
+            runs.append((
+                BASE14_FONTS.get(_font.fontName, fontname), None,
+                codes.decode('latin-1'), width))
+        return runs
+
+    def drawString(self, x, y, text, **kwargs):
+        if not text:
+            return
+        rotation = self._rotation()
+        shape = self.get_shape()
+        offset = 0
+        for fontname, fontfile, run, width in self._runs(text):
+            point = self._point(x + offset, y)
+            offset += width
+            shape.insert_text(
+                point, run,
+                fontsize=self._fontsize,
+                fontname=fontname,
+                fontfile=fontfile,
+                color=self._fillColorObj.rgb(),
+                fill_opacity=self._fill_alpha,
+                morph=(point, pymupdf.Matrix(rotation)) if rotation else None)
+        # keep text in drawing order (a Shape normally adds all text at the end)
+        shape.totalcont += shape.text_cont
+        shape.text_cont = ''
+
+    def drawCentredString(self, x, y, text, **kwargs):
+        width = fonts.string_width(text, self._fontname, self._fontsize)
+        self.drawString(x - width / 2.0, y, text)
+
+    def drawRightString(self, x, y, text, **kwargs):
+        width = fonts.string_width(text, self._fontname, self._fontsize)
+        self.drawString(x - width, y, text)
+
+    def drawParagraph(self, para, x, y):
+        """Draw the (already wrapped) lines of a ReportLab Paragraph."""
+        style = para.style
+        blpara = para.blPara
+        self.saveState()
+        if style.backColor:
+            self.setFillColor(style.backColor)
+            self.rect(x, y, para.width, para.height, stroke=0, fill=1)
+        self.setFillColor(style.textColor)
+        self.setFont(style.fontName, style.fontSize, style.leading)
+        cur_y = y + para.height - getattr(blpara, 'ascent', style.fontSize)
+        for line in blpara.lines:
+            if blpara.kind == 0:  # single style; words are strings
+                extra, words = line
+                words = [(' '.join(words), None)]
+            else:  # mixed styles; words are fragments with a style
+                extra = line.extraSpace
+                words = [(getattr(frag, 'text', ''), frag) for frag in line.words]
+            offset = 0
+            if style.alignment == TA_CENTER:
+                offset = extra / 2.0
+            elif style.alignment == TA_RIGHT:
+                offset = extra
+            cur_x = x + style.leftIndent + offset
+            for text, frag in words:
+                if frag is not None:
+                    self.setFont(frag.fontName, frag.fontSize, style.leading)
+                    self.setFillColor(frag.textColor or style.textColor)
+                self.drawString(cur_x, cur_y, text)
+                cur_x += fonts.string_width(text, self._fontname, self._fontsize)
+            cur_y -= style.leading
+        self.restoreState()
+
+    # ---- images and drawings
+
+    def _box(self, x, y, width, height) -> tuple:
+        """Page Rect enclosing a user-space box; plus rotation of the box."""
+        points = [
+            self._point(x, y), self._point(x + width, y),
+            self._point(x, y + height), self._point(x + width, y + height)]
+        rect = pymupdf.Rect(
+            min(pt.x for pt in points), min(pt.y for pt in points),
+            max(pt.x for pt in points), max(pt.y for pt in points))
+        return rect, round(self._rotation(), 6) % 360
+
+    def _image_source(self, image, mask=None) -> dict:
+        """Image file or PNG stream for insert_image, with a ReportLab mask.
+
+        As for ReportLab, ``mask`` is one of:
+
+        * None - the image is opaque (any alpha channel is ignored)
+        * 'auto' - the image's alpha channel, or transparent colour, is used
+        * [rmin, rmax, gmin, gmax, bmin, bmax] - pixels with a colour in this
+          range are transparent; the opaque image is given this (PDF) colour
+          key mask once it has been inserted
+        """
+        if isinstance(image, str):
+            if mask == 'auto':
+                return {'filename': image}
+            _image = PILImage.open(image)
+        else:  # a ReportLab ImageReader
+            _image = image._image
+        if mask == 'auto':
+            if 'transparency' in _image.info:
+                _image = _image.convert('RGBA')
+        elif 'A' in _image.getbands() or 'transparency' in _image.info:
+            _image = _image.convert('RGB')
+        stream = io.BytesIO()
+        _image.save(stream, format='PNG')
+        return {'stream': stream.getvalue()}
+
+    def drawImage(self, image, x, y, width=None, height=None, mask=None, **kwargs):
+        self.commit()
+        source = self._image_source(image, mask)
+        if width is None or height is None:
+            _width, _height = image.getSize() if hasattr(image, 'getSize') \
+                else (100, 100)
+            width, height = width or _width, height or _height
+        rect, rotation = self._box(x, y, width, height)
+        if rotation % 90:
+            # insert_image only turns by right angles; so place the image on
+            # a page of its own, and show that page at any angle
+            holder = pymupdf.open()
+            page = holder.new_page(width=width, height=height)
+            xref = page.insert_image(
+                page.rect, keep_proportion=False, **source)
+        else:
+            holder, page = None, self.get_page()
+            xref = page.insert_image(
+                rect, keep_proportion=False, rotate=int(rotation), **source)
+        if isinstance(mask, (list, tuple)):
+            page.parent.xref_set_key(
+                xref, 'Mask', '[%s]' % ' '.join(str(int(v)) for v in mask))
+        if holder:
+            self.get_page().show_pdf_page(
+                rect, holder, 0, keep_proportion=False, rotate=rotation)
+        return (width, height)
+
+    def drawDrawing(self, drawing, x, y):
+        """Draw a ReportLab Drawing (e.g. from an SVG) via an in-memory PDF."""
+        self.commit()
+        source = pymupdf.open('pdf', renderPDF.drawToString(drawing))
+        rect, rotation = self._box(x, y, drawing.width, drawing.height)
+        self.get_page().show_pdf_page(rect, source, 0, rotate=rotation)
@@ -8,9 +8,12 @@ Notes:
 """
 # lib
 from collections import namedtuple
+from contextlib import contextmanager
 import copy
 from enum import Enum
+import functools
 import inspect
+from types import MappingProxyType
 import json
 import logging
 import math
@@ -20,9 +23,6 @@ from urllib.parse import urlparse
 import jinja2
 from jinja2.environment import Template
 from svglib.svglib import svg2rlg
-from reportlab.pdfgen import canvas as reportlab_canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.units import cm, inch, mm
 from reportlab.lib.pagesizes import (
     A8, A7, A6, A5, A4, A3, A2, A1, A0, LETTER, LEGAL, ELEVENSEVENTEEN,
@@ -57,8 +57,10 @@ from reportlab.lib.colors import (
     whitesmoke, yellow, yellowgreen, fidblue, fidred, fidlightblue,
     cornflower, firebrick)
 # local
-from protograf.utils import geoms, tools
+from protograf import backends
+from protograf.utils import downloads, fonts, geoms, tools
 from protograf.utils.support import LookupType
+from protograf.utils.indexes import as_columns, index_key
 
 log = logging.getLogger(__name__)
 
@@ -66,6 +68,7 @@ DEBUG = False
 DEBUG_COLOR = lightsteelblue
 CACHE_DIRECTORY = '.protograf'   # append to the user's home directory
 BGG_IMAGES = 'cf.geekdo-images.com'
+PATTERN_REPEATS = 8  # fewest lines, or dots, drawn as a tiling pattern
 
 # ---- named tuples
 UnitProperties = namedtuple(
@@ -351,7 +354,8 @@ class BaseCanvas:
         #          the named paper formats, e.g. A4, are just tuples storing
         #          (width, height) values using points units, so A4 is :
         #          (595.2755905511812, 841.8897637795277)
-        self.canvas = reportlab_canvas.Canvas(filename=filename, pagesize=_paper)
+        self.backend = self.defaults.get('backend', 'reportlab')
+        self.canvas = backends.get_canvas(self.backend, filename=filename, pagesize=_paper)
         # ---- constants
         self.default_length = 1
         self.show_id = False
@@ -436,6 +440,9 @@ class BaseCanvas:
         self.wrap = self.defaults.get('wrap', False)
         self.align = self.defaults.get('align', 'centre')  # centre,left,right,justify
         self._alignment = TA_LEFT  # see to_alignment()
+        self.fit = self.defaults.get('fit', False)  # auto-size text to fit its box
+        self.fit_min = self.defaults.get('fit_min', 4)
+        self.fit_max = self.defaults.get('fit_max', None)  # None => use the font size
         # ---- grid cut marks
         self.grid_marks = self.defaults.get('grid_marks', 0)
         self.grid_stroke = self.get_color(self.defaults.get('grid_stroke'), grey)
@@ -465,6 +472,7 @@ class BaseCanvas:
         self.label_mx = self.defaults.get('label_mx', 0)
         self.label_my = self.defaults.get('label_my', 0)
         self.label_rotation = self.defaults.get('label_rotation', 0)
+        self.label_fit = self.defaults.get('label_fit', False)
         # ---- text: title
         self.title = self.defaults.get('title', '')
         self.title_size = self.defaults.get('title_size', self.font_size)
@@ -476,6 +484,7 @@ class BaseCanvas:
         self.title_mx = self.defaults.get('title_mx', 0)
         self.title_my = self.defaults.get('title_my', 0)
         self.title_rotation = self.defaults.get('title_rotation', 0)
+        self.title_fit = self.defaults.get('title_fit', False)
         # ---- text: heading
         self.heading = self.defaults.get('heading', '')
         self.heading_size = self.defaults.get('heading_size', self.font_size)
@@ -487,6 +496,7 @@ class BaseCanvas:
         self.heading_mx = self.defaults.get('heading_mx', 0)
         self.heading_my = self.defaults.get('heading_my', 0)
         self.heading_rotation = self.defaults.get('heading_rotation', 0)
+        self.heading_fit = self.defaults.get('heading_fit', False)
         # ---- text block
         self.outline_stroke = self.defaults.get('outline_stroke', self.fill)
         self.outline_width = self.defaults.get('outline_width', 0)
@@ -693,6 +703,66 @@ class BaseCanvas:
         return default
 
 
+# ---- style cascade
+STYLE_SKIP = ['canvas', 'common', 'stylesheet', 'kwargs']  # never part of a style
+_default_properties = None  # snapshot of a default BaseCanvas' properties
+
+
+def default_properties() -> dict:
+    """Return (a cached snapshot of) the properties of a default BaseCanvas."""
+    global _default_properties
+    if _default_properties is None:
+        _default_properties = MappingProxyType(dict(vars(BaseCanvas())))
+    return _default_properties
+
+
+def style_properties(shape) -> MappingProxyType:
+    """Return the properties of a shape that differ from the defaults.
+
+    Note:
+        * properties with no default, or starting with `_`, are ignored
+    """
+    defaults = default_properties()
+    style = {}
+    for attr, value in vars(shape).items():
+        if attr in STYLE_SKIP or attr[0] == '_' or attr not in defaults:
+            continue
+        if value != defaults[attr]:
+            style[attr] = value
+    return MappingProxyType(style)
+
+
+def common_style(common) -> dict:
+    """Merge the style(s) of a Common shape, or a list of them, in order.
+
+    Any other shape can also be used; its non-default properties are its style.
+    """
+    commons = common if isinstance(common, (list, tuple)) else [common]
+    style = {}
+    for item in commons:
+        _style = getattr(item, '_style', None)
+        if _style is None and isinstance(item, BaseShape):
+            _style = style_properties(item)
+        if _style is None:
+            tools.feedback(f'Cannot process the Common property "{item}"'
+                           ' - please check!', True)
+        style.update(_style)
+    return style
+
+
+def batched(method):
+    """Decorate a shape's draw_ method, so its lines are drawn as a single path.
+
+    Note:
+        * the method's first argument must be the canvas
+    """
+    @functools.wraps(method)
+    def wrapper(self, cnv, *args, **kwargs):
+        with self.batch_lines(cnv):
+            return method(self, cnv, *args, **kwargs)
+    return wrapper
+
+
 class BaseShape:
     """Base class for objects that are drawn on a given canvas."""
 
@@ -713,6 +783,7 @@ class BaseShape:
         self.sequence = kwargs.get('sequence', [])  # e.g. card numbers
         self.dataset = []  # list of dict data (loaded from file)
         self.members = []  # card IDs, of which current card is a member
+        self._batch = None  # path collecting lines; see batch_lines()
         # ---- general
         self.common = kwargs.get('common', None)
         self.shape = kwargs.get('shape', cnv.shape)
@@ -794,6 +865,9 @@ class BaseShape:
         self.wrap = kwargs.get('wrap', cnv.wrap)
         self.align = kwargs.get('align', cnv.align)  # centre,left,right,justify
         self._alignment = TA_LEFT  # see to_alignment()
+        self.fit = kwargs.get('fit', cnv.fit)
+        self.fit_min = self.kw_float(kwargs.get('fit_min', cnv.fit_min))
+        self.fit_max = self.kw_float(kwargs.get('fit_max', cnv.fit_max))
         # ---- text: base
         self.text = kwargs.get('text', cnv.text)
         self.text_size = self.kw_float(kwargs.get('text_size', cnv.text_size))
@@ -808,6 +882,7 @@ class BaseShape:
         self.label_mx = self.kw_float(kwargs.get('label_mx', 0))
         self.label_my = self.kw_float(kwargs.get('label_my', 0))
         self.label_rotation = self.kw_float(kwargs.get('label_rotation', 0))
+        self.label_fit = kwargs.get('label_fit', cnv.label_fit)
         # ---- text: title
         self.title = kwargs.get('title', cnv.title)
         self.title_size = self.kw_float(kwargs.get('title_size', self.font_size))
@@ -817,6 +892,7 @@ class BaseShape:
         self.title_mx = self.kw_float(kwargs.get('title_mx', 0))
         self.title_my = self.kw_float(kwargs.get('title_my', 0))
         self.title_rotation = self.kw_float(kwargs.get('title_rotation', 0))
+        self.title_fit = kwargs.get('title_fit', cnv.title_fit)
         # ---- text: heading
         self.heading = kwargs.get('heading', cnv.heading)
         self.heading_size = self.kw_float(kwargs.get('heading_size', self.font_size))
@@ -826,6 +902,7 @@ class BaseShape:
         self.heading_mx = self.kw_float(kwargs.get('heading_mx', 0))
         self.heading_my = self.kw_float(kwargs.get('heading_my', 0))
         self.heading_rotation = self.kw_float(kwargs.get('heading_rotation', 0))
+        self.heading_fit = kwargs.get('heading_fit', cnv.heading_fit)
         # ---- text block
         self.outline_stroke = kwargs.get('outline_stroke', cnv.outline_stroke)
         self.outline_width = self.kw_float(kwargs.get('outline_width', cnv.outline_width))
@@ -1002,25 +1079,17 @@ class BaseShape:
             tools.feedback("Problem with settings: %s." % '; '.join(issue))
         # ---- UPDATE SELF WITH COMMON
         if self.common:
-            try:
-                attrs = vars(self.common)
-            except TypeError:
-                tools.feedback(f'Cannot process the Common property "{self.common}"'
-                               ' - please check!', True)
-            for attr in attrs.keys():
-                if attr not in ['canvas', 'common', 'stylesheet', 'kwargs'] and \
-                        attr[0] != '_':
-                    # tools.feedback(f'{attr=}')
-                    common_attr = getattr(self.common, attr)
-                    base_attr = getattr(BaseCanvas(), attr)
-                    if common_attr != base_attr:
-                        setattr(self, attr, common_attr)
+            self.set_common_props(self.common)
 
         # ---- SET offset properties to correct units
         self._o = self.set_offset_props()
         # ---- SET UNIT PROPS (last!)
         self.set_unit_properties()
 
+    def set_common_props(self, common):
+        """Update self with the (precomputed) style of Common shape(s)."""
+        vars(self).update(common_style(common))
+
     def __str__(self):
         try:
             return f'{self.__class__.__name__}::{self.kwargs}'
@@ -1133,6 +1202,7 @@ class BaseShape:
             ff = ext(self.font_face)
             try:
                 self.register_font(ff)
+                canvas.setFont(ff, ext(self.font_size))
             except (KeyError, ValueError):
                 tools.feedback(
                     f'Unable to find or register font: "{ff}".'
@@ -1236,10 +1306,9 @@ class BaseShape:
         # tools.feedback(f'*** draw baseshape: {self._abs_x=} {self._abs_y=} {self._abs_cx=} {self._abs_cy=}')
 
     def register_font(self, font_name: str = ''):
-        if not font_name:
-            raise ValueError('No font name supplied for registration!')
-        font_file = font_name + '.ttf'
-        pdfmetrics.registerFont(TTFont(font_name, font_file))
+        """Register a font on first use, via the font index (see utils.fonts)."""
+        if not fonts.register_font(font_name):
+            raise KeyError(f'No font file found for "{font_name}"')
 
     def check_settings(self) -> tuple:
         """Check that the user-supplied parameters for choices are correct"""
@@ -1371,9 +1440,12 @@ class BaseShape:
         """Validate if value is in direct kwargs OR in Common _kwargs."""
         if value in self.kwargs:
             return True
-        if 'common' in self.kwargs:
-            if value in self.kwargs['common']._kwargs:
-                return True
+        if self.kwargs.get('common'):
+            common = self.kwargs['common']
+            commons = common if isinstance(common, (list, tuple)) else [common]
+            for item in commons:
+                if value in item._kwargs:
+                    return True
         return False
 
     def load_image(self, source=None, scaling=None, cache_directory=None) -> tuple:
@@ -1410,18 +1482,29 @@ class BaseShape:
             return drawing
 
         def image_reader(source) -> object:
-            """Attempt to load first from local, then source."""
+            """Attempt to load first from local cache, then source."""
             img = None
-            breakpoint()
-            if cache_directory:
-                if tools.is_url_valid(source):
+            if isinstance(source, os.PathLike):  # e.g. from Data(images=...)
+                source = str(source)
+            if cache_directory and tools.is_url_valid(source):
+                cache = downloads.image_cache(str(cache_directory))
+                _source = cache.lookup(source)
+                if not _source:
                     loc = urlparse(source)
                     filename = loc.path.split("/")[-1]
                     _source = os.path.join(cache_directory, filename)
-                    if os.path.exists(_source):
-                        img = ImageReader(_source)
+                if not os.path.exists(_source):  # not prefetched; get it now
+                    _source = None
+                    if source not in cache.failed:  # else, already tried and reported
+                        _source = downloads.prefetch(
+                            [source], cache_directory, report=False).get(source)
+                    if not _source:
+                        raise IOError(f'Unable to download "{source}"')
+                if _source:
+                    img = ImageReader(_source)
             if not img:
                 img = ImageReader(source)
+            return img
 
         img = None
         svg = False
@@ -1516,9 +1599,27 @@ class BaseShape:
             return the_shape
 
     def get_font_height(self) -> float:
-        face = pdfmetrics.getFont(self.font_face).face
-        height = (face.ascent - face.descent) / 1000 * self.font_size
-        return height
+        return fonts.font_height(self.font_face, self.font_size)
+
+    def fit_size(self) -> tuple:
+        """Return the (width, height) of the shape, in points, used to fit text."""
+        return self._u.width, self._u.height
+
+    def get_fit_size(
+            self, text: str, font_size: float, height: float = None, wrap: bool = False
+    ) -> float:
+        """Return largest font size, up to fit_max, for text to fit shape's width.
+
+        Requires native units (i.e. points) for height!
+        """
+        max_size = self.fit_max or font_size
+        min_size = min(self.fit_min or max_size, max_size)
+        leading = 1.2  # default ReportLab spacing between lines of a string
+        if wrap and self.leading and self.font_size:
+            leading = self.leading / self.font_size
+        return fonts.fit_font_size(
+            text, self.font_face, self.fit_size()[0], height,
+            min_size=min_size, max_size=max_size, leading=leading, wrap=wrap)
 
     def textify(self, index: int = None, text: str = '') -> str:
         """Extract text from a list, or create string, based on index & type."""
@@ -1595,24 +1696,20 @@ class BaseShape:
             canvas.setFont(self.font_face, fsize)
         # ---- drawString
         for ln in string.split('\n'):
+            # ---- * alignment offset (uses memoized string widths)
+            shift = 0
+            if align in ['centre', 'right']:
+                shift = fonts.string_width(ln, canvas._fontname, canvas._fontsize)
+                if align == 'centre':
+                    shift = shift / 2.0
             if rotation:
                 canvas.saveState()
                 canvas.translate(xm, mvy)
                 canvas.rotate(rotation)
-                if align == 'centre':
-                    canvas.drawCentredString(0, 0, ln)
-                elif align == 'right':
-                    canvas.drawRightString(0, 0, ln)
-                else:
-                    canvas.drawString(0, 0, ln)
+                canvas.drawString(-shift, 0, ln)
                 canvas.restoreState()
             else:
-                if align == 'centre':
-                    canvas.drawCentredString(xm, mvy, ln)
-                elif align == 'right':
-                    canvas.drawRightString(xm, mvy, ln)
-                else:
-                    canvas.drawString(xm, mvy, ln)
+                canvas.drawString(xm - shift, mvy, ln)
             mvy -= canvas._leading
 
     def draw_string(self, canvas, xs, ys, string, align=None, rotation=0, **kwargs):
@@ -1633,7 +1730,10 @@ class BaseShape:
             y_off = y_offset or self.title_size / 2.0
             y = yh + self.unit(self.heading_my)
             x = xh + self.unit(self.heading_mx)
-            canvas.setFont(self.font_face, self.heading_size)
+            _size = self.heading_size
+            if self.heading_fit:
+                _size = self.get_fit_size(_ttext, self.heading_size)
+            canvas.setFont(self.font_face, _size)
             canvas.setFillColor(self.heading_stroke)
             self.draw_multi_string(
                 canvas, x, y + y_off, _ttext, align=align, rotation=_rotation, **kwargs)
@@ -1647,10 +1747,13 @@ class BaseShape:
         _rotation = rotation or self.label_rotation
         if ttext:
             _ttext = str(ttext)
-            yl = yl - (self.label_size / 3.0) if centred else yl
+            _size = self.label_size
+            if self.label_fit:
+                _size = self.get_fit_size(_ttext, self.label_size, self.fit_size()[1])
+            yl = yl - (_size / 3.0) if centred else yl
             y = yl + self.unit(self.label_my)
             x = xl + self.unit(self.label_mx)
-            canvas.setFont(self.font_face, self.label_size)
+            canvas.setFont(self.font_face, _size)
             canvas.setFillColor(self.label_stroke)
             self.draw_multi_string(
                 canvas, x, y, _ttext, align=align, rotation=_rotation, **kwargs)
@@ -1664,10 +1767,13 @@ class BaseShape:
         _rotation = rotation or self.title_rotation
         if ttext:
             _ttext = str(ttext)
-            y_off = y_offset or self.title_size
+            _size = self.title_size
+            if self.title_fit:
+                _size = self.get_fit_size(_ttext, self.title_size)
+            y_off = y_offset or _size
             y = yt + self.unit(self.title_my)
             x = xt + self.unit(self.title_mx)
-            canvas.setFont(self.font_face, self.title_size)
+            canvas.setFont(self.font_face, _size)
             canvas.setFillColor(self.title_stroke)
             self.draw_multi_string(
                 canvas, x, y - y_off, _ttext, align=align, rotation=_rotation, **kwargs)
@@ -1698,8 +1804,76 @@ class BaseShape:
             pt2 = geoms.Point(xd, yd + cross_size / 2.0)
             self.draw_line_between_points(canvas, pt1, pt2)
 
+    @contextmanager
+    def batch_lines(self, cnv, stroke: bool = None):
+        """Collect lines, made by draw_line_between_points, into one path.
+
+        The path is drawn once, at the end; so all its lines share the canvas
+        properties, e.g. stroke color and width, that are then current.
+        """
+        if self._batch is not None:  # already collecting
+            yield self._batch
+            return
+        self._batch = cnv.beginPath()
+        try:
+            yield self._batch
+        finally:
+            pth, self._batch = self._batch, None
+        if stroke is None:
+            stroke = self.stroke
+        cnv.drawPath(pth, stroke=1 if stroke else 0, fill=0)
+
+    def pattern_fits(self, cnv, repeats: int, stroke: int = 1, fill: int = 0) -> bool:
+        """Can a tiling pattern be painted in place of a number of repeats?
+
+        A pattern is only worthwhile for a minimum number (PATTERN_REPEATS) of
+        repeated lines or dots; and it is painted opaque, so cannot be used
+        with any transparency.
+        """
+        if repeats < PATTERN_REPEATS or not (stroke or fill):
+            return False
+        if not hasattr(cnv, 'fillPattern') or self.transparency:
+            return False
+        stroke_alpha, fill_alpha = backends.canvas_alphas(cnv)
+        return not (stroke and stroke_alpha < 1 or fill and fill_alpha < 1)
+
+    def draw_lines_pattern(
+            self, cnv, start: geoms.Point, end: geoms.Point, count: int, step: float):
+        """Draw parallel lines as a tiling pattern, with one line in each cell.
+
+        Args:
+            start, end: Points of the first line; which must be vertical (it
+                is then repeated to the right) or horizontal (repeated upwards)
+            count: number of lines
+            step: distance between lines; more than the line width
+
+        Note:
+            * a cell is as long as a whole line, so that dashes are unbroken,
+              and only one line is painted in any part of the page
+        """
+        half = cnv._lineWidth / 2.0  # room for any line caps
+        cell = backends.pattern_path()
+        if start.x == end.x:  # vertical
+            low, length = min(start.y, end.y), abs(end.y - start.y) + 2 * half
+            cell.moveTo(step / 2.0, start.y - low + half)
+            cell.lineTo(step / 2.0, end.y - low + half)
+            origin = (start.x - step / 2.0, low - half)
+            cnv.fillPattern(
+                cell, step, length, *origin, count * step, length, origin=origin)
+        else:  # horizontal
+            low, length = min(start.x, end.x), abs(end.x - start.x) + 2 * half
+            cell.moveTo(start.x - low + half, step / 2.0)
+            cell.lineTo(end.x - low + half, step / 2.0)
+            origin = (low - half, start.y - step / 2.0)
+            cnv.fillPattern(
+                cell, length, step, *origin, length, count * step, origin=origin)
+
     def draw_line_between_points(self, cnv, p1: geoms.Point, p2: geoms.Point):
-        """Draw line between two Points"""
+        """Draw line between two Points; or add it to the batch path, if any."""
+        if self._batch is not None:
+            self._batch.moveTo(p1.x, p1.y)
+            self._batch.lineTo(p2.x, p2.y)
+            return
         pth = cnv.beginPath()
         pth.moveTo(p1.x, p1.y)
         pth.lineTo(p2.x, p2.y)
@@ -1802,8 +1976,11 @@ class BaseShape:
                             f'Unable to process data with this template ({err})', True)
                 elif isinstance(value, LookupType):
                     record = self.deck_data[ID]
-                    lookup_value = record[value.column]
+                    lookup_value = index_key(record, as_columns(value.column))
                     custom_value = value.lookups.get(lookup_value, None)
+                    if value.result is not None:  # lookups hold records
+                        custom_value = value.default if custom_value is None \
+                            else custom_value.get(value.result, value.default)
                     setattr(new_element, key, custom_value)
                     # print('+++', f'{ID=} {key=} {custom_value=}', '=>', getattr(new_element, key))
         if new_element:
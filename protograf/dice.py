@@ -3,16 +3,31 @@
 Dice functions for protograf
 """
 # lib
-import random
+from fractions import Fraction
+import math
+import re
 # third party
 # project
+from protograf.utils import rng
+from protograf.utils.support import feedback
+
+DICE_TERM = re.compile(
+    r"""\s*(?P<sign>[+-])?\s*(?:
+        (?P<count>\d*)[dD](?P<sides>\d+|%)(?P<explode>!)?
+        (?:(?P<keep>kh|kl|dh|dl|k)(?P<keep_count>\d+))?
+        |(?P<number>\d+))\s*""", re.VERBOSE)
+EXPLODE_DEPTH = 4  # re-rolls counted, exactly, for an exploding die
 
 
 class Dice:
-    """Base class for a dice."""
+    """Base class for a dice.
+
+    NOTE: Rolls are repeatable if a `seed` is set for Create().
+    """
 
     def __init__(self, **kwargs):
         self.kwargs = kwargs
+        self.random = kwargs.get('random') or rng.generator('dice')
         self.rolls = []
         self.dice_count = 1
         self.roll_count = 1
@@ -38,7 +53,7 @@ class Dice:
     def do_roll(self, count=None, pips=6):
         """Generate a list with count values."""
         self.set_rolls(rolls=count)
-        self.rolls = [random.randint(1, pips)
+        self.rolls = [self.random.randint(1, pips)
                       for rll in range(0, self.roll_count)]
         return self.rolls
 
@@ -49,7 +64,7 @@ class Dice:
         for rll in range(0, self.roll_count):
             total = 0
             for dce in range(0, self.dice_count):
-                total += random.randint(1, pips)
+                total += self.random.randint(1, pips)
             self.rolls.append(total)
         return self.rolls
 
@@ -101,3 +116,327 @@ class DiceD100(Dice):
 
     def roll(self, count=None):
         return self.do_roll(count=count, pips=100)
+
+
+# ---- exact probabilities ====
+
+
+def convolve(first: list, second: list) -> list:
+    """Return the convolution of two lists of whole-number counts.
+
+    The lists are packed into two (large) integers which are multiplied, which
+    is much faster than a loop and exact for any size of count.
+
+    Doc Test:
+    >>> convolve([1, 1], [1, 2, 1])
+    [1, 3, 3, 1]
+    """
+    if not first or not second:
+        return []
+    width = ((max(first) * max(second) * min(len(first), len(second))).bit_length() + 8) // 8
+    packed = [int.from_bytes(b''.join(count.to_bytes(width, 'little') for count in items),
+                             'little') for items in (first, second)]
+    result = (packed[0] * packed[1]).to_bytes(width * (len(first) + len(second) - 1), 'little')
+    return [int.from_bytes(result[key:key + width], 'little')
+            for key in range(0, len(result), width)]
+
+
+class Distribution:
+    """The exact chances of each total of a dice roll.
+
+    Each total has a whole-number count; the chance of the total is its count
+    divided by the `total` of all counts.
+
+    Doc Test:
+    >>> two = Distribution.parse('2d6')
+    >>> two.chance(7)
+    Fraction(1, 6)
+    >>> two.at_least(10)
+    Fraction(1, 6)
+    >>> two.mean
+    Fraction(7, 1)
+    >>> Distribution.parse('4d6kh3').mean
+    Fraction(15869, 1296)
+    >>> Distribution.parse('d4 + d6 - 2').values
+    [0, 1, 2, 3, 4, 5, 6, 7, 8]
+    """
+
+    def __init__(self, counts: dict, total: int = None, exact: bool = True):
+        counts = {int(value): int(count) for value, count in counts.items() if count}
+        if not counts:
+            feedback('A dice distribution needs at least one value!', True)
+        self.offset = min(counts)
+        self.counts = [0] * (max(counts) - self.offset + 1)
+        for value, count in counts.items():
+            self.counts[value - self.offset] = count
+        self.total = total or sum(self.counts)
+        self.exact = exact
+
+    @classmethod
+    def from_list(cls, offset: int, counts: list, exact: bool = True):
+        dist = cls({offset: 1}, exact=exact)
+        dist.offset, dist.counts, dist.total = offset, counts, sum(counts)
+        return dist
+
+    @classmethod
+    def die(cls, sides: int, explode: bool = False, depth: int = EXPLODE_DEPTH):
+        """Return the Distribution of one die; if `explode`, its highest value
+        is rolled again, and added, up to `depth` times."""
+        if sides < 1:
+            feedback(f'A die must have at least one side, not {sides}!', True)
+        single = cls.from_list(1, [1] * sides)
+        if not explode or sides == 1:
+            return single
+        result = single
+        for _ in range(depth):
+            # highest value is replaced by highest + another (exploded) roll
+            rest = cls.from_list(1, [count * result.total for count in single.counts[:-1]])
+            top = result.shift(sides)
+            counts = dict(rest.items())
+            for value, count in top.items():
+                counts[value] = counts.get(value, 0) + count
+            result = cls(counts, total=sides * result.total)
+        return result
+
+    @classmethod
+    def keep(cls, die, count: int, keep: int, highest: bool = True):
+        """Return the Distribution of the sum of the highest (or lowest) `keep`
+        values from rolling `count` of the same die."""
+        keep = max(0, min(keep, count))
+        faces = list(die.items())
+        if highest:
+            faces.reverse()
+        rest_weights = [sum(weight for _, weight in faces[key:]) for key in range(len(faces))]
+        states = {(count, 0): {0: 1}}  # (dice left, dice kept): {sum: count}
+        finished = {}
+        for key, (value, weight) in enumerate(faces):
+            new_states = {}
+            for (left, kept), sums in states.items():
+                for dice in range(left + 1):
+                    ways = math.comb(left, dice) * weight ** dice
+                    taken = min(dice, keep - kept)
+                    state = (left - dice, kept + taken)
+                    target = new_states
+                    if state[1] == keep:  # remaining dice do not matter
+                        ways *= rest_weights[key + 1] ** state[0] if key + 1 < len(faces) \
+                            else (1 if state[0] == 0 else 0)
+                        state, target = (0, keep), finished
+                    if not ways:
+                        continue
+                    target_sums = target.setdefault(state, {})
+                    for total, number in sums.items():
+                        new = total + taken * value
+                        target_sums[new] = target_sums.get(new, 0) + number * ways
+            states = {state: sums for state, sums in new_states.items() if state[0] > 0}
+            for state, sums in new_states.items():
+                if state[0] == 0:
+                    final = finished.setdefault(state, {})
+                    for total, number in sums.items():
+                        final[total] = final.get(total, 0) + number
+        counts = {}
+        for sums in finished.values():
+            for total, number in sums.items():
+                counts[total] = counts.get(total, 0) + number
+        return cls(counts, total=die.total ** count)
+
+    @classmethod
+    def parse(cls, expression: str, depth: int = EXPLODE_DEPTH):
+        """Return the Distribution of a dice expression e.g. '3d6+2' or '4d6kh3'.
+
+        An expression is a sum (or difference) of whole numbers and dice, where
+        each dice can be followed by ``!`` (exploding) and then one of ``kh``
+        (keep highest), ``kl`` (keep lowest), ``dh`` (drop highest) or ``dl``
+        (drop lowest) and a number.
+        """
+        result = cls({0: 1})
+        for sign, term in parse_dice(expression):
+            if isinstance(term, int):
+                part = cls({term: 1})
+            else:
+                count, sides, explode, keep, keep_count = term
+                die = cls.die(sides, explode, depth)
+                if keep:
+                    kept = keep_count if keep in ['kh', 'kl', 'k'] else count - keep_count
+                    part = cls.keep(die, count, kept, highest=keep in ['kh', 'k', 'dl'])
+                else:
+                    part = die.repeat(count)
+            result = result + (-part if sign < 0 else part)
+        return result
+
+    # ---- combine
+
+    def shift(self, amount: int):
+        return Distribution.from_list(self.offset + amount, self.counts, self.exact)
+
+    def __add__(self, other):
+        if isinstance(other, int):
+            return self.shift(other)
+        dist = Distribution.from_list(
+            self.offset + other.offset, convolve(self.counts, other.counts),
+            self.exact and other.exact)
+        dist.total = self.total * other.total
+        return dist
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return Distribution.from_list(
+            -(self.offset + len(self.counts) - 1), self.counts[::-1], self.exact)
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def repeat(self, times: int):
+        """Return the Distribution of the sum of `times` rolls of this one."""
+        result, square = Distribution({0: 1}), self
+        while times > 0:
+            if times & 1:
+                result = result + square
+            times >>= 1
+            if times:
+                square = square + square
+        return result
+
+    # ---- results
+
+    @property
+    def values(self) -> list:
+        return [value for value, count in self.items()]
+
+    def items(self):
+        """Yield each possible value, and its count."""
+        for key, count in enumerate(self.counts):
+            if count:
+                yield self.offset + key, count
+
+    def chance(self, value: int) -> Fraction:
+        """Return the chance of rolling exactly this value."""
+        key = value - self.offset
+        count = self.counts[key] if 0 <= key < len(self.counts) else 0
+        return Fraction(count, self.total)
+
+    def at_least(self, value: int) -> Fraction:
+        """Return the chance of rolling this value or higher."""
+        key = max(0, value - self.offset)
+        return Fraction(sum(self.counts[key:]), self.total)
+
+    def at_most(self, value: int) -> Fraction:
+        """Return the chance of rolling this value or lower."""
+        key = value - self.offset + 1
+        return Fraction(sum(self.counts[:max(0, key)]), self.total)
+
+    def pmf(self) -> dict:
+        """Return a dict of each value and its chance."""
+        return {value: self.chance(value) for value in self.values}
+
+    @property
+    def mean(self) -> Fraction:
+        return Fraction(sum((self.offset + key) * count
+                            for key, count in enumerate(self.counts)), self.total)
+
+    @property
+    def stdev(self) -> float:
+        mean = self.mean
+        variance = Fraction(sum((self.offset + key - mean) ** 2 * count
+                                for key, count in enumerate(self.counts)), self.total)
+        return math.sqrt(variance)
+
+    def table(self, decimals: int = 1, percent: bool = True) -> list:
+        """Return rows of value, chance, chance of at least and at most the value.
+
+        Doc Test:
+        >>> Distribution.parse('d4').table()[:2]
+        [['Value', 'Chance', 'At Least', 'At Most'], [1, 25.0, 100.0, 25.0]]
+        """
+        scale = 100 if percent else 1
+        rows = [['Value', 'Chance', 'At Least', 'At Most']]
+        for value in self.values:
+            rows.append([value] + [
+                round(float(chance) * scale, decimals) for chance in [
+                    self.chance(value), self.at_least(value), self.at_most(value)]])
+        return rows
+
+    def __repr__(self):
+        return f'Distribution({self.values[0]}..{self.values[-1]}, mean={float(self.mean):.3f})'
+
+
+def parse_dice(expression: str) -> list:
+    """Return the (sign, term) parts of a dice expression; a term is a number, or
+    a tuple of (count, sides, explode, keep, keep count).
+
+    Doc Test:
+    >>> parse_dice('3d6! - 2 + 4D8kh3 + d%')
+    [(1, (3, 6, True, None, None)), (-1, 2), (1, (4, 8, False, 'kh', 3)), \
+(1, (1, 100, False, None, None))]
+    """
+    terms, position, source = [], 0, str(expression or '').strip()
+    while position < len(source):
+        match = DICE_TERM.match(source, position)
+        if not match or match.end() == position or (terms and not match.group('sign')):
+            feedback(f'Unable to understand the dice "{expression}"', True)
+        sign = -1 if match.group('sign') == '-' else 1
+        if match.group('number'):
+            terms.append((sign, int(match.group('number'))))
+        else:
+            sides = 100 if match.group('sides') == '%' else int(match.group('sides'))
+            keep_count = match.group('keep_count')
+            terms.append((sign, (
+                int(match.group('count') or 1), sides, bool(match.group('explode')),
+                match.group('keep'), int(keep_count) if keep_count else None)))
+        position = match.end()
+    if not terms:
+        feedback(f'Unable to understand the dice "{expression}"', True)
+    return terms
+
+
+# ---- simulated probabilities ====
+
+
+def simulate(expression, trials: int = 100000, seed=None, depth: int = 100) -> Distribution:
+    """Return the Distribution, found by rolling many times, of a dice expression.
+
+    Args:
+        expression: dice expression (see Distribution.parse); or a function
+            that takes a numpy random Generator and a number of trials, and
+            returns an array with the result of each trial
+        trials: number of times to roll
+        seed: to get the same results each time; by default, this is based on
+            the seed set for Create()
+        depth: most times an exploding die can be re-rolled
+
+    Notes:
+        Needs the numpy library; all the trials are rolled at the same time.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        feedback('Please install the "numpy" library to simulate dice rolls.', True)
+    generator = np.random.default_rng(rng.number('simulate') if seed is None else seed)
+    if callable(expression):
+        totals = np.asarray(expression(generator, trials), dtype=np.int64)
+    else:
+        totals = np.zeros(trials, dtype=np.int64)
+        for sign, term in parse_dice(expression):
+            if isinstance(term, int):
+                totals += sign * term
+                continue
+            count, sides, explode, keep, keep_count = term
+            rolls = generator.integers(1, sides + 1, size=(trials, count), dtype=np.int64)
+            if explode and sides > 1:
+                again = rolls == sides
+                for _ in range(depth):
+                    if not again.any():
+                        break
+                    extra = generator.integers(
+                        1, sides + 1, size=int(again.sum()), dtype=np.int64)
+                    rolls[again] += extra
+                    again[again] = extra == sides
+            if keep:
+                rolls.sort(axis=1)
+                kept = keep_count if keep in ['kh', 'kl', 'k'] else count - keep_count
+                kept = max(0, min(kept, count))
+                rolls = rolls[:, count - kept:] if keep in ['kh', 'k', 'dl'] \
+                    else rolls[:, :kept]
+            totals += sign * rolls.sum(axis=1)
+    values, counts = np.unique(totals, return_counts=True)
+    return Distribution(dict(zip(values.tolist(), counts.tolist())), exact=False)
@@ -10,9 +10,12 @@ def initialize():
     global cnv
     global deck
     global deck_settings
+    global deck_drawn
     global dataset
     global dataset_type
+    global data_source
     global image_list
+    global indexes
     global filename
     global margin
     global margin_left
@@ -32,10 +35,13 @@ def initialize():
     cnv = None  # will become a reportlab.canvas object
     deck = None  # will become a shapes.DeckShape object
     deck_settings = {}  # holds kwargs passed to Deck ; cards, copy, extra, grid_marks
+    deck_drawn = None  # the Deck already drawn onto the canvas; by Preview or Save
     filename = None
     dataset = None  # will become a dictionary of data loaded from a file
     dataset_type = None  # set when Data is loaded; enum DatasetType
+    data_source = None  # loads a database or Parquet Data(), when first needed
     image_list = []  # filenames stored when Data is loaded from image dir
+    indexes = {}  # id of a dataset: its DataIndex; shared by L() and Join()
     margin = 1
     margin_left = margin
     margin_top = margin
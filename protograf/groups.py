@@ -3,12 +3,13 @@
 Create layouts - grids, repeats, sequences and tracks - for protograf
 """
 # lib
+from collections import namedtuple
 import copy
+import hashlib
 import logging
 # third party
-import jinja2
 # local
-from protograf.utils import tools
+from protograf.utils import rng, support, tools
 from protograf.utils.tools import DatasetType, CardFrame  # enums
 from protograf.base import BaseShape
 from protograf.layouts import SequenceShape
@@ -22,6 +23,29 @@ log = logging.getLogger(__name__)
 
 DEBUG = False
 
+# ---- named tuples
+DeckSlot = namedtuple(
+    'DeckSlot', [
+        'card',  # index of card in the Deck
+        'copy',  # number of the copy of the card (starts at 1)
+        'page',  # number of the sheet in the Deck (starts at 1)
+        'row',
+        'col',
+    ]
+)
+DeckPlan = namedtuple(
+    'DeckPlan', [
+        'rows',  # maximum rows of cards per page
+        'cols',  # maximum columns of cards per page
+        'cards',  # number of cards in the Deck
+        'copies',  # dict of card index: number of copies
+        'masked',  # list of card indexes NOT drawn
+        'slots',  # list of DeckSlot
+        'sheets',  # number of pages (sheets) used
+        'bleed',  # tuple of (fill, width, height, areas) - per page
+    ]
+)
+
 # ---- Functions
 
 
@@ -33,33 +57,40 @@ class Switch:
         * This class is instantiated in the `proto` module, via a script's call
           to the S() function.
         * The class __call__ is accessed via the CardShape draw_card() method
+        * The test is evaluated - once, on first use - for every record in
+          the dataset; these outcomes are then reused by all cards (and copies)
     """
 
     def __init__(self, **kwargs):
-        self.switch_template = kwargs.get("template", None)
+        self.test = kwargs.get("test", '')
         self.result = kwargs.get("result", None)  # usually a Shape
         self.alternate = kwargs.get("alternate", None)  # usually a Shape
+        self.cases = kwargs.get("cases", None)  # dict of value: result
         self.dataset = kwargs.get("dataset", [])
         self.members = []  # card IDs, of which the affected card is a member
+        self._outcomes = None  # set by outcomes()
+
+    def outcomes(self) -> list:
+        """Return outcomes of the test for all records; True/False or case values."""
+        if self._outcomes is None:
+            convert = None if self.cases is not None else tools.as_truth
+            self._outcomes = tools.evaluate_rows(
+                self.test, self.dataset, label=f'switch "{self.test}"',
+                convert=convert)
+        return self._outcomes
 
     def __call__(self, cid):
         """Process the test, for a given card 'ID' in the dataset."""
-        record = self.dataset[cid]  # dict data for chosen card
-        try:
-            outcome = self.switch_template.render(record)
-            # print('  +++', f'{ID=} {self.test} {outcome=}')
-            boolean = tools.as_bool(outcome)
-            if boolean:
-                return self.result
-            else:
-                return self.alternate
-        except jinja2.exceptions.UndefinedError as err:
-            tools.feedback(
-                f'Switch "{self.test}" is incorrectly constructed ({err})', True)
-        except Exception as err:
-            tools.feedback(
-                f'Switch "{self.test}" is incorrectly constructed ({err})', True)
-        return None
+        outcomes = self.outcomes()
+        outcome = outcomes[cid] if cid < len(outcomes) else None
+        # print('  +++', f'{cid=} {self.test} {outcome=}')
+        if self.cases is not None:
+            if outcome in self.cases:
+                return self.cases[outcome]
+            return self.cases.get(str(outcome), self.alternate)
+        if outcome:
+            return self.result
+        return self.alternate
 
 
 class Lookup:
@@ -169,8 +200,11 @@ class CardShape(BaseShape):
         return outline
 
     def draw_card(self, cnv, row, col, cid, **kwargs):
-        """Draw a card on a given canvas."""
-        image = kwargs.get('image', None)
+        """Draw a card on a given canvas.
+
+        Returns:
+            tuple of (x, y, width, height) - in points - of the card's frame
+        """
         # tools.feedback(f'$$$ draw_card  KW=> {kwargs}')
         # ---- draw outline
         label = "ID:%s" % cid if self.show_id else ""
@@ -187,49 +221,63 @@ class CardShape(BaseShape):
             side = self.points_to_value(side)
             half_flat = self.points_to_value(half_flat)
 
+        # ---- card frame
+        match kwargs['frame_type']:
+            case CardFrame.RECTANGLE | CardFrame.CIRCLE:
+                _dx = col * (outline.width + outline.spacing_x) + outline.offset_x
+                _dy = row * (outline.height + outline.spacing_y) + outline.offset_y
+                frame_width, frame_height = outline.width, outline.height
+            case CardFrame.HEXAGON:
+                _dx = col * 2.0 * (side + outline.spacing_x) + outline.offset_x
+                _dy = row * 2.0 * (half_flat + outline.spacing_y) + outline.offset_y
+                if row & 1:
+                    _dx = _dx + side + outline.spacing_x
+                frame_width, frame_height = 2.0 * side, 2.0 * half_flat
+        # print(f' #*# {kwargs["frame_type"]=} {col=} {row=} {_dx=} {_dy=} ')
+        _off = outline.set_offset_props(_dx, _dy)
+        frame = (
+            _off.delta_x, _off.delta_y,
+            self.unit(frame_width), self.unit(frame_height))
+
         # ---- draw card elements
         flat_elements = tools.flatten(self.elements)
-        for index, flat_ele in enumerate(flat_elements):
-            # ---- * replace image source placeholder
-            if image and isinstance(flat_ele, ImageShape):
-                if flat_ele.kwargs.get('source', '').lower() in ['*', 'all']:
-                    flat_ele.source = image
-
-            # ---- * card frame
-            match kwargs['frame_type']:
-                case CardFrame.RECTANGLE | CardFrame.CIRCLE:
-                    _dx = col * (outline.width + outline.spacing_x) + outline.offset_x
-                    _dy = row * (outline.height + outline.spacing_y) + outline.offset_y
-                case CardFrame.HEXAGON:
-                    _dx = col * 2.0 * (side + outline.spacing_x) + outline.offset_x
-                    _dy = row * 2.0 * (half_flat + outline.spacing_y) + outline.offset_y
-                    if row & 1:
-                        _dx = _dx + side + outline.spacing_x
-            # print(f' #*# {kwargs["frame_type"]=} {col=} {row=} {_dx=} {_dy=} ')
-
-            members = self.members or flat_ele.members
-            try:
-                # ---- * normal element
-                iid = members.index(cid + 1)
-                new_ele = self.handle_custom_values(flat_ele, cid)  # calculated values
-                # tools.feedback(f'$$$ draw_card $$$ {new_ele=}')
-                new_ele.draw(cnv=cnv, off_x=_dx, off_y=_dy, ID=iid, **kwargs)
-            except AttributeError:
-                # ---- * switch ... get a new element ... or not!?
-                new_ele = flat_ele(cid=self.shape_id) if flat_ele else None # uses __call__ on Switch
-                if new_ele:
-                    flat_new_eles = tools.flatten(new_ele)
-                    for flat_new_ele in flat_new_eles:
-                        members = flat_new_ele.members or self.members
-                        iid = members.index(cid + 1)
-                        custom_new_ele = self.handle_custom_values(flat_new_ele, iid)
-                        if isinstance(custom_new_ele, SequenceShape):
-                            custom_new_ele.deck_data = self.deck_data
-                        tools.feedback(f'$$$ draw_card $$$ {custom_new_ele=}')
-                        custom_new_ele.draw(cnv=cnv, off_x=_dx, off_y=_dy, ID=iid, **kwargs)
-
-            except Exception as err:
-                tools.feedback(f"Unable to draw card #{cid + 1}. (Error:{err})", True)
+        with rng.scope('card', cid):
+            for index, flat_ele in enumerate(flat_elements):
+                with rng.scope('shape', index):
+                    self.draw_element(cnv, flat_ele, cid, _dx, _dy, **kwargs)
+        return frame
+
+    def draw_element(self, cnv, flat_ele, cid, _dx, _dy, **kwargs):
+        """Draw one of the elements of a card; or those chosen by a Switch."""
+        image = kwargs.get('image', None)
+        # ---- * replace image source placeholder
+        if image and isinstance(flat_ele, ImageShape):
+            if flat_ele.kwargs.get('source', '').lower() in ['*', 'all']:
+                flat_ele.source = image
+
+        members = self.members or flat_ele.members
+        try:
+            # ---- * normal element
+            iid = members.index(cid + 1)
+            new_ele = self.handle_custom_values(flat_ele, cid)  # calculated values
+            # tools.feedback(f'$$$ draw_card $$$ {new_ele=}')
+            new_ele.draw(cnv=cnv, off_x=_dx, off_y=_dy, ID=iid, **kwargs)
+        except AttributeError:
+            # ---- * switch ... get a new element ... or not!?
+            new_ele = flat_ele(cid=self.shape_id) if flat_ele else None # uses __call__ on Switch
+            if new_ele:
+                flat_new_eles = tools.flatten(new_ele)
+                for flat_new_ele in flat_new_eles:
+                    members = flat_new_ele.members or self.members
+                    iid = members.index(cid + 1)
+                    custom_new_ele = self.handle_custom_values(flat_new_ele, iid)
+                    if isinstance(custom_new_ele, SequenceShape):
+                        custom_new_ele.deck_data = self.deck_data
+                    tools.feedback(f'$$$ draw_card $$$ {custom_new_ele=}')
+                    custom_new_ele.draw(cnv=cnv, off_x=_dx, off_y=_dy, ID=iid, **kwargs)
+
+        except Exception as err:
+            tools.feedback(f"Unable to draw card #{cid + 1}. (Error:{err})", True)
 
 
 class DeckShape(BaseShape):
@@ -301,6 +349,7 @@ class DeckShape(BaseShape):
         self.images = kwargs.get("images", None)
         self.images_filter = kwargs.get("images_filter", None)
         self.image_list = []
+        self.frames = {}  # set by draw()
         # ---- FINALLY...
         extra = globals.deck_settings.get('extra', 0)
         self.cards += extra
@@ -349,23 +398,12 @@ class DeckShape(BaseShape):
         for area in self.bleed_areas:
             print(area)
 
-    def draw(self, cnv=None, off_x=0, off_y=0, ID=None, **kwargs):
-        """Method called by Save() in proto.
+    def page_layout(self) -> tuple:
+        """Calculate the space for cards on a page, and the rows/cols that fit.
 
-        Kwargs:
-            * cards - number of cards in Deck
-            * copy - name of column to use to set number of copies of a Card
-            * image_list - list of image filenames
-            * card_rows - maximum number of rows of cards on a page
-            * card_cols - maximum number of columns of cards on a page
+        Returns:
+            tuple of (page_across, page_down, max_rows, max_cols)
         """
-        cnv = cnv if cnv else self.canvas
-        log.debug("Deck cnv:%s type:%s", type(self.canvas), type(cnv))
-        # ---- handle kwargs
-        kwargs = self.kwargs | kwargs
-        images = kwargs.get('image_list', [])
-        cards = kwargs.get('cards', None)
-        kwargs['frame_type'] = self.frame_type
         # ---- user-defined rows and cols
         max_rows = self.card_rows
         max_cols = self.card_cols
@@ -377,7 +415,6 @@ class DeckShape(BaseShape):
         page_across = self.points_to_value(globals.page_width) - margin_right - margin_left
         page_down = self.points_to_value(globals.page_height) - margin_top - margin_bottom
         _height, _width, _radius = self.width, self.width, self.radius
-        self.draw_bleed(cnv, page_across, page_down)
         # ---- deck settings
         col_space, row_space = 0.0, 0.0
         if self.deck:
@@ -392,45 +429,174 @@ class DeckShape(BaseShape):
             max_cols = int(col_space / float(_width))
         log.debug("W:%s c-space:%s cols:%s", globals.page_width, col_space, max_cols)
         log.debug("H:%s r-space:%s mr:%s", globals.page_height, row_space, max_rows)
-        row, col = 0, 0
+        return page_across, page_down, max_rows, max_cols
+
+    def card_copies(self) -> list:
+        """Return the number of copies of each card in the Deck; zero if masked.
+
+        The `mask` and `copy` are each evaluated, once, for all the data.
+        """
+        rows = (self.dataset or [])[:len(self.deck)]
+        copies = [1] * len(self.deck)
+        if self.copy and rows:
+            copy = self.copy
+            if copy in rows[0]:  # name of a column
+                copy = lambda row: row.get(self.copy)
+            _copies = tools.evaluate_rows(
+                copy, rows, label=f'copy "{self.copy}"',
+                convert=lambda value: int(value) if value not in (None, '') else 1)
+            copies[:len(_copies)] = [count or 1 for count in _copies]
+        if self.mask and rows:
+            masks = tools.evaluate_rows(
+                self.mask, rows, label=f'mask "{self.mask}"',
+                convert=tools.as_truth)
+            for key, mask in enumerate(masks):
+                if mask:
+                    copies[key] = 0
+        return copies
+
+    def plan(self) -> DeckPlan:
+        """Calculate the print plan of the Deck - without drawing anything.
+
+        Each copy of each (unmasked) card is assigned, in order, to a slot
+        on a page; a new page (sheet) is started only when a card needs one.
+
+        Returns:
+            DeckPlan namedtuple
+        """
+        page_across, page_down, max_rows, max_cols = self.page_layout()
+        if max_rows < 1 or max_cols < 1:
+            tools.feedback(
+                'Unable to fit any cards on the page - check card size and margins!',
+                True)
+        per_page = max_rows * max_cols
+        copies = dict(enumerate(self.card_copies()))
+        masked, slots = [key for key, count in copies.items() if not count], []
+        for key, count in copies.items():
+            for number in range(1, count + 1):
+                page, slot = divmod(len(slots), per_page)
+                row, col = divmod(slot, max_cols)
+                slots.append(DeckSlot(key, number, page + 1, row, col))
+        return DeckPlan(
+            rows=max_rows,
+            cols=max_cols,
+            cards=len(self.deck),
+            copies=copies,
+            masked=masked,
+            slots=slots,
+            sheets=slots[-1].page if slots else 0,
+            bleed=(self.bleed_fill, page_across, page_down, self.bleed_areas))
+
+    def draw(self, cnv=None, off_x=0, off_y=0, ID=None, **kwargs):
+        """Method called by Save() in proto.
+
+        Kwargs:
+            * cards - number of cards in Deck
+            * copy - name of column to use to set number of copies of a Card
+            * image_list - list of image filenames
+            * card_rows - maximum number of rows of cards on a page
+            * card_cols - maximum number of columns of cards on a page
+        """
+        cnv = cnv if cnv else self.canvas
+        log.debug("Deck cnv:%s type:%s", type(self.canvas), type(cnv))
+        # ---- handle kwargs
+        kwargs = self.kwargs | kwargs
+        images = kwargs.get('image_list', [])
+        kwargs['frame_type'] = self.frame_type
+        # ---- print plan
+        plan = self.plan()
+        _, page_across, page_down, _ = plan.bleed
+        self.draw_bleed(cnv, page_across, page_down)
+        self.frames = {}  # card number: list of (page number, frame in points)
         # ---- draw cards
-        for key, card in enumerate(self.deck):
-            # set meta data
-            _locale = Locale(
-                col=col + 1,
-                row=row + 1,
-                id=f"{col + 1}:{row + 1}",
-                sequence=key + 1)
-            kwargs['locale'] = _locale._asdict()
-            image = images[key] if images and key <= len(images) else None
-            card.deck_data = self.dataset
-
-            mask = False
-            if self.mask:
-                _check = tools.eval_template(self.mask, self.dataset[key], label='mask')
-                mask = tools.as_bool(_check, label='mask', allow_none=False)
-                if not isinstance(mask, bool):
-                    tools.feedback(
-                        'The "mask" test must result in True or False value!', True)
-            if not mask:
-                # get number of copies
-                copies = 1
-                if card.kwargs.get('dataset') and self.copy:
-                    _copies = card.deck_data[key].get(self.copy, None)
-                    copies = tools.as_int(_copies, 'copy property', allow_none=True) or 1
-
-                for i in range(0, copies):
-                    card.draw_card(
-                       cnv, row=row, col=col, cid=card.shape_id, image=image, **kwargs)
-                    col += 1
-                    if col >= max_cols:
-                        col = 0
-                        row += 1
-                    if row >= max_rows:
-                        row, col = 0, 0
-                        if key != len(self.deck) - 1 or (i < (copies - 1)):
-                            cnv.canvas.showPage()
-                            self.draw_bleed(cnv, page_across, page_down)
+        sheet = 1
+        with rng.scope('deck'):
+            for slot in plan.slots:
+                if slot.page != sheet:
+                    sheet = slot.page
+                    cnv.canvas.showPage()
+                    self.draw_bleed(cnv, page_across, page_down)
+                page = cnv.canvas.getPageNumber()
+                frame = self.draw_slot(cnv, slot, images, **kwargs)
+                self.frames.setdefault(slot.card + 1, []).append((page, frame))
+
+    def draw_slot(self, cnv, slot: DeckSlot, images: list, **kwargs) -> tuple:
+        """Draw the card for a slot of the Deck's plan.
+
+        Returns:
+            tuple of (x, y, width, height) - in points - of the card's frame
+        """
+        card = self.deck[slot.card]
+        # set meta data
+        _locale = Locale(
+            col=slot.col + 1,
+            row=slot.row + 1,
+            id=f"{slot.col + 1}:{slot.row + 1}",
+            sequence=slot.card + 1)
+        kwargs['locale'] = _locale._asdict()
+        image = images[slot.card] if images and slot.card < len(images) else None
+        card.deck_data = self.dataset
+        return card.draw_card(
+            cnv, row=slot.row, col=slot.col, cid=card.shape_id, image=image, **kwargs)
+
+    def draw_cards(self, cnv=None, numbers: list = None, **kwargs) -> dict:
+        """Draw only some cards - the first copy of each - one per page.
+
+        Each card is drawn in its slot from the Deck's plan, so its frame is
+        the same as when the whole Deck is drawn; other cards are not drawn.
+
+        Returns:
+            dict of card number: (page number, frame in points)
+        """
+        cnv = cnv if cnv else self.canvas
+        kwargs = self.kwargs | kwargs
+        images = kwargs.get('image_list', [])
+        kwargs['frame_type'] = self.frame_type
+        plan = self.plan()
+        _, page_across, page_down, _ = plan.bleed
+        firsts = {slot.card + 1: slot for slot in plan.slots if slot.copy == 1}
+        frames = {}
+        with rng.scope('deck'):
+            for number in numbers or []:
+                if number not in firsts:
+                    continue
+                if frames:
+                    cnv.canvas.showPage()
+                self.draw_bleed(cnv, page_across, page_down)
+                page = cnv.canvas.getPageNumber()
+                frames[number] = (page, self.draw_slot(cnv, firsts[number], images, **kwargs))
+        return frames
+
+    def card_digests(self, numbers: list, images: list = None) -> dict:
+        """Return a digest, for each card, of all that is used to draw it.
+
+        This is the card's data row and image, the definitions of its elements
+        and the Deck's settings; not the result of drawing it.
+
+        Note:
+            * the random number seed is included; so, unless a seed is set
+              in Create(), the digests are different for every run
+        """
+        memo = {}
+        settings = support.definition((
+            {key: value for key, value in self.kwargs.items() if key != 'dataset'},
+            globals.page_width, globals.page_height, globals.units,
+            rng.STREAMS.seed), memo)
+        digests = {}
+        for number in numbers:
+            card = self.deck[number - 1]
+            record = self.dataset[number - 1] \
+                if self.dataset and number <= len(self.dataset) else None
+            image = images[number - 1] if images and number <= len(images) else None
+            elements = []
+            for element in tools.flatten(card.elements):
+                members = getattr(element, 'members', None) or card.members or []
+                elements.append((
+                    support.definition(element, memo),
+                    members.index(number) if number in members else None))
+            digests[number] = hashlib.sha1(support.definition(
+                (settings, record, image, elements), memo).encode()).hexdigest()
+        return digests
 
     def get(self, cid):
         """Return a card based on the internal ID"""
@@ -9,8 +9,10 @@ import math
 # third party
 # local
 from protograf.utils.geoms import Point, Locale, Place  # named tuples
+from protograf import backends
 from protograf.utils import geoms, tools, support
-from protograf.base import BaseShape, BaseCanvas
+from protograf.utils.locations import LocationTable
+from protograf.base import BaseShape
 from protograf.shapes import (
     CircleShape, LineShape, PolygonShape, PolylineShape, RectangleShape, TextShape)
 
@@ -65,8 +67,17 @@ class GridShape(BaseShape):
             x_cols.append(x + x_col * width)
         # ---- set canvas
         self.set_canvas_props(index=ID)  # this causes Image to disappear ???
-        # ---- draw grid
-        cnv.grid(x_cols, y_cols)  # , stroke=1, fill=1)
+        # ---- draw grid - as a pattern of vertical, and of horizontal, lines
+        if cnv._lineWidth < min(width, height) and self.pattern_fits(
+                cnv, len(x_cols) + len(y_cols)):
+            self.draw_lines_pattern(
+                cnv, Point(x_cols[0], y_cols[0]), Point(x_cols[0], y_cols[-1]),
+                len(x_cols), width)
+            self.draw_lines_pattern(
+                cnv, Point(x_cols[0], y_cols[0]), Point(x_cols[-1], y_cols[0]),
+                len(y_cols), height)
+        else:
+            cnv.grid(x_cols, y_cols)  # , stroke=1, fill=1)
 
 
 class DotGridShape(BaseShape):
@@ -110,15 +121,22 @@ class DotGridShape(BaseShape):
         size = self.dot_point / 2.0  # diameter is 3 points ~ 1mm or 1/32"
         self.fill = self.stroke
         self.set_canvas_props(index=ID)
-        # ---- draw dot grid
+        # ---- draw dot grid - as a pattern of cells, with a dot in the centre
+        if self.fill and 2.0 * size < min(width, height) and self.pattern_fits(
+                cnv, self.rows * self.cols, stroke=0, fill=1):
+            cell = backends.pattern_path()
+            cell.circle(width / 2.0, height / 2.0, size)
+            origin = (x - width / 2.0, y - height / 2.0)
+            cnv.fillPattern(
+                cell, width, height, *origin, self.cols * width,
+                self.rows * height, origin=origin, stroke=0, fill=1)
+            return
+        # ---- draw dot grid - as a single path
+        pth = cnv.beginPath()
         for y_col in range(0, self.rows):
             for x_col in range(0, self.cols):
-                cnv.circle(
-                    x + x_col * width,
-                    y + y_col * height,
-                    size,
-                    stroke=0,
-                    fill=1 if self.fill else 0)
+                pth.circle(x + x_col * width, y + y_col * height, size)
+        cnv.drawPath(pth, stroke=0, fill=1 if self.fill else 0)
 
 # ---- sequence
 
@@ -248,15 +266,7 @@ class RepeatShape(BaseShape):
     def __init__(self, _object=None, canvas=None, **kwargs):
         super(RepeatShape, self).__init__(_object=_object, canvas=canvas, **kwargs)
         self.kwargs = kwargs
-        # UPDATE SELF WITH COMMON
-        if self.common:
-            attrs = vars(self.common)
-            for attr in list(attrs.keys()):
-                if attr not in ["canvas", "common", "stylesheet"] and attr[0] != "_":
-                    common_attr = getattr(self.common, attr)
-                    base_attr = getattr(BaseCanvas(), attr)
-                    if common_attr != base_attr:
-                        setattr(self, attr, common_attr)
+        # NOTE: BaseShape has already updated self with any Common style
 
         self._object = _object  # incoming Shape object
         # repeat
@@ -387,6 +397,8 @@ class VirtualLocations(VirtualShape):
         self.start = kwargs.get('start', None)
         self.stop = kwargs.get('stop', 0)
         self.label_style = kwargs.get('label_style', None)
+        self._locales = None  # LocationTable; see locales()
+        self._locales_settings = None
         self.validate()
 
     def validate(self):
@@ -457,6 +469,32 @@ class VirtualLocations(VirtualShape):
         """Yield next Locale for each call."""
         pass
 
+    def layout_settings(self) -> tuple:
+        """Return the properties which affect the Locales in the layout."""
+        return (
+            self.x, self.y, self.rows, self.cols, self.side,
+            self.interval_x, self.interval_y,
+            self.col_even, self.col_odd, self.row_even, self.row_odd,
+            self.pattern, self.direction, self.facing, self.start, self.stop,
+            self.label_style)
+
+    def locales(self) -> LocationTable:
+        """Return all Locales in the layout, indexed by id, sequence and corner.
+
+        The Locales are only created once; and again only if the layout's
+        properties are changed.
+        """
+        if self._locales is None or self._locales_settings != self.layout_settings():
+            direction = self.direction  # NB: a snake changes direction as it goes
+            self._locales = LocationTable(self.next_locale())
+            self.direction = direction
+            self._locales_settings = self.layout_settings()
+        return self._locales
+
+    def locale(self, col: int, row: int) -> Locale:
+        """Return the Locale at a col and row in the layout; or None."""
+        return self.locales().by_id(self.set_id(col, row))
+
 
 class RectangularLocations(VirtualLocations):
     """
@@ -6,19 +6,18 @@ Primary interface for protograf (imported at top-level)
 import argparse
 from copy import copy
 from datetime import datetime
+import functools
 import itertools
 import logging
 import math
 import os
 import pathlib
-import random
 import sys
+from collections import abc
 from typing import Union, Any
 # third party
 import jinja2
 from reportlab.lib.pagesizes import *
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.pagesizes import A4
 # from reportlab.lib.colors import black, white
 from reportlab.lib.units import cm, inch
@@ -52,7 +51,8 @@ from reportlab.lib.colors import (
 from .bgg import BGGGame, BGGGameList
 from .base import BaseCanvas, GroupBase, COLORS, DEBUG_COLOR
 from .dice import (
-    Dice, DiceD4, DiceD6, DiceD8, DiceD10, DiceD12, DiceD20, DiceD100)
+    Dice, DiceD4, DiceD6, DiceD8, DiceD10, DiceD12, DiceD20, DiceD100,
+    Distribution, simulate)
 from .shapes import (
     BaseShape,
     ArcShape, ArrowShape, BezierShape, ChordShape, CircleShape, CommonShape,
@@ -66,13 +66,18 @@ from .layouts import (
     GridShape, DotGridShape,
     VirtualLocations, ConnectShape, RepeatShape, SequenceShape)
 from .groups import DeckShape, Switch
+from . import backends
 from ._version import __version__
 # from protograf.utils.support import (
 #     steps, excels, excel_column,  numbers, letters)
-from protograf.utils.tools import base_fonts, DatasetType
-from protograf.utils import geoms, tools, support
+from protograf.utils.tools import DatasetType
+from protograf.utils import downloads, geoms, tools, sources, support, fonts, rng, paths
 from protograf.utils.geoms import Locale, Point, Place, Ray
+from protograf.utils.hexgrid import HexGrid
+from protograf.utils.locations import LocationTable
 from protograf.utils.support import LookupType
+from protograf.utils.indexes import DataIndex, as_columns
+from protograf.utils.product import Product
 
 from protograf import globals
 
@@ -109,17 +114,16 @@ def Create(**kwargs):
 
     # ---- cards and page
     _cards = kwargs.get('cards', 0)
-    fonts = kwargs.get('fonts', [])
+    _fonts = kwargs.get('fonts', [])
     landscape = kwargs.get('landscape', False)
     kwargs = margins(**kwargs)
     globals.paper = kwargs.get('paper', globals.paper)
     defaults = kwargs.get('defaults', None)
     globals.units = kwargs.get('units', globals.units)
 
-    # ---- fonts
-    base_fonts()
-    for _font in fonts:
-        pdfmetrics.registerFont(TTFont(_font[0], _font[1]))
+    # ---- fonts (registered on first use)
+    for _font in _fonts:
+        fonts.add_font(_font[0], _font[1])
     globals.font_size = kwargs.get('font_size', 12)
 
     # ---- command-line arguments
@@ -128,7 +132,20 @@ def Create(**kwargs):
         "-d", "--directory", help="Specify output directory", default='')
     parser.add_argument(
         "-p", "--pages", help="Specify which pages to process", default='')
+    parser.add_argument(
+        "-b", "--backend", help="Specify rendering backend (reportlab or pymupdf)",
+        default='')
+    parser.add_argument(
+        "--dry-run", help="Report the Deck print plan; do not draw or save",
+        action='store_true', default=False)
+    parser.add_argument(
+        "-s", "--seed", help="Specify the seed for random numbers", type=int,
+        default=None)
     globals.pargs = parser.parse_args()
+    rng.set_seed(
+        globals.pargs.seed if globals.pargs.seed is not None else kwargs.get('seed', None))
+    if globals.pargs.backend:
+        kwargs['backend'] = globals.pargs.backend
     # NB - pages does not work - see notes in PageBreak()
     if globals.pargs.pages:
         tools.feedback('Pages is not an implemented feature - sorry!')
@@ -219,19 +236,110 @@ def page_break():
     PageBreak()
 
 
+def deck_kwargs() -> dict:
+    """Return the settings used to draw the Deck's cards."""
+    return dict(
+        cards=globals.deck_settings.get('cards', 9),
+        copy=globals.deck_settings.get('copy', None),
+        extra=globals.deck_settings.get('extra', 0),
+        grid_marks=globals.deck_settings.get('grid_marks', None),
+        image_list=globals.image_list)
+
+
+def draw_deck():
+    """Draw the Deck (if any) onto the canvas; only once e.g. for Preview and Save."""
+    if globals.deck and globals.deck_drawn is globals.deck:
+        return
+    if globals.deck and len(globals.deck.deck) > 1:
+        globals.deck_drawn = globals.deck
+        globals.deck.draw(globals.cnv, **deck_kwargs())
+        globals.cnv.canvas.showPage()
+
+
+def draw_cards(numbers: list) -> tuple:
+    """Draw only some of the Deck's cards into a new, in-memory, document.
+
+    The cards are drawn with the 'pymupdf' backend, whatever the backend of
+    the script; the script's own canvas (and PDF) is not changed.
+
+    Returns:
+        tuple of (pymupdf document, dict of card number: (page number, frame))
+    """
+    canvas = globals.cnv.canvas
+    globals.cnv.canvas = backends.get_canvas(
+        'pymupdf', pagesize=(globals.page_width, globals.page_height))
+    try:
+        frames = globals.deck.draw_cards(globals.cnv, numbers, **deck_kwargs())
+        document = backends.get_document(globals.cnv.canvas)
+    finally:
+        globals.cnv.canvas = canvas
+    return document, frames
+
+
+def prefetch_images(workers: int = 8):
+    """Download, before drawing, all remote images the Deck's cards can use.
+
+    URLs are found in the sources of the cards' images (including T() and L()
+    values) and in any dataset value that ends in an image file extension.
+    """
+    if not globals.deck:
+        return
+    dataset = globals.deck.dataset or []
+    urls = {}  # key: cache directory
+    for card in globals.deck.deck:
+        for element in tools.flatten(card.elements):
+            shapes = [element]
+            if isinstance(element, Switch):
+                shapes = [element.result, element.alternate] + \
+                    list((element.cases or {}).values())
+            for shape in tools.flatten(shapes):
+                if isinstance(shape, ImageShape):
+                    for directory, _urls in shape.image_urls(dataset).items():
+                        urls.setdefault(directory, []).extend(_urls)
+    found = set(itertools.chain(*urls.values()))
+    for url in downloads.find_urls(dataset):
+        if url not in found and downloads.is_image_url(url):
+            directory = ImageShape.set_cached_dir(url) or ImageShape.default_cache()
+            urls.setdefault(directory, []).append(url)
+    for directory, _urls in urls.items():
+        downloads.prefetch(_urls, directory, workers=workers)
+
+
+def report_plan(plan):
+    """Print a summary of a Deck's print plan (see DeckShape.plan)."""
+    _copies = sum(plan.copies.values())
+    tools.feedback(
+        f'Deck plan: {plan.cards} cards ({len(plan.masked)} masked);'
+        f' {_copies} copies to print; {plan.rows} rows x {plan.cols} cols per page;'
+        f' {plan.sheets} sheets')
+    bleed_fill, page_across, page_down, bleed_areas = plan.bleed
+    if bleed_fill or bleed_areas:
+        tools.feedback(
+            f'Deck plan: bleed {bleed_fill} over {page_across:.2f} x {page_down:.2f};'
+            f' {len(bleed_areas)} custom areas')
+    for sheet, slots in itertools.groupby(plan.slots, key=lambda slot: slot.page):
+        cards = [slot.card + 1 for slot in slots]
+        tools.feedback(f'Deck plan: sheet {sheet} - cards {cards}')
+
+
 def Save(**kwargs):
     validate_globals()
 
+    # ---- dry run - report the Deck plan only
+    if getattr(globals.pargs, 'dry_run', False):
+        if globals.deck:
+            report_plan(globals.deck.plan())
+        else:
+            tools.feedback('No Deck has been created; nothing to plan.')
+        return
+
+    # ---- get remote images
+    prefetch = kwargs.get('prefetch', True)
+    if prefetch:
+        prefetch_images(8 if prefetch is True else support.to_int(prefetch, 'prefetch'))
+
     # ---- draw Deck
-    if globals.deck and len(globals.deck.deck) > 1:
-        globals.deck.draw(
-            globals.cnv,
-            cards=globals.deck_settings.get('cards', 9),
-            copy=globals.deck_settings.get('copy', None),
-            extra=globals.deck_settings.get('extra', 0),
-            grid_marks=globals.deck_settings.get('grid_marks', None),
-            image_list=globals.image_list)
-        globals.cnv.canvas.showPage()
+    draw_deck()
 
     # ---- save canvas to file
     try:
@@ -241,21 +349,126 @@ def Save(**kwargs):
     except FileNotFoundError as err:
         tools.feedback(f'Unable to save "{globals.filename}" - {err}', True)
 
-    # ---- save to GIF
+    # ---- reduce file size
+    optimize = kwargs.get('optimize', None)
+    if optimize:
+        support.optimize_pdf(
+            globals.filename,
+            dpi=150 if optimize is True else support.to_int(optimize, 'optimize'),
+            quality=support.to_int(kwargs.get('quality', 80), 'quality'),
+            lossy=kwargs.get('lossy', False),
+            fonts=kwargs.get('subset_fonts', True))
+
+    # ---- save to PNG, GIF or atlas
     output = kwargs.get('output', None)
     dpi = support.to_int(kwargs.get('dpi', 300), 'dpi')
     framerate = support.to_float(kwargs.get('framerate', 1), 'framerate')
     names = kwargs.get('names', None)
     directory = kwargs.get('directory', None)
-    if output:
+    if output == 'atlas':
+        if not globals.deck or not globals.deck.frames:
+            tools.feedback('Cannot save an atlas without a Deck of cards!', True)
+        support.save_atlas(
+            globals.filename,
+            globals.deck.frames,
+            globals.deck.card_digests(list(globals.deck.frames), globals.image_list),
+            draw_cards,
+            directory,
+            grid=kwargs.get('grid', (10, 7)),
+            size=kwargs.get('size', None),
+            dpi=dpi,
+            rows=globals.deck.dataset,
+            workers=kwargs.get('workers', None))
+    elif output:
+        document = getattr(globals.cnv.canvas, 'document', None)  # pymupdf backend
         support.pdf_to_png(
-            globals.filename, output, dpi, names, directory, framerate=framerate)
+            globals.filename, output, dpi, names, directory, framerate=framerate,
+            document=document)
+
+    # ---- save as tiles
+    tiles = kwargs.get('tiles', None)
+    if tiles:
+        paper = A4 if tiles is True else tiles
+        units = kwargs.get('units', globals.units)
+        margin = support.to_float(kwargs.get('tile_margin', 0.5), 'tile_margin')
+        overlap = support.to_float(kwargs.get('overlap', 1.0), 'overlap')
+        support.save_tiles(
+            globals.filename,
+            paper,
+            margin=margin * units,
+            overlap=overlap * units,
+            marks=kwargs.get('tile_marks', True),
+            labels=kwargs.get('tile_labels', True),
+            document=getattr(globals.cnv.canvas, 'document', None))
 
 
 def save(**kwargs):
     Save(**kwargs)
 
 
+def Preview(**kwargs):
+    """Render pages, or cards, straight to low-resolution images.
+
+    No PDF file is written; use this instead of Save() e.g. for thumbnails or
+    contact sheets.
+
+    Kwargs:
+        * dpi - resolution of the images; default is 50
+        * pages - page numbers to render e.g. "1-3,5"; default is all pages
+        * cards - card numbers to render e.g. "1,3-5"; each card is rendered
+          (from its first copy) as a separate image
+        * directory - if set, each image is saved here as a PNG file
+
+    Returns:
+        list of tuples of (label, pymupdf.Pixmap)
+
+    Note:
+        * cards are drawn - only those chosen - straight into a document held
+          in memory, for any backend; the rest of the Deck is not drawn
+        * for pages, the fastest route is with the 'pymupdf' backend, which
+          draws into a document held in memory; the 'reportlab' backend still
+          has to create the whole PDF (in memory) before it can be rendered
+    """
+    validate_globals()
+
+    dpi = support.to_int(kwargs.get('dpi', 50), 'dpi')
+    pages = kwargs.get('pages', None)
+    if isinstance(pages, (str, int)):
+        pages = tools.sequence_split(str(pages))
+    cards = kwargs.get('cards', None)
+    if isinstance(cards, (str, int)):
+        cards = tools.sequence_split(str(cards))
+    directory = kwargs.get('directory', None)
+    # ---- render
+    if cards:
+        if not globals.deck:
+            tools.feedback('Cannot preview cards without a Deck!', True)
+        document, frames = draw_cards(cards)
+        for number in cards:
+            if number not in frames:
+                tools.feedback(f'Cannot preview card {number} - it is not in the Deck'
+                               ' (or is masked).', False, True)
+        images = support.preview_images(document, dpi, frames=frames)
+    else:
+        draw_deck()
+        document = backends.get_document(globals.cnv.canvas)
+        images = support.preview_images(document, dpi, pages=pages)
+    # ---- save images
+    if directory:
+        if not os.path.exists(directory):
+            tools.feedback(
+                f'Cannot find the directory "{directory}" - please create this first.',
+                True)
+        basename = os.path.splitext(os.path.basename(globals.filename))[0]
+        for label, pix in images:
+            pix.save(os.path.join(directory, f"{basename}-{label}.png"))
+    return images
+
+
+def preview(**kwargs):
+    return Preview(**kwargs)
+
+
 def margins(**kwargs):
     """Add margins to a set of kwargs, if not present."""
     validate_globals()
@@ -307,8 +520,10 @@ def Today(details: str = 'datetime', style: str = 'iso'):
 
 def Random(end: int = 1, start: int = 0, decimals: int = 2):
     """Return a random number, in a range (`start` to `end`), rounded to `decimals`.
+
+    NOTE: The numbers are repeatable if a `seed` is set for Create().
     """
-    rrr = random.random() * end + start
+    rrr = rng.generator('Random').random() * end + start
     if decimals == 0:
         return int(rrr)
     return round(rrr, decimals)
@@ -316,27 +531,18 @@ def Random(end: int = 1, start: int = 0, decimals: int = 2):
 # ---- cards ====
 
 
-def Matrix(labels: list = None, data: list = None) -> list:
-    """Return list of dicts; each element is a unique combo of all the items in `data`
+def Matrix(labels: list = None, data: list = None) -> Product:
+    """Return every unique combo of all the items in `data`; each as a dict.
+
+    The combos are not created until needed; so a Matrix can be very large.
+    It can be filtered e.g. Matrix(...).filter("{{ VALUE != 'A' }}"), or
+    sampled e.g. Matrix(...).sample(20).
     """
     if data is None:
         return []
-    combos = list(itertools.product(*data))
-    # check labels
-    data_length = len(combos[0])
-    if labels == []:
-        labels = [f'VALUE{item+1}' for item in range(0, data_length)]
-    else:
-        if len(labels) != data_length:
-            tools.feedback(
-                "The number of labels must equal the number of combinations!", True)
-    result = []
-    for item in combos:
-        entry = {}
-        for key, value in enumerate(item):
-            entry[labels[key]] = value
-        result.append(entry)
-    return result
+    if not labels:
+        labels = [f'VALUE{item+1}' for item in range(0, len(data))]
+    return Product(labels, data)
 
 
 def Card(sequence, *elements, **kwargs):
@@ -399,10 +605,12 @@ def Deck(**kwargs):
     """
     validate_globals()
 
+    load_data_source(mask=kwargs.get('mask', None))
     kwargs = margins(**kwargs)
     kwargs['dataset'] = globals.dataset
     globals.deck = DeckShape(**kwargs)
     globals.deck_settings['grid_marks'] = kwargs.get('grid_marks', None)
+    return globals.deck
 
 
 def CounterSheet(**kwargs):
@@ -436,6 +644,9 @@ def Data(**kwargs):
     images_filter = kwargs.get('images_filter', '')  # e.g. .png
     filters = tools.sequence_split(images_filter, False, True)
     source = kwargs.get('source', None)  # dict
+    database = kwargs.get('database', None)  # SQLite
+    parquet = kwargs.get('parquet', None)  # Parquet
+    globals.data_source = None
     # extra cards added to deck (handle special cases not in the dataset)
     globals.deck_settings['extra'] = tools.as_int(kwargs.get('extra', 0), 'extra')
     try:
@@ -447,18 +658,16 @@ def Data(**kwargs):
     if filename:  # handle excel and CSV
         globals.dataset = tools.load_data(filename, **kwargs)
         globals.dataset_type = DatasetType.FILE
+    elif database or parquet:  # loaded later; see load_data_source()
+        globals.data_source = data_source(**kwargs)
+        globals.dataset = None
+        globals.dataset_type = DatasetType.FILE
     elif matrix:  # handle pre-built dict
         globals.dataset = matrix
         globals.dataset_type = DatasetType.MATRIX
     elif data_list:  # handle list-of-lists
-        try:
-            keys = data_list[0]  # get keys from first sub-list
-            dict_list = [dict(zip(keys, values)) for values in data_list[1:]]
-            globals.dataset = dict_list
-            globals.dataset_type = DatasetType.DICT
-        except Exception:
-            tools.feedback(
-                'The data_list is not valid - please check', True)
+        globals.dataset = data_list_records(data_list)
+        globals.dataset_type = DatasetType.DICT
     elif source:  # handle pre-built dict
         if not isinstance(source, dict):
             source_type = type(source)
@@ -490,7 +699,7 @@ def Data(**kwargs):
     return globals.dataset
 
 
-def S(test='', result=None, alternate=None):
+def S(test='', result=None, alternate=None, cases: dict = None):
     """
     Enable Selection of data from a dataset list
 
@@ -502,48 +711,177 @@ def S(test='', result=None, alternate=None):
             returned if `test` evaluates to True
         alternate: str or element
             OPTIONAL; returned if `test` evaluates to False; if not supplied, then None
-    """
+        cases: dict
+            OPTIONAL; if supplied, the `test` is evaluated as a value - e.g.
+            {{ SUIT }} - and the result is the entry in `cases` for that
+            value; or the `alternate` if there is no such entry
 
-    if globals.dataset and isinstance(globals.dataset, list):
-        environment = jinja2.Environment()
-        template = environment.from_string(str(test))
+    Note:
+        * the test is evaluated once for all the data, the first time it is used
+    """
+    load_data_source()
+    if globals.dataset and isinstance(globals.dataset, abc.Sequence):
+        if cases is not None and not isinstance(cases, dict):
+            tools.feedback(f'The cases for "{test}" must be a dictionary, not {cases}', True)
         return Switch(
-            template=template, result=result, alternate=alternate, dataset=globals.dataset)
+            test=test, result=result, alternate=alternate, cases=cases,
+            dataset=globals.dataset)
     return None
 
 
-def L(lookup: str, target: str, result: str, default: Any = '') -> LookupType:
+def data_source(**kwargs):
+    """Return a function to load records from a database or Parquet file; or None.
+
+    Kwargs:
+        * database - SQLite file; with either a `query` or a `table` name
+        * parquet - Parquet file
+        * columns - list of the names of the columns to load; default is all
+    """
+    database = kwargs.get('database', None)
+    parquet = kwargs.get('parquet', None)
+    columns = kwargs.get('columns', None)
+    if database:
+        return functools.partial(
+            sources.read_database, database, query=kwargs.get('query', None),
+            table=kwargs.get('table', None), columns=columns)
+    if parquet:
+        return functools.partial(sources.read_parquet, parquet, columns=columns)
+    return None
+
+
+def load_data_source(mask=None):
+    """Load the records of a database or Parquet Data(), if not yet loaded.
+
+    A Deck's `mask` is passed on, so that rows it would mask are not loaded.
+    """
+    if globals.data_source:
+        loader, globals.data_source = globals.data_source, None
+        globals.dataset = loader(mask=mask)
+        log.debug("Loaded %s records with mask %s", len(globals.dataset), mask)
+
+
+def data_list_records(data_list: list) -> list:
+    """Convert a list-of-lists - the first being the column names - to a list of dicts."""
+    try:
+        keys = data_list[0]  # get keys from first sub-list
+        return [dict(zip(keys, values)) for values in data_list[1:]]
+    except Exception:
+        tools.feedback(
+            'The data_list is not valid - please check', True)
+
+
+def data_index(dataset: list, label: str = 'dataset') -> DataIndex:
+    """Return the (shared) DataIndex for a dataset."""
+    index = globals.indexes.get(id(dataset))
+    if index is None or index.dataset is not dataset:
+        index = DataIndex(dataset, label=label)
+        globals.indexes[id(dataset)] = index
+    return index
+
+
+def Table(**kwargs) -> list:
+    """Load a separate table of data - e.g. factions or keywords - for L() or Join().
+
+    Kwargs:
+        * filename - CSV or Excel file; as per Data()
+        * data_list - list-of-lists; the first is the list of column names
+        * database or parquet - SQLite or Parquet file; as per Data()
+
+    Returns:
+        list of dicts; one per row
+
+    Note:
+        * the table does not replace the Deck's data, as loaded by Data()
+    """
+    validate_globals()
+
+    filename = kwargs.get('filename', None)
+    data_list = kwargs.get('data_list', None)
+    loader = data_source(**kwargs)
+    if filename:
+        table = tools.load_data(filename, **kwargs)
+    elif data_list:
+        table = data_list_records(data_list)
+    elif loader:
+        table = loader()
+    else:
+        tools.feedback(
+            "You must provide a filename, data_list, database or parquet"
+            " for the Table command!", True)
+    if not table:
+        tools.feedback("The Table data is empty or cannot be loaded!", True)
+    return table
+
+
+def Join(table: list, lookup, target, columns: list = None, prefix: str = '') -> list:
+    """Add columns from a Table into each matching record of the Deck's data.
+
+        table: list
+            the data to be joined e.g. created by Table()
+        lookup: str or list
+            the column(s) of the Deck's data whose value(s) are used for the match
+        target: str or list
+            the column(s) in the table that must match the lookup value(s)
+        columns: list
+            OPTIONAL; the names of the columns to add; by default, all of them
+        prefix: str
+            OPTIONAL; added to the name of each of the added columns
+    """
+    validate_globals()
+
+    load_data_source()
+    if not globals.dataset or not isinstance(globals.dataset, abc.Sequence):
+        tools.feedback('Cannot use Join() without Data already defined!', True)
+    data_index(globals.dataset).validate(lookup, 'Join')
+    joined = data_index(table, 'Table').join(
+        globals.dataset, lookup, target, columns=columns, prefix=prefix)
+    if isinstance(globals.dataset, list):
+        globals.dataset[:] = joined  # keep the same dataset for any Deck
+    else:
+        globals.dataset = joined
+    globals.indexes.pop(id(globals.dataset), None)
+    return globals.dataset
+
+
+def L(lookup, target, result: str, default: Any = '', table: list = None) -> LookupType:
     """Enable Lookup of data in a record of a dataset
 
-        lookup: str
-            the lookup column whose value must be used for the match ("source" record)
-        target: str
-            the name of the column of the data being searched ("target" record)
+        lookup: str or list
+            the lookup column(s) whose value(s) must be used for the match
+            ("source" record)
+        target: str or list
+            the name(s) of the column(s) of the data being searched ("target"
+            record); must be the same number of columns as the lookup
         result: str
             name of result column containing the data to be returned ("target" record)
         default: Any
             the data to be returned if NO match is made
+        table: list
+            OPTIONAL; data to be searched e.g. created by Table(); by default
+            this is the Deck's data
 
     In short:
         lookup and target enable finding a matching record in the dataset;
-        the data in the 'result' column of that record is stored as an
-        `lookup: result` entry in the returned lookups dictionary of the LookupType
+        the data in the 'result' column of that record is then used.
+
+    Note:
+        * the index of the target column(s) is created once, and shared by all
+          the L() commands that use the same target
     """
+    load_data_source()
     lookups = {}
-    if globals.dataset and isinstance(globals.dataset, list):
-        # validate the lookup column
-        if lookup not in globals.dataset[0].keys():
-            tools.feedback(f'The "{lookup}" column is not available.', True)
-        for key, record in enumerate(globals.dataset):
-            if target in record.keys():
-                if result in record.keys():
-                    lookups[record[target]] = record[result]
-                else:
-                    tools.feedback(f'The "{result}" column is not available.', True)
-            else:
-                tools.feedback(f'The "{target}" column is not available.', True)
-    result = LookupType(column=lookup, lookups=lookups)
-    return result
+    if globals.dataset and isinstance(globals.dataset, abc.Sequence):
+        # validate the lookup column(s)
+        data_index(globals.dataset).validate(lookup, 'lookup')
+        if len(as_columns(lookup)) != len(as_columns(target)):
+            tools.feedback(
+                f'The lookup "{lookup}" and target "{target}" must have the same'
+                ' number of columns.', True)
+        index = data_index(table, 'Table') if table is not None \
+            else data_index(globals.dataset)
+        index.validate(result, 'result')
+        lookups = index.index(target)
+    return LookupType(column=lookup, lookups=lookups, result=result, default=default)
 
 
 def T(string: str, data: dict = None):
@@ -1003,16 +1341,25 @@ def Blueprint(**kwargs):
             font_size=kwargs['font_size'],
             stroke=kwargs['stroke'],
             units=kwargs['units'])
+        # one shape draws all the numbers; rather than a Text() for each
+        label = text(common=_common, text='0')
+        cnv = globals.cnv.canvas
+        label.set_canvas_props(cnv=cnv)
+        cnv.setFillColor(label.stroke)
+        _offset = label.set_offset_props()
+
+        def number(x, y, value):
+            label.draw_multi_string(
+                cnv, label.unit(x) + _offset.delta_x, label.unit(y) + _offset.delta_y,
+                value)
+
         for x in range(1, kwargs['cols'] + 1):
-            Text(x=x*side,
-                 y=kwargs['y'] - kwargs['side'] / 2.0,
-                 text=f'{x*side:{1}.{decimals}f}',
-                 common=_common)
+            number(x*side, kwargs['y'] - kwargs['side'] / 2.0,
+                   f'{x*side:{1}.{decimals}f}')
         for y in range(1, kwargs['rows'] + 1):
-            Text(x=kwargs['x'] - kwargs['side'] / 2.0,
-                 y=y*side - _common.points_to_value(kwargs['font_size']) / 2.0,
-                 text=f'{y*side:{1}.{decimals}f}',
-                 common=_common)
+            number(kwargs['x'] - kwargs['side'] / 2.0,
+                   y*side - _common.points_to_value(kwargs['font_size']) / 2.0,
+                   f'{y*side:{1}.{decimals}f}')
         # draw "zero" number
         z_x = kwargs['units'] * globals.margin_left
         z_y = kwargs['units'] * globals.margin_bottom
@@ -1020,10 +1367,9 @@ def Blueprint(**kwargs):
         corner_frac = corner_dist * 0.66 / kwargs['units']
         # tools.feedback(f'*** {z_x=} {z_y=} {corner_dist=}')
         zero_pt = geoms.point_on_line(Point(0, 0), Point(z_x, z_y), corner_frac)
-        Text(x=zero_pt.x / kwargs['units'] - kwargs['side'] / 4.0,
-             y=zero_pt.y / kwargs['units'] - kwargs['side'] / 4.0,
-             text="0",
-             common=_common)
+        number(zero_pt.x / kwargs['units'] - kwargs['side'] / 4.0,
+               zero_pt.y / kwargs['units'] - kwargs['side'] / 4.0,
+               "0")
     # ---- draw subgrid
     if kwargs.get('subdivisions'):
         local_kwargs = copy(kwargs)
@@ -1096,9 +1442,15 @@ def sequence(_object=None, **kwargs):
 
 
 def Hexagons(rows=1, cols=1, sides=None, **kwargs):
-    """Draw a set of hexagons in a pattern."""
+    """Draw a set of hexagons in a pattern.
+
+    Returns:
+        HexGrid - a list of Locales, one per hexagon, that can also be used to
+        find neighbours, distances, ranges, lines of sight and paths
+    """
     kwargs = kwargs
     locales = []  # list of Locale namedtuples
+    hxgn = None
     if kwargs.get('hidden'):
         hidden = tools.integer_pairs(kwargs.get('hidden'), 'hidden')
     else:
@@ -1107,6 +1459,7 @@ def Hexagons(rows=1, cols=1, sides=None, **kwargs):
     def draw_hexagons(
             rows: int, cols: int, stop: int, the_cols: list, odd_mid: bool = True):
         """Draw rows of hexagons for each column in `the_cols`"""
+        nonlocal hxgn
         sequence = 0
         top_row = 0
         end_row = rows - 1
@@ -1200,11 +1553,19 @@ def Hexagons(rows=1, cols=1, sides=None, **kwargs):
                     locales.append(_locale)
                     sequence += 1
 
-    return locales
+    if not locales:
+        return HexGrid()
+    _, _, side, _ = hxgn.hex_height_width()
+    return HexGrid(locales, orientation=hxgn.orientation, hex_offset=hxgn.hex_offset,
+                   side=side)
 
 
 def Rectangles(rows=1, cols=1, **kwargs):
-    """Draw a set of rectangles in a pattern."""
+    """Draw a set of rectangles in a pattern.
+
+    Returns:
+        LocationTable - a list of Locales, one per rectangle, with its centre
+    """
     kwargs = kwargs
     locales = []  # list of Locale namedtuples
     if kwargs.get('hidden'):
@@ -1228,34 +1589,47 @@ def Rectangles(rows=1, cols=1, **kwargs):
                     sequence=sequence,
                     label=rect.label)
                 kwargs['locale'] = _locale._asdict()
-                Rectangle(row=row, col=col, **kwargs)
-                locales.append(_locale)
+                rect = Rectangle(row=row, col=col, **kwargs)
+                locales.append(_locale._replace(
+                    x=rect.grid.x, y=rect.grid.y, label=rect.label or rect.grid.label))
                 sequence += 1
 
-    return locales
+    return LocationTable(locales)
 
 
 def Squares(rows=1, cols=1, **kwargs):
-    """Draw a set of squares in a pattern."""
+    """Draw a set of squares in a pattern.
+
+    Returns:
+        LocationTable - a list of Locales, one per square, with its centre
+    """
     kwargs = kwargs
-    locations = []
+    locales = []  # list of Locale namedtuples
     if kwargs.get('hidden'):
         hidden = tools.integer_pairs(kwargs.get('hidden'), 'hidden')
     else:
         hidden = None
 
+    sequence = 0
     for row in range(rows):
         for col in range(cols):
             if hidden and (row + 1, col + 1) in hidden:
                 pass
             else:
                 square = Square(row=row, col=col, **kwargs)
-                locations.append(square.grid)
+                locales.append(Locale(
+                    col=col, row=row,
+                    x=square.grid.x, y=square.grid.y,
+                    id=f"{col}:{row}",
+                    sequence=sequence,
+                    label=square.grid.label))
+                sequence += 1
 
-    return locations
+    return LocationTable(locales)
 
 
 def Location(grid: list, label: str, shapes: list, **kwargs):
+    """Draw shapes at the centre of the location, in a grid, with a label."""
     kwargs = kwargs
 
     def test_foo(x: bool = True, **kwargs):
@@ -1291,12 +1665,8 @@ def Location(grid: list, label: str, shapes: list, **kwargs):
         tools.feedback("The grid (as a list) must be supplied!", True)
 
     # get location centre from grid via the label
-    locale, point = None, None
-    for _locale in grid:
-        if _locale.label.lower() == str(label).lower():
-            point = Point(_locale.x, _locale.y)
-            locale = _locale
-            break
+    locale = LocationTable.of(grid).find(label)
+    point = Point(locale.x, locale.y) if locale else None
     if point is None:
         msg = ''
         if label and ',' in label:
@@ -1315,34 +1685,46 @@ def Location(grid: list, label: str, shapes: list, **kwargs):
                 draw_shape(shape, point, locale)
 
 
-def Locations(grid: list, labels: Union[str, list], shapes: list, **kwargs):
+def Locations(grid: list, labels: Union[str, list, dict], shapes: list = None, **kwargs):
+    """Draw shapes at the centre of each of the locations, in a grid, with a label.
+
+    The `labels` can also be a dict of label(s): list of shapes; so that different
+    shapes are drawn at each location.  A key can be a comma-delimited string.
+    """
     kwargs = kwargs
 
     if grid is None or not isinstance(grid, list):
         tools.feedback("The grid (as a list) must be supplied!", True)
     if labels is None:
         tools.feedback("No grid location labels supplied!", True)
-    if shapes is None:
-        tools.feedback("No list of shapes supplied!", True)
-    if isinstance(labels, str):
-        _labels = [_label.strip() for _label in labels.split(',')]
-        if labels.lower() == 'all' or labels.lower() == '*':
-            _labels = []
-            for loc in grid:
-                if isinstance(loc, Locale):
-                    _labels.append(loc.label)
-    elif isinstance(labels, list):
-        _labels = labels
+    table = LocationTable.of(grid)  # index the grid once for all the labels
+    if isinstance(labels, dict):
+        placements = [
+            (_label.strip(), _shapes) for key, _shapes in labels.items()
+            for _label in str(key).split(',')]
     else:
-        tools.feedback(
-            "Grid location labels must be a list or a comma-delimited string!", True)
-
-    if not isinstance(shapes, list):
-        tools.feedback("Shapes must contain a list of shapes!", True)
+        if shapes is None:
+            tools.feedback("No list of shapes supplied!", True)
+        if isinstance(labels, str):
+            _labels = [_label.strip() for _label in labels.split(',')]
+            if labels.lower() == 'all' or labels.lower() == '*':
+                _labels = []
+                for loc in table:
+                    if isinstance(loc, Locale):
+                        _labels.append(loc.label)
+        elif isinstance(labels, list):
+            _labels = labels
+        else:
+            tools.feedback(
+                "Grid location labels must be a list, dict or a comma-delimited string!",
+                True)
+        placements = [(label, shapes) for label in _labels]
 
-    for label in _labels:
-        # tools.feedback(f'{label=} :: {shapes=}')
-        Location(grid, label, shapes)
+    for label, _shapes in placements:
+        if not isinstance(_shapes, list):
+            tools.feedback("Shapes must contain a list of shapes!", True)
+        # tools.feedback(f'{label=} :: {_shapes=}')
+        Location(table, label, _shapes)
 
 
 def LinkLine(grid: list, locations: Union[list, str], **kwargs):
@@ -1355,40 +1737,30 @@ def LinkLine(grid: list, locations: Union[list, str], **kwargs):
     if len(locations) < 2:
         tools.feedback("There should be at least 2 locations to create links!", True)
     dummy = base_shape()  # a BaseShape - not drawable!
-    for index, location in enumerate(locations):
+    table = LocationTable.of(grid)
+    # get each location centre from grid via the label
+    _locations, points = [], []
+    for location in locations:
         # precheck
+        if isinstance(location, Locale):
+            location = (location.label, 0, 0)
         if isinstance(location, str):
             location = (location, 0, 0)  # reformat into standard notation
         if not isinstance(location, tuple) or len(location) != 3:
             tools.feedback(
                 f"The location '{location}' is not valid -- please check its syntax!",
                 True)
-        # get location centre from grid via the label
-        loc = None
-        for position in grid:
-            if location[0] == position.label:
-                loc = Point(position.x, position.y)
-                break
-        if loc is None:
+        position = table.find(location[0])
+        if position is None:
             tools.feedback(f"The location '{location[0]}' is not in the grid!", True)
+        _locations.append(location)
+        points.append(Point(position.x, position.y))
+    for index, location in enumerate(_locations):
+        loc = points[index]
         # new line?
-        if index + 1 < len(locations):
+        if index + 1 < len(_locations):
             # location #2
-            location_2 = locations[index + 1]
-            if isinstance(location_2, str):
-                location_2 = (location_2, 0, 0)  # reformat into standard notation
-            if not isinstance(location_2, tuple) or len(location_2) != 3:
-                tools.feedback(
-                    f"The location '{location_2}' is not valid - please check its syntax!",
-                    True)
-            loc_2 = None
-            for position in grid:
-                if location_2[0] == position.label:
-                    loc_2 = Point(position.x, position.y)
-                    break
-            if loc_2 is None:
-                tools.feedback(
-                    f"The location '{location_2[0]}' is not in the grid!", True)
+            location_2, loc_2 = _locations[index + 1], points[index + 1]
             if location == location_2:
                 tools.feedback(
                     "Locations must differ from each other - "
@@ -1424,13 +1796,13 @@ def Layout(grid, **kwargs):
     corners = kwargs.get('corners', [])  # shapes or Places for corners only!
     rotations = kwargs.get('rotations', [])  # rotations for an edge
     if kwargs.get('masked') and isinstance(kwargs.get('masked'), str):
-        masked = tools.sequence_split(kwargs.get('masked'), 'masked')
+        masked = set(tools.sequence_split(kwargs.get('masked')))
     else:
-        masked = kwargs.get('masked', [])
+        masked = set(kwargs.get('masked') or [])
     if kwargs.get('visible') and isinstance(kwargs.get('visible'), str):
-        visible = tools.integer_pairs(kwargs.get('visible'), 'visible')
+        visible = set(tools.sequence_split(kwargs.get('visible')))
     else:
-        visible = kwargs.get('visible', [])
+        visible = set(kwargs.get('visible') or [])
 
     # ---- validate inputs
     if not shapes:
@@ -1467,25 +1839,23 @@ def Layout(grid, **kwargs):
 
     # ---- setup locations; automatically or via user-specification
     shape_id = 0
-    default_locations = enumerate(grid.next_locale())
     if not locations:
-        _locations = default_locations
+        _locations = enumerate(grid.locales())
     else:
         _locations = []
         user_locations = tools.integer_pairs(locations, label='locations')
         # restructure and pick locations according to user input
         for key, user_loc in enumerate(user_locations):
-            for loc in default_locations:
-                if user_loc[0] == loc[1].col and user_loc[1] == loc[1].row:
-                    new_loc = (
-                        key, Locale(
-                            col=loc[1].col, row=loc[1].row,
-                            x=loc[1].x, y=loc[1].y,
-                            id=f"{loc[1].col}:{loc[1].row}",  # ,loc[1].id,
-                            sequence=key,
-                            corner=loc[1].corner))
-                    _locations.append(new_loc)
-            default_locations = enumerate(grid.next_locale())  # regenerate !
+            loc = grid.locale(user_loc[0], user_loc[1])
+            if loc:
+                new_loc = (
+                    key, Locale(
+                        col=loc.col, row=loc.row,
+                        x=loc.x, y=loc.y,
+                        id=f"{loc.col}:{loc.row}",  # ,loc.id,
+                        sequence=key,
+                        corner=loc.corner))
+                _locations.append(new_loc)
 
     # ---- generate rotations - keyed per sequence number
     rotation_sequence = {}
@@ -1633,6 +2003,8 @@ def Track(track=None, **kwargs):
     stop = tools.as_int(kwargs.get('stop', None), 'stop', allow_none=True)
     start = tools.as_int(kwargs.get('start', None), 'start', allow_none=True)
     sequences = kwargs.get('sequences', [])  # which sequence positions to show
+    count = tools.as_int(kwargs.get('count', None), 'count', allow_none=True)
+    distances = kwargs.get('distances', [])  # positions along the track
 
     # ---- check kwargs inputs
     if sequences and isinstance(sequences, str):
@@ -1640,11 +2012,20 @@ def Track(track=None, **kwargs):
     if sequences and stop:
         tools.feedback(
             "Both stop and sequences cannot be used together for a Track!", True)
+    if count and distances:
+        tools.feedback(
+            "Both count and distances cannot be used together for a Track!", True)
+    if distances and not isinstance(distances, (list, tuple)):
+        tools.feedback("The distances for a Track must be a list of numbers!", True)
+    along_path = bool(count or distances)  # else use vertices (or angles)
     if not track:
         track = Polygon(sides=4, fill=None)
     track_name = track.__class__.__name__
     track_abbr = track_name.replace('Shape', '')
-    if track_name == 'CircleShape':
+    if along_path:
+        if not hasattr(track, 'get_path'):
+            tools.feedback(f"Unable to use a {track_abbr} for a Track!", True)
+    elif track_name == 'CircleShape':
         if not angles or not isinstance(angles, list) or len(angles) < 2:
             tools.feedback(
                 f"A list of 2 or more angles is needed for a Circle-based Track!", True)
@@ -1661,8 +2042,12 @@ def Track(track=None, **kwargs):
         tools.feedback(f"Unable to use a {track_abbr} for a Track!", True)
     if rotation_style:
         _rotation_style = str(rotation_style).lower()
-        if _rotation_style not in ['o', 'outwards', 'inwards', 'i' ]:
+        if _rotation_style not in ['o', 'outwards', 'inwards', 'i', 't', 'tangent']:
             tools.feedback(f"The rotation_style '{rotation_style}' is not valid", True)
+        if _rotation_style in ['t', 'tangent'] and not along_path:
+            tools.feedback(
+                f"The rotation_style '{rotation_style}' needs a count or distances",
+                True)
     else:
         _rotation_style = None
     shapes = kwargs.get('shapes', [])  # shape(s) to draw at the locations
@@ -1671,8 +2056,24 @@ def Track(track=None, **kwargs):
                        False, True)
 
     track_points = []  # a list of Ray tuples
+    tangents = []  # direction of travel along the track; for each Ray
+    # ---- create points spaced along the track's path
+    if along_path:
+        table = paths.path_table(track.get_path())  # cached; flattened once
+        if table.closed and bool(clockwise) != table.clockwise:
+            table = table.reversed()
+        if count:
+            _distances = table.spaced(count)
+        else:
+            _distances = [
+                track.unit(tools.as_float(distance, 'distances'))
+                for distance in distances]
+        for distance in _distances:
+            ray = table.at(distance)
+            tangents.append(ray.angle)
+            track_points.append(Ray(ray.x, ray.y, table.normal(ray.angle)))
     # ---- create Circle vertices and angles
-    if track_name == 'CircleShape':
+    elif track_name == 'CircleShape':
         # calculate vertices along circumference
         for angle in angles:
             c_pt = geoms.point_on_circle(
@@ -1690,7 +2091,7 @@ def Track(track=None, **kwargs):
                 Ray(vertex.x, vertex.y, angles[key]))
 
     # ---- change drawing order
-    if clockwise is not None and clockwise:
+    if clockwise is not None and clockwise and not along_path:
         track_points = list(reversed(track_points))
         _swop = len(track_points) - 1
         track_points = track_points[_swop:] + track_points[:_swop]
@@ -1704,6 +2105,7 @@ def Track(track=None, **kwargs):
                 f'The start value "{start}" must be less than the number of vertices!',
                 True)
         track_points = track_points[_start:] + track_points[:_start]
+        tangents = tangents[_start:] + tangents[:_start]
 
     # ---- walk the track & draw shape(s)
     shape_id = 0
@@ -1737,6 +2139,8 @@ def Track(track=None, **kwargs):
                     shape_rotation = 90 + track_point.angle
                 case 'o' | 'outwards':
                     shape_rotation = track_point.angle - 90
+                case 't' | 'tangent':
+                    shape_rotation = tangents[index]
                 case _:
                     raise NotImplementedError(
                         f"The rotation_style '{_rotation_style}' is not valid")
@@ -1839,6 +2243,101 @@ def dice(dice='1d6', rolls=None):
     return Dice().multi_roll(count=rolls, pips=pips, dice=_type)
 
 
+def dice_odds(dice='2d6', exact=True, trials=100000, seed=None) -> Distribution:
+    """Return the chances of each total for a dice expression.
+
+    Args:
+        dice: expression e.g. '3d6+1', '4d6kh3', 'd6!' or 'd8+d10-2'; or (if
+            not exact) a function used to simulate the results
+        exact: if False, the chances are found by rolling `trials` times
+
+    Examples:
+    >>> dice_odds('2d6').chance(7)
+    Fraction(1, 6)
+    >>> float(dice_odds('2d20kh1').at_least(19))
+    0.19
+    """
+    if isinstance(dice, Distribution):
+        return dice
+    if exact and not callable(dice):
+        return Distribution.parse(dice)
+    return simulate(dice, trials=trials, seed=seed)
+
+
+def dice_table(dice='2d6', x=0, y=0, width=4, height=None, columns=None,
+               decimals=1, font_size=7, exact=True, trials=100000, seed=None,
+               **kwargs) -> GroupBase:
+    """Return a group of Text shapes; a table of the chances of each dice total.
+
+    Args:
+        x, y: location of the lower-left of the table
+        width: width of the table; the columns share it equally
+        height: height of the table; by default, based on the font_size
+        columns: any of 'Value', 'Chance', 'At Least' and 'At Most'; all are
+            shown by default
+        decimals: number of decimal places for the (percentage) chances
+
+    Any other properties - e.g. stroke or font_name - are used for each Text.
+    """
+    rows = dice_odds(dice, exact, trials, seed).table(decimals=decimals)
+    headers = rows[0]
+    columns = columns or headers
+    keys = []
+    for column in columns:
+        if column not in headers:
+            tools.feedback(f'The dice_table column "{column}" must be one of {headers}', True)
+        keys.append(headers.index(column))
+    row_height = height / len(rows) if height else font_size * 1.25 / globals.units
+    col_width = width / len(keys)
+    shapes = []
+    for number, row in enumerate(rows):
+        for col, key in enumerate(keys):
+            shapes.append(text(
+                text=str(row[key]), font_size=font_size,
+                x=x + (col + 0.5) * col_width,
+                y=y + (len(rows) - number - 1) * row_height + 0.25 * row_height,
+                **kwargs))
+    return group(*shapes)
+
+
+def dice_chart(dice='2d6', x=0, y=0, width=5, height=3, at_least=False,
+               labels=True, font_size=6, fill='grey', stroke='black',
+               exact=True, trials=100000, seed=None, **kwargs) -> GroupBase:
+    """Return a group of Rectangle (and Text) shapes; a bar chart of dice totals.
+
+    Args:
+        x, y: location of the lower-left of the chart
+        width, height: size of the chart, including any labels
+        at_least: if True, each bar is the chance of that total or higher
+        labels: if True, each bar has its total below it and its chance (as a
+            percentage) above it
+
+    Any other properties - e.g. stroke_width - are used for each Rectangle.
+    """
+    odds = dice_odds(dice, exact, trials, seed)
+    values = odds.values
+    chances = [float(odds.at_least(value) if at_least else odds.chance(value))
+               for value in values]
+    label = font_size * 1.25 / globals.units if labels else 0
+    bar_width = width / len(values)
+    bar_height = height - 2 * label
+    top = max(chances)
+    shapes = []
+    for key, (value, chance) in enumerate(zip(values, chances)):
+        left, tall = x + key * bar_width, bar_height * chance / top
+        shapes.append(rectangle(
+            x=left, y=y + label, width=bar_width, height=tall, fill=fill,
+            stroke=stroke, **kwargs))
+        if labels:
+            shapes.append(text(
+                text=str(value), font_size=font_size, stroke=stroke,
+                x=left + bar_width / 2, y=y + 0.25 * label))
+            shapes.append(text(
+                text=f'{100 * chance:.0f}', font_size=font_size, stroke=stroke,
+                x=left + bar_width / 2, y=y + label + tall + 0.25 * label))
+    return group(*shapes)
+
+
 def d4(rolls=None):
     return DiceD4().roll(count=rolls)
 
@@ -10,19 +10,20 @@ import math
 import os
 from pathlib import Path
 import random
+from types import MappingProxyType
 from urllib.parse import urlparse
 # third party
-from reportlab.platypus import Paragraph
-from reportlab.lib.styles import ParagraphStyle
+from jinja2.environment import Template
 from reportlab.lib.pagesizes import (
     A8, A7, A6, A5, A4, A3, A2, A1, A0, LETTER, LEGAL, ELEVENSEVENTEEN,
     letter, legal, elevenSeventeen, B6, B5, B4, B3, B2, B0, landscape)
 from reportlab.lib.colors import red, green, black
 # local
 from protograf.utils.geoms import Point, Link, Locale  # named tuples
-from protograf.utils import geoms, tools, support
+from protograf import backends
+from protograf.utils import downloads, fonts, geoms, rng, tools, support
 from protograf.base import (
-    BaseShape, BaseCanvas, GridShape,
+    BaseShape, BaseCanvas, GridShape, batched, common_style, style_properties,
     UNITS, COLORS, PAGES, DEBUG_COLOR,
     CACHE_DIRECTORY, BGG_IMAGES)
 
@@ -51,14 +52,20 @@ class ImageShape(BaseShape):
     def __init__(self, _object=None, canvas=None, **kwargs):
         super(ImageShape, self).__init__(_object=_object, canvas=canvas, **kwargs)
         # overrides / extra args
-        default_cache = Path(Path.home() / CACHE_DIRECTORY / 'images')
-        default_cache.mkdir(parents=True, exist_ok=True)
-        self.cache_directory = kwargs.get('cache_directory', str(default_cache))
+        self.cache_directory = kwargs.get('cache_directory', self.default_cache())
         if not os.path.exists(self.cache_directory):
             tools.feedback(
                 'Unable to create or find the cache directory:'
                 f' {str(self.cache_directory)}', True)
 
+    @staticmethod
+    def default_cache() -> str:
+        """Return the directory used to cache images from URLs."""
+        default_cache = Path(Path.home() / CACHE_DIRECTORY / 'images')
+        default_cache.mkdir(parents=True, exist_ok=True)
+        return str(default_cache)
+
+    @staticmethod
     def set_cached_dir(source):
         """Set special cached directory, depending on source being a URL."""
         if not tools.is_url_valid(url=source):
@@ -72,6 +79,33 @@ class ImageShape(BaseShape):
             return str(the_cache)
         return None
 
+    def image_urls(self, dataset: list = None) -> dict:
+        """Return the URLs of all the images this shape can show, by cache.
+
+        The source can be a URL; a list (one per card); a T() template,
+        filled in for every record in the dataset; or an L() lookup.
+
+        Returns:
+            dict of cache directory: list of URLs
+        """
+        sources = self.source
+        if isinstance(sources, Template):
+            sources = []
+            for record in dataset or []:
+                try:
+                    sources.append(self.source.render(record))
+                except Exception:
+                    pass  # any error is reported when drawn
+        elif isinstance(sources, support.LookupType):
+            sources = list(sources.lookups.values())
+            if self.source.result is not None:
+                sources = [record.get(self.source.result) for record in sources]
+        urls = {}
+        for url in downloads.find_urls(sources):
+            directory = self.set_cached_dir(url) or str(self.cache_directory)
+            urls.setdefault(directory, []).append(url)
+        return urls
+
     def draw(self, cnv=None, off_x=0, off_y=0, ID=None, **kwargs):
         """Show an image on a given canvas."""
         kwargs = self.kwargs | kwargs
@@ -114,6 +148,10 @@ class ImageShape(BaseShape):
                 f'Unable to load image "{_source}!" - please check name and location',
                 True)
         rotation = kwargs.get('rotation', self.rotation)
+        # an image is drawn with the fill alpha; which is 0 after an unfilled
+        # shape (e.g. a card's outline) has been drawn
+        cnv.saveState()
+        cnv.setFillAlpha(1)
         # assumes 1 pt == 1 pixel ?
         if rotation:
             # ---- rotated image
@@ -128,8 +166,7 @@ class ImageShape(BaseShape):
             cnv.rotate(rotation)
             # draw the image relative to the origin
             if is_svg:
-                from reportlab.graphics import renderPDF
-                renderPDF.draw(img, cnv, x=-width / 2.0, y=-height / 2.0)
+                backends.draw_drawing(cnv, img, x=-width / 2.0, y=-height / 2.0)
             else:
                 cnv.drawImage(
                     img,
@@ -142,11 +179,11 @@ class ImageShape(BaseShape):
         else:
             # ---- normal image
             if is_svg:
-                from reportlab.graphics import renderPDF
-                renderPDF.draw(img, cnv, x=x, y=y)
+                backends.draw_drawing(cnv, img, x=x, y=y)
             else:
                 # TODO -> use height=10 OR width=12 AND preserveAspectRatio=True
                 cnv.drawImage(img, x=x, y=y, width=width, height=height, mask="auto")
+        cnv.restoreState()
         # ---- text
         xc = x + width / 2.0
         yc = y + height / 2.0
@@ -169,6 +206,16 @@ class ArcShape(BaseShape):
     Arc on a given canvas.
     """
 
+    def get_path(self) -> tuple:
+        """Return path commands (in points) for the arc, e.g. for a Track."""
+        x_1 = self._u.x + self._o.delta_x
+        y_1 = self._u.y + self._o.delta_y
+        x_2 = self.unit(self.x_1 or self.x + self.default_length) + self._o.delta_x
+        y_2 = self.unit(self.y_1 or self.y + self.default_length) + self._o.delta_y
+        return (
+            ('A', (x_1 + x_2) / 2.0, (y_1 + y_2) / 2.0,
+             abs(x_2 - x_1) / 2.0, abs(y_2 - y_1) / 2.0, self.angle, self.angle_width),)
+
     def draw(self, cnv=None, off_x=0, off_y=0, ID=None, **kwargs):
         """Draw arc on a given canvas."""
         kwargs = self.kwargs | kwargs
@@ -294,6 +341,18 @@ class BezierShape(BaseShape):
     from (x1,y1) to (x2,y2) and a line segment from (x3,y3) to (x4,y4)
     """
 
+    def get_path(self) -> tuple:
+        """Return path commands (in points) for the curve, e.g. for a Track."""
+        x_1 = self._u.x + self._o.delta_x
+        y_1 = self._u.y + self._o.delta_y
+        x_2 = self.unit(self.x_1 or self.x + self.default_length) + self._o.delta_x
+        y_2 = self.unit(self.y_1 or self.y + self.default_length) + self._o.delta_y
+        x_3 = self.unit(self.x_2) + self._o.delta_x
+        y_3 = self.unit(self.y_2) + self._o.delta_y
+        x_4 = self.unit(self.x_3) + self._o.delta_x
+        y_4 = self.unit(self.y_3) + self._o.delta_y
+        return (('M', x_1, y_1), ('C', x_2, y_2, x_3, y_3, x_4, y_4))
+
     def draw(self, cnv=None, off_x=0, off_y=0, ID=None, **kwargs):
         """Draw Bezier curve on a given canvas."""
         kwargs = self.kwargs | kwargs
@@ -339,6 +398,16 @@ class CircleShape(BaseShape):
         # ---- RESET UNIT PROPS (last!)
         self.set_unit_properties()
 
+    def get_path(self) -> tuple:
+        """Return path commands (in points) for the circle, e.g. for a Track.
+
+        The path starts at the East; and goes anti-clockwise.
+        """
+        return (
+            ('A', self._u.cx + self._o.delta_x, self._u.cy + self._o.delta_y,
+             self._u.radius, self._u.radius, 0, 360),
+            ('Z',))
+
     def calculate_centre(self):
         # ---- calculated centre
         if self.use_abs_c:
@@ -360,6 +429,7 @@ class CircleShape(BaseShape):
         else:
             return length
 
+    @batched
     def draw_hatch(self, cnv, ID, num: int, x_c: float, y_c: float):
         """Draw line(s) from one edge to the other.
 
@@ -497,10 +567,10 @@ class CircleShape(BaseShape):
                 stroke_width=self.radii_stroke_width,
                 dashed=self.radii_dashed,
                 dotted=self.radii_dotted)
+            pth = cnv.beginPath()  # all radii in one path
             for rad_angle in _radii:
                 # points based on length of line, offset and the angle in degrees
                 diam_pt = geoms.point_on_circle(Point(x_c, y_c), rad_length, rad_angle)
-                pth = cnv.beginPath()
                 if rad_offset is not None and rad_offset != 0:
                     offset_pt = geoms.point_on_circle(Point(x_c, y_c), rad_offset, rad_angle)
                     end_pt = geoms.point_on_line(offset_pt, diam_pt, rad_length)
@@ -510,7 +580,7 @@ class CircleShape(BaseShape):
                 else:
                     pth.moveTo(x_c, y_c)
                     pth.lineTo(diam_pt.x, diam_pt.y)
-                cnv.drawPath(pth, stroke=1 if self.stroke else 0, fill=1 if self.fill else 0)
+            cnv.drawPath(pth, stroke=1 if self.stroke else 0, fill=0)
 
     def draw_petals(self, cnv, ID, x_c: float, y_c: float):
         """Draw "petals" going outwards from the circumference.
@@ -1195,6 +1265,7 @@ class EquilateralTriangleShape(BaseShape):
     Equilateral Triangle on a given canvas.
     """
 
+    @batched
     def draw_hatch(self, cnv, ID, side: float, vertices: list, num: int):
         self.set_canvas_props(
             index=ID,
@@ -1400,6 +1471,15 @@ class HexShape(BaseShape):
                 True)
         return radius, diameter, side, half_flat
 
+    def fit_size(self) -> tuple:
+        """Return the (width, height) of the hexagon, in points, used to fit text."""
+        width, height = self.width, self.height  # hex_height_width() resets these
+        radius, diameter, side, half_flat = self.hex_height_width()
+        self.width, self.height = width, height
+        if self.orientation.lower() in ['p', 'pointy']:
+            return 2 * half_flat, diameter
+        return diameter, 2 * half_flat
+
     def calculate_caltrops(self, side, size=None, fraction=None, invert=False):
         """Calculate settings for caltrops (the hex "corner").
 
@@ -1472,6 +1552,7 @@ class HexShape(BaseShape):
         # ---- draw coord (optional)
         if self.coord_elevation:
             # ---- * set coord props
+            fonts.register_font(self.coord_font_face)
             cnv.setFont(self.coord_font_face, self.coord_font_size)
             cnv.setFillColor(self.coord_stroke)
             coord_offset = self.unit(self.coord_offset)
@@ -1502,6 +1583,7 @@ class HexShape(BaseShape):
             stroke=self.link_stroke,
             stroke_width=self.link_width,
             stroke_cap=self.link_cap)
+        pth = cnv.beginPath()  # all links in one path
         _links = links.split(",")
         for _link in _links:
             parts = _link.split()
@@ -1532,7 +1614,7 @@ class HexShape(BaseShape):
                                              vertices[vb_end].y - side / 2.0)
                         top_corner = Point(vertices[vb_end].x + side / 2.0,
                                            vertices[vb_end].y + side / 2.0)
-                        cnv.arc(
+                        pth.arc(
                             lower_corner.x, lower_corner.y,
                             top_corner.x, top_corner.y,
                             startAng=0,
@@ -1543,7 +1625,7 @@ class HexShape(BaseShape):
                                              vertices[vb_end].y - side / 2.0)
                         top_corner = Point(vertices[vb_end].x + side / 2.0,
                                            vertices[vb_end].y + side / 2.0)
-                        cnv.arc(
+                        pth.arc(
                             lower_corner.x, lower_corner.y,
                             top_corner.x, top_corner.y,
                             startAng=-60,
@@ -1560,14 +1642,14 @@ class HexShape(BaseShape):
                         vertices[va_start], vertices[va_end], side / 2.0)
                     b_mid = geoms.point_on_line(
                         vertices[vb_start], vertices[vb_end], side / 2.0)
-                    pth = cnv.beginPath()
                     pth.moveTo(*a_mid)
                     pth.lineTo(*b_mid)
-                    cnv.drawPath(pth, stroke=1, fill=1 if self.fill else 0)
                 case _:
                     raise NotImplementedError(
                         f'Unable to handle hex "{separation=}"')
+        cnv.drawPath(pth, stroke=1, fill=0)
 
+    @batched
     def draw_radii(self, cnv, ID, centre: Point, vertices: list):
         """Draw line(s) connecting the Hexagon centre to a vertex.
         """
@@ -1668,12 +1750,12 @@ class HexShape(BaseShape):
                 if 'se' in perbis_dirs:
                     _dirs.append(4)
 
+        pth = cnv.beginPath()  # all perbis lines in one path
         for key, pb_angle in enumerate(_perbis):
             if self.perbis and key not in _dirs:
                 continue
             # points based on length of line, offset and the angle in degrees
             edge_pt = _perbis_pts[key]
-            pth = cnv.beginPath()
             if pb_offset is not None and pb_offset != 0:
                 offset_pt = geoms.point_on_circle(centre, pb_offset, pb_angle)
                 end_pt = geoms.point_on_line(offset_pt, edge_pt, pb_length)
@@ -1683,9 +1765,10 @@ class HexShape(BaseShape):
             else:
                 pth.moveTo(centre.x, centre.y)
                 pth.lineTo(edge_pt.x, edge_pt.y)
-            cnv.drawPath(pth, stroke=1 if self.stroke else 0, fill=1 if self.fill else 0)
             # cnv.drawCentredString(edge_pt.x, edge_pt.y, f"{key}")  # test
+        cnv.drawPath(pth, stroke=1 if self.stroke else 0, fill=0)
 
+    @batched
     def draw_hatch(self, cnv, ID, side: float, vertices: list, num: int):
         """Draw lines connecting two opposite sides and parallel to adjacent side.
         """
@@ -1982,6 +2065,19 @@ class LineShape(BaseShape):
     Line on a given canvas.
     """
 
+    def get_path(self) -> tuple:
+        """Return path commands (in points) for the line, e.g. for a Track."""
+        x = self._u.x + self._o.delta_x
+        y = self._u.y + self._o.delta_y
+        if self.x_1 or self.y_1:
+            x_1 = self.unit(self.x_1) + self._o.delta_x
+            y_1 = self.unit(self.y_1) + self._o.delta_y
+        else:
+            angle = math.radians(self.angle or 0)
+            x_1 = x + (self._u.length * math.cos(angle))
+            y_1 = y + (self._u.length * math.sin(angle))
+        return (('M', x, y), ('L', x_1, y_1))
+
     def draw(self, cnv=None, off_x=0, off_y=0, ID=None, **kwargs):
         """Draw a line on a given canvas."""
         kwargs = self.kwargs | kwargs
@@ -2079,6 +2175,11 @@ class PolygonShape(BaseShape):
             radius = side / (2.0 * math.sin(math.pi / sides))
         return radius
 
+    def fit_size(self) -> tuple:
+        """Return the (width, height) of the polygon, in points, used to fit text."""
+        diameter = 2.0 * self.get_radius()
+        return diameter, diameter
+
     def calculate_area(self) -> float:
         sides = tools.as_int(self.sides, 'sides')
         radius = self.get_radius()
@@ -2167,12 +2268,12 @@ class PolygonShape(BaseShape):
             stroke_width=self.perbis_stroke_width,
             dashed=self.perbis_dashed,
             dotted=self.perbis_dotted)
+        pth = cnv.beginPath()  # all perbis lines in one path
         for key, pb_angle in enumerate(_perbis):
             if self.perbis and key + 1 not in self.perbis:
                 continue
             # points based on length of line, offset and the angle in degrees
             edge_pt = _perbis_pts[key]
-            pth = cnv.beginPath()
             if pb_offset is not None and pb_offset != 0:
                 offset_pt = geoms.point_on_circle(centre, pb_offset, pb_angle)
                 end_pt = geoms.point_on_line(offset_pt, edge_pt, pb_length)
@@ -2182,8 +2283,8 @@ class PolygonShape(BaseShape):
             else:
                 pth.moveTo(centre.x, centre.y)
                 pth.lineTo(edge_pt.x, edge_pt.y)
-            cnv.drawPath(pth, stroke=1 if self.stroke else 0, fill=1 if self.fill else 0)
             # cnv.drawCentredString(edge_pt.x, edge_pt.y, f"{key}")  # test
+        cnv.drawPath(pth, stroke=1 if self.stroke else 0, fill=0)
 
     def draw_radii(
             self, cnv, ID, centre: Point = None, vertices: list = None, rotation: float = None):
@@ -2206,10 +2307,10 @@ class PolygonShape(BaseShape):
             stroke_width=self.radii_stroke_width,
             dashed=self.radii_dashed,
             dotted=self.radii_dotted)
+        pth = cnv.beginPath()  # all radii in one path
         for rad_angle in _radii:
             # points based on length of line, offset and the angle in degrees
             diam_pt = geoms.point_on_circle(centre, rad_length, rad_angle)
-            pth = cnv.beginPath()
             if rad_offset is not None and rad_offset != 0:
                 offset_pt = geoms.point_on_circle(centre, rad_offset, rad_angle)
                 end_pt = geoms.point_on_line(offset_pt, diam_pt, rad_length)
@@ -2219,7 +2320,7 @@ class PolygonShape(BaseShape):
             else:
                 pth.moveTo(centre.x, centre.y)
                 pth.lineTo(diam_pt.x, diam_pt.y)
-            cnv.drawPath(pth, stroke=1 if self.stroke else 0, fill=1 if self.fill else 0)
+        cnv.drawPath(pth, stroke=1 if self.stroke else 0, fill=0)
 
     def get_vertices(self, rotation: float = None, is_rotated: bool = False):
         """Calculate vertices of polygon.
@@ -2237,6 +2338,10 @@ class PolygonShape(BaseShape):
         # for p in vertices: print(f'*V* {p.x / 28.3465}, {p.y / 28.3465}')
         return vertices
 
+    def get_path(self) -> tuple:
+        """Return path commands (in points) for the polygon, e.g. for a Track."""
+        return tuple(('L', *vertex) for vertex in self.get_vertices()) + (('Z',),)
+
     def get_geometry(self, rotation: float = None, is_rotated: bool = False):
         """Calculate centre, radius and vertices of polygon.
         """
@@ -2355,6 +2460,10 @@ class PolylineShape(BaseShape):
                   self.unit(pt[1]) + self._o.delta_y) for pt in points]
         return vertices
 
+    def get_path(self) -> tuple:
+        """Return path commands (in points) for the polyline, e.g. for a Track."""
+        return tuple(('L', *vertex) for vertex in self.get_vertices())
+
     def draw(self, cnv=None, off_x=0, off_y=0, ID=None, **kwargs):
         """Draw a polyline on a given canvas."""
         kwargs = self.kwargs | kwargs
@@ -2433,6 +2542,30 @@ class RectangleShape(BaseShape):
         # )
         return vertices
 
+    def get_path(self) -> tuple:
+        """Return path commands (in points) for the rectangle, e.g. for a Track.
+
+        Any rounding of the corners is included.
+        """
+        x, y = self.calculate_xy()
+        width, height = self._u.width, self._u.height
+        if self.rounding:
+            rounding = self.unit(self.rounding)
+        elif self.rounded:
+            rounding = self._u.width * 0.08
+        else:
+            return (
+                ('L', x, y), ('L', x + width, y), ('L', x + width, y + height),
+                ('L', x, y + height), ('Z',))
+        rounding = min(rounding, width / 2.0, height / 2.0)
+        return (  # anti-clockwise from bottom-left
+            ('M', x + rounding, y),
+            ('A', x + width - rounding, y + rounding, rounding, rounding, 270, 90),
+            ('A', x + width - rounding, y + height - rounding, rounding, rounding, 0, 90),
+            ('A', x + rounding, y + height - rounding, rounding, rounding, 90, 90),
+            ('A', x + rounding, y + rounding, rounding, rounding, 180, 90),
+            ('Z',))
+
     def set_coord(self, cnv, x_d, y_d):
         """Set (optionally draw) the coords of the rectangle."""
         the_row = self.row or 0
@@ -2468,6 +2601,7 @@ class RectangleShape(BaseShape):
         # ---- draw coord (optional)
         if self.coord_elevation:
             # ---- * set coord props
+            fonts.register_font(self.coord_font_face)
             cnv.setFont(self.coord_font_face, self.coord_font_size)
             cnv.setFillColor(self.coord_stroke)
             coord_offset = self.unit(self.coord_offset)
@@ -2506,6 +2640,7 @@ class RectangleShape(BaseShape):
             y = -self._u.height / 2.0
         return x, y
 
+    @batched
     def draw_hatch(self, cnv, ID, vertices: list, num: int):
         _dirs = tools.validated_directions(
             self.hatch, tools.DirectionGroup.CIRCULAR, 'hatch')
@@ -2542,29 +2677,39 @@ class RectangleShape(BaseShape):
         # ---- draw items
         if num >= 1:
             if 'ne' in _dirs or 'sw' in _dirs or 'd' in _dirs:  # UP to the right
-                pth = cnv.beginPath()
-                pth.moveTo(vertices[0].x, vertices[0].y)
-                pth.lineTo(vertices[2].x, vertices[2].y)
-                cnv.drawPath(pth, stroke=1 if self.stroke else 0, fill=1 if self.fill else 0)
+                self.draw_line_between_points(cnv, vertices[0], vertices[2])
             if 'se' in _dirs or 'nw' in _dirs or 'd' in _dirs:  # DOWN to the right
-                pth = cnv.beginPath()
-                pth.moveTo(vertices[1].x, vertices[1].y)
-                pth.lineTo(vertices[3].x, vertices[3].y)
-                cnv.drawPath(pth, stroke=1 if self.stroke else 0, fill=1 if self.fill else 0)
+                self.draw_line_between_points(cnv, vertices[1], vertices[3])
+            # many lines are drawn as a pattern (see pattern_fits)
+            patterned = self.stroke and self.pattern_fits(cnv, num)
             if 'n' in _dirs or 's' in _dirs or 'o' in _dirs:  # vertical
                 x_dist = self._u.width / (num + 1)
-                for i in range(1, num + 1):
-                    pth = cnv.beginPath()
-                    pth.moveTo(vertices[0].x + i * x_dist, vertices[1].y)
-                    pth.lineTo(vertices[0].x + i * x_dist, vertices[0].y)
-                    cnv.drawPath(pth, stroke=1 if self.stroke else 0, fill=1 if self.fill else 0)
+                if patterned and cnv._lineWidth < x_dist:
+                    self.draw_lines_pattern(
+                        cnv,
+                        Point(vertices[0].x + x_dist, vertices[1].y),
+                        Point(vertices[0].x + x_dist, vertices[0].y),
+                        num, x_dist)
+                else:
+                    for i in range(1, num + 1):
+                        self.draw_line_between_points(
+                            cnv,
+                            Point(vertices[0].x + i * x_dist, vertices[1].y),
+                            Point(vertices[0].x + i * x_dist, vertices[0].y))
             if 'e' in _dirs or 'w' in _dirs or 'o' in _dirs:  # horizontal
                 y_dist = self._u.height / (num + 1)
-                for i in range(1, num + 1):
-                    pth = cnv.beginPath()
-                    pth.moveTo(vertices[0].x, vertices[0].y + i * y_dist)
-                    pth.lineTo(vertices[0].x + self._u.width, vertices[0].y + i * y_dist)
-                    cnv.drawPath(pth, stroke=1 if self.stroke else 0, fill=1 if self.fill else 0)
+                if patterned and cnv._lineWidth < y_dist:
+                    self.draw_lines_pattern(
+                        cnv,
+                        Point(vertices[0].x, vertices[0].y + y_dist),
+                        Point(vertices[0].x + self._u.width, vertices[0].y + y_dist),
+                        num, y_dist)
+                else:
+                    for i in range(1, num + 1):
+                        self.draw_line_between_points(
+                            cnv,
+                            Point(vertices[0].x, vertices[0].y + i * y_dist),
+                            Point(vertices[0].x + self._u.width, vertices[0].y + i * y_dist))
         if num >= 1:
             diag_num = int((num - 1) / 2 + 1)
             x_dist = self._u.width / diag_num
@@ -2583,27 +2728,15 @@ class RectangleShape(BaseShape):
         if 'ne' in _dirs or 'sw' in _dirs or 'd' in _dirs:  # slope UP to the right
             for i in range(1, diag_num):  # top-left side
                 j = diag_num - i
-                pth = cnv.beginPath()
-                pth.moveTo(left_pt[i].x, left_pt[i].y)
-                pth.lineTo(top_pt[j].x, top_pt[j].y)
-                cnv.drawPath(pth, stroke=1 if self.stroke else 0, fill=1 if self.fill else 0)
+                self.draw_line_between_points(cnv, left_pt[i], top_pt[j])
             for i in range(1, diag_num):  # bottom-right side
                 j = diag_num - i
-                pth = cnv.beginPath()
-                pth.moveTo(btm_pt[i].x, btm_pt[i].y)
-                pth.lineTo(rite_pt[j].x, rite_pt[j].y)
-                cnv.drawPath(pth, stroke=1 if self.stroke else 0, fill=1 if self.fill else 0)
+                self.draw_line_between_points(cnv, btm_pt[i], rite_pt[j])
         if 'se' in _dirs or 'nw' in _dirs or 'd' in _dirs:  # slope down to the right
             for i in range(1, diag_num):  # bottom-left side
-                pth = cnv.beginPath()
-                pth.moveTo(left_pt[i].x, left_pt[i].y)
-                pth.lineTo(btm_pt[i].x, btm_pt[i].y)
-                cnv.drawPath(pth, stroke=1 if self.stroke else 0, fill=1 if self.fill else 0)
+                self.draw_line_between_points(cnv, left_pt[i], btm_pt[i])
             for i in range(1, diag_num):  # top-right side
-                pth = cnv.beginPath()
-                pth.moveTo(top_pt[i].x, top_pt[i].y)
-                pth.lineTo(rite_pt[i].x, rite_pt[i].y)
-                cnv.drawPath(pth, stroke=1 if self.stroke else 0, fill=1 if self.fill else 0)
+                self.draw_line_between_points(cnv, top_pt[i], rite_pt[i])
 
     def draw(self, cnv=None, off_x=0, off_y=0, ID=None, **kwargs):
         """Draw a rectangle on a given canvas."""
@@ -3019,6 +3152,17 @@ class RhombusShape(BaseShape):
         vertices.append(Point(x_s + self._u.width / 2.0, y_s - self._u.height / 2.0))
         return vertices
 
+    def get_path(self) -> tuple:
+        """Return path commands (in points) for the rhombus, e.g. for a Track."""
+        if self.cx is not None and self.cy is not None:
+            x = self._u.cx - self._u.width / 2.0 + self._o.delta_x
+            y = self._u.cy - self._u.height / 2.0 + self._o.delta_y
+        else:
+            x = self._u.x + self._o.delta_x
+            y = self._u.y + self._o.delta_y
+        vertices = self.get_vertices(x=x, y=y)
+        return tuple(('L', *vertex) for vertex in vertices) + (('Z',),)
+
     def draw(self, cnv=None, off_x=0, off_y=0, ID=None, **kwargs):
         """Draw a rhombus (diamond) on a given canvas."""
         kwargs = self.kwargs | kwargs
@@ -3451,6 +3595,10 @@ class StarShape(BaseShape):
     Star on a given canvas.
     """
 
+    def fit_size(self) -> tuple:
+        """Return the (width, height) of the star, in points, used to fit text."""
+        return 2.0 * self._u.radius, 2.0 * self._u.radius
+
     def draw(self, cnv=None, off_x=0, off_y=0, ID=None, **kwargs):
         """Draw a star on a given canvas."""
         super().draw(cnv, off_x, off_y, ID, **kwargs)  # unit-based props
@@ -3535,11 +3683,12 @@ class StarFieldShape(BaseShape):
             self.seed = tools.as_float(self.seeding, 'seeding')
         else:
             self.seed = None
+        self.random = None  # set for each draw
 
     def draw_star(self, cnv, position: Point):
         """Draw a single star at a Point (x,y)."""
-        color = self.colors[random.randint(0, len(self.colors) - 1)]
-        size = self.sizes[random.randint(0, len(self.sizes) - 1)]
+        color = self.colors[self.random.randint(0, len(self.colors) - 1)]
+        size = self.sizes[self.random.randint(0, len(self.sizes) - 1)]
         # tools.feedback(f'*** {color=} {size=} {position=}')
         cnv.setFillColor(color)
         cnv.setStrokeColor(color)
@@ -3557,23 +3706,21 @@ class StarFieldShape(BaseShape):
         if isinstance(self.enclosure, PolygonShape):
             x_c, y_c, radius, vertices = self.enclosure.get_geometry()
         stars = 0
-        if self.seed:
-            random.seed(self.seed)
         while stars < self.star_count:
             if isinstance(self.enclosure, RectangleShape):
                 x_y = Point(
-                    random.random() * self.enclosure._u.width + self._o.delta_x,
-                    random.random() * self.enclosure._u.height + self._o.delta_y
+                    self.random.random() * self.enclosure._u.width + self._o.delta_x,
+                    self.random.random() * self.enclosure._u.height + self._o.delta_y
                     )
             elif isinstance(self.enclosure, CircleShape):
-                r_fraction = random.random() * self.enclosure._u.radius
-                angle = math.radians(random.random() * 360.0)
+                r_fraction = self.random.random() * self.enclosure._u.radius
+                angle = math.radians(self.random.random() * 360.0)
                 x = r_fraction * math.cos(angle) + x_c
                 y = r_fraction * math.sin(angle) + y_c
                 x_y = Point(x, y)
             elif isinstance(self.enclosure, PolygonShape):
-                r_fraction = random.random() * radius
-                angle = math.radians(random.random() * 360.0)
+                r_fraction = self.random.random() * radius
+                angle = math.radians(self.random.random() * 360.0)
                 x = r_fraction * math.cos(angle) + x_c
                 y = r_fraction * math.sin(angle) + y_c
                 x_y = Point(x, y)
@@ -3593,7 +3740,7 @@ class StarFieldShape(BaseShape):
         if self.enclosure is None:
             self.enclosure = RectangleShape()
         # ---- calculations
-        random.seed()
+        self.random = random.Random(self.seed) if self.seed else rng.generator('starfield')
         area = math.sqrt(self.enclosure.calculate_area())
         self.star_count = round(self.density * self.points_to_value(area))
         # tools.feedback(f'*** {self.star_pattern =} {self.enclosure}')
@@ -3651,39 +3798,30 @@ class TextShape(BaseShape):
         _text = str(_text)  # card data could be numeric
         if '\\u' in _text:
             _text = codecs.decode(_text, 'unicode_escape')
+        # ---- auto-fit font size
+        _font_size, _leading = self.font_size, self.leading
+        if self.fit:
+            if not self.width:
+                tools.feedback('A width is needed to fit text into a Text shape!', True)
+            _font_size = self.get_fit_size(
+                _text, self.font_size, self._u.height if self.height else None,
+                wrap=self.wrap)
+            _leading = self.leading * _font_size / self.font_size
+            cnv.setFont(self.font_face, _font_size)
         # ---- text style
         if self.wrap:
-            _style = ParagraphStyle(name="sc")
-            _style.textColor = self.stroke
-            _style.backColor = self.fill
-            _style.borderColor = self.outline_stroke
-            _style.borderWidth = self.outline_width
-            _style.alignment = self.to_alignment()
-            _style.fontSize = self.font_size
-            _style.fontName = self.font_face
-            _style.leading = self.leading
-            """
-            # potential other properties
-            leftIndent=0,
-            rightIndent=0,
-            firstLineIndent=0,
-            spaceBefore=0,
-            spaceAfter=0,
-            bulletFontName='Times-Roman',
-            bulletFontSize=10,
-            bulletIndent=0,
-            borderPadding= 0,
-            borderRadius= None,
-            allowWidows= 1,
-            allowOrphans= 0,
-            textTransform=None,  # 'uppercase' | 'lowercase' | None
-            endDots=None,
-            splitLongWords=1,
-            """
-            # tools.feedback(f'*** LONG-{ID} => _text:{_text}')
-            para = Paragraph(_text, style=_style)
-            w, h = para.wrap(width, height)
-            para.drawOn(cnv, x_t, y_t - h)  # start text from top of 'box'
+            # wrapped layout is cached; so repeated text is only wrapped once
+            para, w, h = fonts.paragraph_layout(
+                _text, width, height,
+                font_name=self.font_face,
+                font_size=_font_size,
+                leading=_leading,
+                alignment=self.to_alignment(),
+                text_color=self.stroke,
+                back_color=self.fill,
+                border_color=self.outline_stroke,
+                border_width=self.outline_width)
+            backends.draw_paragraph(cnv, para, x_t, y_t - h)  # start text from top of 'box'
         else:
             # tools.feedback(f"*** {x_t=} {y_t=} {_text=} {sequence=} {rotation=}")
             cnv.setFillColor(self.stroke)
@@ -3831,8 +3969,22 @@ class CommonShape(BaseShape):
     """
 
     def __init__(self, _object=None, canvas=None, **kwargs):
+        # ---- a "parent" Common is applied below, not in BaseShape
+        parent = kwargs.pop('common', None)
         super(CommonShape, self).__init__(_object=_object, canvas=canvas, **kwargs)
         self._kwargs = kwargs
+        # ---- style (once-only): own properties override those of parent(s)
+        style = common_style(parent) if parent else {}
+        style.update(style_properties(self))
+        self._style = MappingProxyType(style)
+        vars(self).update(style)
+        if parent:
+            self.common = parent
+            parents = parent if isinstance(parent, (list, tuple)) else [parent]
+            self._kwargs = {}
+            for item in parents:
+                self._kwargs.update(item._kwargs)
+            self._kwargs.update(kwargs)
 
     def draw(self, cnv=None, off_x=0, off_y=0, ID=None, **kwargs):
         """Not applicable."""
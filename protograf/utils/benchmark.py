@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark and compare the protograf rendering backends
+
+Usage:
+
+    python -m protograf.utils.benchmark examples/cards/cards_deck_01.py ...
+    python -m protograf.utils.benchmark --common 1000
+
+Each script is run once per backend (via its ``--backend`` option); the time
+taken is reported, along with a visual comparison of every page rendered by
+each backend against the 'reportlab' (reference) output.  The exit code is
+non-zero if any page differs by more than the ``--tolerance``.
+
+The ``--common`` option times the construction of shapes, with and without
+a (chained) Common style.
+"""
+# lib
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+# third party
+import pymupdf
+from PIL import Image, ImageChops
+# local
+from protograf.backends import BACKENDS
+
+REFERENCE = 'reportlab'
+
+
+def run_script(script: str, backend: str, directory: str) -> tuple:
+    """Run a protograf script with a backend; return (seconds, PDF filename)."""
+    env = os.environ.copy()
+    package = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env['PYTHONPATH'] = os.pathsep.join([package, env.get('PYTHONPATH', '')])
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(script), '-d', directory, '-b', backend],
+        cwd=os.path.dirname(os.path.abspath(script)) or None,
+        env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    pdfs = [
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.endswith('.pdf')]
+    if result.returncode != 0 or not pdfs:
+        return elapsed, None
+    return elapsed, max(pdfs, key=os.path.getmtime)
+
+
+def page_difference(reference: str, other: str, dpi: int = 50, tile: int = 10) -> list:
+    """Difference (0 to 255) of each page of two PDFs.
+
+    Pages are compared a tile (a square of ``tile`` pixels) at a time; a
+    page's difference is the largest mean absolute difference of the pixels
+    in any one tile (for its most different colour channel), so that a small
+    change - e.g. a missing glyph - is not averaged away over the whole page.  A page that is missing in either PDF
+    has a difference of 255.
+    """
+    ref_doc, oth_doc = pymupdf.open(reference), pymupdf.open(other)
+    diffs = []
+    for number in range(max(ref_doc.page_count, oth_doc.page_count)):
+        if number >= ref_doc.page_count or number >= oth_doc.page_count:
+            diffs.append(255.0)
+            continue
+        ref_pix = ref_doc[number].get_pixmap(dpi=dpi, alpha=False)
+        oth_pix = oth_doc[number].get_pixmap(dpi=dpi, alpha=False)
+        if (ref_pix.width, ref_pix.height) != (oth_pix.width, oth_pix.height):
+            diffs.append(255.0)
+            continue
+        size = (ref_pix.width, ref_pix.height)
+        difference = ImageChops.difference(
+            Image.frombytes('RGB', size, ref_pix.samples),
+            Image.frombytes('RGB', size, oth_pix.samples))
+        tiles = difference.reduce(tile)
+        diffs.append(float(max(high for low, high in tiles.getextrema())))
+    return diffs
+
+
+def benchmark(scripts: list, backends: list = None, dpi: int = 50,
+              tolerance: float = 8.0) -> bool:
+    """Time each script per backend and check rendered output against reference.
+
+    Returns:
+        True if all outputs are within tolerance of the reference
+    """
+    backends = backends or list(BACKENDS)
+    passed = True
+    print(f"{'script':40} {'backend':10} {'seconds':>8} {'pages':>5} {'max diff':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for script in scripts:
+            outputs = {}
+            for backend in backends:
+                directory = os.path.join(tmp, os.path.basename(script), backend)
+                os.makedirs(directory, exist_ok=True)
+                elapsed, pdf = run_script(script, backend, directory)
+                outputs[backend] = (elapsed, pdf)
+            reference = outputs.get(REFERENCE, (0, None))[1]
+            for backend, (elapsed, pdf) in outputs.items():
+                name = os.path.basename(script)[:40]
+                if not pdf:
+                    print(f"{name:40} {backend:10} {elapsed:8.2f} {'FAILED':>5}")
+                    passed = False
+                    continue
+                pages = pymupdf.open(pdf).page_count
+                diff = ''
+                if reference and backend != REFERENCE:
+                    max_diff = max(page_difference(reference, pdf, dpi) or [0])
+                    diff = f'{max_diff:8.2f}'
+                    if max_diff > tolerance:
+                        diff += ' *'
+                        passed = False
+                print(f"{name:40} {backend:10} {elapsed:8.2f} {pages:5} {diff:>8}")
+    return passed
+
+
+def benchmark_common(shapes: int = 1000) -> dict:
+    """Time the construction of plain and Common-styled shapes.
+
+    Returns:
+        dict of microseconds per shape, keyed on 'plain', 'common', 'chained'
+    """
+    from protograf import proto  # deferred; sets up a canvas
+    argv, sys.argv = sys.argv, sys.argv[:1]  # Create() parses the command line
+    proto.Create(filename=os.path.join(tempfile.gettempdir(), 'benchmark.pdf'))
+    sys.argv = argv
+    base = proto.Common(stroke_width=2, fill='gold')
+    card = proto.Common(common=base, font_size=10, label_stroke='red')
+    faction = proto.Common(common=card, fill='tomato')
+    cases = {'plain': {}, 'common': {'common': base}, 'chained': {'common': faction}}
+    results = {}
+    for name, kwargs in cases.items():
+        start = time.perf_counter()
+        for _ in range(shapes):
+            proto.rectangle(x=1, y=1, **kwargs)
+        results[name] = (time.perf_counter() - start) * 1e6 / shapes
+    print(f"{'shapes':10} {'style':10} {'us/shape':>10}")
+    for name, micros in results.items():
+        print(f"{shapes:<10} {name:10} {micros:10.1f}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark protograf backends")
+    parser.add_argument('scripts', nargs='*', help="protograf script(s) to run")
+    parser.add_argument(
+        '-b', '--backends', default=','.join(BACKENDS),
+        help="Comma-separated backends to run")
+    parser.add_argument(
+        '--dpi', type=int, default=50, help="Resolution for visual comparison")
+    parser.add_argument(
+        '--tolerance', type=float, default=8.0,
+        help="Maximum allowed mean pixel difference (0-255) for a tile of a page")
+    parser.add_argument(
+        '--common', type=int, default=0,
+        help="Number of shapes for timing construction with Common styles")
+    args = parser.parse_args()
+    if args.common:
+        benchmark_common(args.common)
+    ok = True
+    if args.scripts:
+        ok = benchmark(
+            args.scripts, args.backends.split(','), dpi=args.dpi,
+            tolerance=args.tolerance)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Download, and cache, remote images (URLs) for protograf
+"""
+# lib
+import asyncio
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import hashlib
+import json
+import logging
+import os
+import re
+import urllib.error
+import urllib.request
+from urllib.parse import urlparse
+# local
+from protograf.utils.support import feedback
+
+log = logging.getLogger(__name__)
+
+DEBUG = False
+IMAGE_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tif', '.tiff', '.webp']
+INDEX_FILE = 'index.json'
+URL_PATTERN = re.compile(r"""https?://[^\s'"<>]+""")
+USER_AGENT = 'protograf'
+
+
+def find_urls(value) -> list:
+    """Return all the unique http(s) URLs in a value; or list/dict of values.
+
+    Doc Test:
+    >>> find_urls('see http://a.com/x.png and https://b.org/y.jpg')
+    ['http://a.com/x.png', 'https://b.org/y.jpg']
+    >>> find_urls([{'a': 'http://a.com/x.png', 'b': 2}, 'http://a.com/x.png'])
+    ['http://a.com/x.png']
+    >>> find_urls(None)
+    []
+    """
+    urls = {}  # dict to keep order
+    if isinstance(value, str):
+        for url in URL_PATTERN.findall(value):
+            urls[url] = None
+    elif isinstance(value, dict):
+        for item in value.values():
+            urls |= dict.fromkeys(find_urls(item))
+    elif isinstance(value, (Sequence, set)):
+        for item in value:
+            urls |= dict.fromkeys(find_urls(item))
+    return list(urls)
+
+
+def is_image_url(url: str) -> bool:
+    """Check if a URL's path ends with the extension of a (bitmap) image file.
+
+    Doc Test:
+    >>> is_image_url('https://a.com/pics/one.JPG?size=2')
+    True
+    >>> is_image_url('https://a.com/rules.html')
+    False
+    """
+    return os.path.splitext(urlparse(url).path)[1].lower() in IMAGE_EXTENSIONS
+
+
+def content_name(content: bytes, url: str) -> str:
+    """Return a filename, based on the content's hash, with the URL's extension.
+
+    Doc Test:
+    >>> content_name(b'abc', 'http://a.com/x/pic.PNG?v=2')
+    'ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad.png'
+    """
+    _, ext = os.path.splitext(urlparse(url).path)
+    return f'{hashlib.sha256(content).hexdigest()}{ext.lower()}'
+
+
+class ImageCache:
+    """A content-addressed cache, in a directory, of files downloaded from URLs.
+
+    Each file is named by the hash of its content, so the same image from many
+    URLs is stored once.  An index file maps each URL to its file, together
+    with the ETag and Last-Modified values used to check if it has changed.
+    URLs that could not be downloaded are not tried again while running.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = str(directory)
+        self.index_file = os.path.join(self.directory, INDEX_FILE)
+        self.entries = {}  # key: URL
+        self.failed = {}  # key: URL; value: error - NOT saved in the index
+        try:
+            with open(self.index_file, encoding='utf-8') as index:
+                self.entries = json.load(index)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as err:
+            feedback(f'Unable to read the image cache index "{self.index_file}" - {err}',
+                     False, True)
+
+    def lookup(self, url: str) -> str:
+        """Return the path of the cached file for a URL; or None."""
+        entry = self.entries.get(url)
+        if entry:
+            path = os.path.join(self.directory, entry['file'])
+            if os.path.exists(path):
+                return path
+        return None
+
+    def headers(self, url: str) -> dict:
+        """Return the headers for a conditional request for a cached URL."""
+        headers = {'User-Agent': USER_AGENT}
+        if self.lookup(url):
+            entry = self.entries[url]
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url: str, content: bytes, etag: str = None,
+              last_modified: str = None) -> str:
+        """Save the content of a URL, if not already saved; and return its path."""
+        filename = content_name(content, url)
+        path = os.path.join(self.directory, filename)
+        if not os.path.exists(path):
+            temporary = f'{path}.tmp'
+            with open(temporary, 'wb') as file:
+                file.write(content)
+            os.replace(temporary, path)
+        self.entries[url] = {
+            'file': filename, 'etag': etag, 'last_modified': last_modified}
+        return path
+
+    def save(self):
+        """Write the index file."""
+        temporary = f'{self.index_file}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as index:
+            json.dump(self.entries, index, indent=1)
+        os.replace(temporary, self.index_file)
+
+
+@lru_cache(maxsize=None)
+def image_cache(directory: str) -> ImageCache:
+    """Return the (shared) ImageCache for a directory."""
+    os.makedirs(directory, exist_ok=True)
+    return ImageCache(directory)
+
+
+def download(url: str, headers: dict, timeout: float) -> tuple:
+    """Return the (status, content, headers) of a URL; status 304 if unchanged."""
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read(), response.headers
+    except urllib.error.HTTPError as err:
+        if err.code == 304:
+            return err.code, b'', err.headers
+        raise
+
+
+async def fetch(url: str, cache: ImageCache, semaphore: asyncio.Semaphore,
+                retries: int = 3, timeout: float = 30, backoff: float = 0.5) -> tuple:
+    """Download a URL into the cache, unless it is unchanged.
+
+    Returns:
+        tuple of (URL, path or None, status); the status is one of
+        'downloaded', 'unchanged', 'stale' (failed; using an older copy)
+        or an error message
+
+    Doc Test:
+    >>> import tempfile
+    >>> cache = ImageCache(tempfile.mkdtemp())
+    >>> cache.failed['http://a.com/x.png'] = 'HTTP 404'
+    >>> asyncio.run(fetch('http://a.com/x.png', cache, asyncio.Semaphore(1)))
+    ('http://a.com/x.png', None, 'HTTP 404')
+    """
+    if url in cache.failed:  # already tried, and reported
+        return url, cache.lookup(url), 'stale' if cache.lookup(url) else cache.failed[url]
+    error = None
+    async with semaphore:
+        for attempt in range(retries + 1):
+            if attempt:
+                await asyncio.sleep(backoff * 2 ** (attempt - 1))
+            try:
+                status, content, headers = await asyncio.to_thread(
+                    download, url, cache.headers(url), timeout)
+                if status == 304:
+                    return url, cache.lookup(url), 'unchanged'
+                path = cache.store(
+                    url, content, headers.get('ETag'), headers.get('Last-Modified'))
+                return url, path, 'downloaded'
+            except urllib.error.HTTPError as err:
+                error = f'HTTP {err.code}'
+                if err.code < 500 and err.code not in [408, 429]:
+                    break  # no point trying again
+            except (urllib.error.URLError, OSError, ValueError) as err:
+                error = str(getattr(err, 'reason', err))
+            log.debug("Fetch %s attempt %s failed: %s", url, attempt + 1, error)
+    cache.failed[url] = error
+    if cache.lookup(url):
+        return url, cache.lookup(url), 'stale'
+    return url, None, error
+
+
+async def fetch_all(urls: list, directory: str, workers: int = 8,
+                    retries: int = 3, timeout: float = 30) -> list:
+    """Download URLs concurrently, with at most `workers` at a time."""
+    cache = image_cache(str(directory))
+    semaphore = asyncio.Semaphore(max(1, workers))
+    results = await asyncio.gather(*[
+        fetch(url, cache, semaphore, retries=retries, timeout=timeout)
+        for url in urls])
+    cache.save()
+    return results
+
+
+def run_coroutine(coroutine):
+    """Run a coroutine to completion; also if an event loop is running (e.g. Jupyter)."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:  # has its own event loop
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+def prefetch(urls: list, directory: str, workers: int = 8, retries: int = 3,
+             timeout: float = 30, report: bool = True) -> dict:
+    """Download URLs into a cache directory, before they are needed.
+
+    Args:
+        urls: list of URLs
+        directory: path of the cache
+        workers: maximum number of downloads at the same time
+        retries: number of times a failed download is tried again
+        timeout: seconds to wait for a server to respond
+        report: if True, show a summary of the downloads
+
+    Returns:
+        dict of URL: path to the cached file (None if unavailable)
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    results = run_coroutine(
+        fetch_all(urls, directory, workers=workers, retries=retries, timeout=timeout))
+    counts = {}
+    for url, path, status in results:
+        counts[status if path else 'failed'] = counts.get(status if path else 'failed', 0) + 1
+        if not path:
+            feedback(f'Unable to download image "{url}" - {status}', False, True)
+    if report:
+        summary = ', '.join(f'{count} {status}' for status, count in counts.items())
+        feedback(f'Prefetched {len(urls)} images into "{directory}": {summary}')
+    return {url: path for url, path, status in results}
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
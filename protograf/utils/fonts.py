@@ -0,0 +1,583 @@
+# -*- coding: utf-8 -*-
+"""
+Font discovery, lazy registration and text measurement for protograf
+
+Notes:
+    * The system and user font directories are scanned once; the family/style
+      names, file paths and basic metrics of each font are then stored in an
+      on-disk cache (in the user's ``.protograf`` directory) which is only
+      refreshed when the modification time of a font directory changes.
+    * Fonts are only registered with ReportLab the first time they are used,
+      so startup time does not depend on the number of fonts available.
+    * String widths are measured once for each font, at a reference size, and
+      scaled for other sizes; these, font heights and wrapped paragraph
+      layouts are memoized (with a limit on how many are kept), so repeated
+      text (e.g. the same rules text on many cards) is only measured once.
+    * Auto-fit font sizes (see `fit_font_size`) are found using these cached
+      measurements.
+"""
+# lib
+from collections import OrderedDict
+from functools import lru_cache
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import sys
+# third party
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont, TTFontFile
+from reportlab.platypus import Paragraph
+from reportlab.lib.styles import ParagraphStyle
+# local
+from protograf.utils.support import feedback
+
+log = logging.getLogger(__name__)
+DEBUG = False
+CACHE_VERSION = 1
+CACHE_FILE = Path(Path.home() / '.protograf' / 'fonts.json')
+FONT_EXTENSIONS = ('.ttf', '.otf')
+REFERENCE_SIZE = 1000  # font size at which string widths are measured
+MARKUP = re.compile(r'<[^>]+>')
+# fonts that protograf has always tried to make available; name -> file
+BASE_FONTS = {
+    'Ubuntu': 'Ubuntu-R.ttf',
+    'Arial': 'Arial.ttf',
+    'Verdana': 'Verdana.ttf',
+    'Courier New': 'Courier_New.ttf',
+    'Times New Roman': 'Times_New_Roman.ttf',
+    'Trebuchet_MS': 'Trebuchet_MS.ttf',
+    'Georgia': 'Georgia.ttf',
+    'Webdings': 'Webdings.ttf',
+}
+
+
+def font_directories() -> list:
+    """Return the (existing) system and user font directories for this OS."""
+    home = Path.home()
+    if sys.platform.startswith('win'):
+        windir = os.environ.get('WINDIR', 'C:\\Windows')
+        local = os.environ.get('LOCALAPPDATA', str(home / 'AppData' / 'Local'))
+        dirs = [
+            Path(windir) / 'Fonts',
+            Path(local) / 'Microsoft' / 'Windows' / 'Fonts']
+    elif sys.platform == 'darwin':
+        dirs = [
+            Path('/System/Library/Fonts'),
+            Path('/Library/Fonts'),
+            home / 'Library' / 'Fonts']
+    else:
+        data_home = os.environ.get('XDG_DATA_HOME', str(home / '.local' / 'share'))
+        dirs = [
+            Path('/usr/share/fonts'),
+            Path('/usr/local/share/fonts'),
+            Path(data_home) / 'fonts',
+            home / '.fonts']
+    return [str(_dir) for _dir in dirs if _dir.is_dir()]
+
+
+def font_key(name: str) -> str:
+    """Normalise a font name for lookup purposes.
+
+    Doc Test:
+
+    >>> font_key('Times New Roman')
+    'timesnewroman'
+    >>> font_key('Trebuchet_MS')
+    'trebuchetms'
+    >>> font_key('DejaVuSans-Bold.ttf')
+    'dejavusansbold'
+    """
+    _name = str(name).strip().lower()
+    if _name.endswith(FONT_EXTENSIONS):
+        _name = _name[:-4]
+    return re.sub(r'[\s_\-]', '', _name)
+
+
+class FontIndex():
+    """Index of the font files that are available on this system.
+
+    The index is keyed on normalised names (see `font_key`) and maps each name
+    onto the details of the font file: path, family, style and metrics.
+    """
+
+    def __init__(self, directories: list = None, cache_file: str = None):
+        self.directories = directories if directories is not None \
+            else font_directories()
+        self.cache_file = Path(cache_file) if cache_file else CACHE_FILE
+        self.fonts = {}  # path -> details (incl. mtime)
+        self.folders = {}  # directory -> mtime
+        self.names = {}  # font_key -> path
+        self.loaded = False
+
+    def load(self):
+        """Load index from cache; rescan any directories that have changed."""
+        if self.loaded:
+            return
+        cache = {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as cache_file:
+                cache = json.load(cache_file)
+            if cache.get('version') != CACHE_VERSION:
+                cache = {}
+        except (OSError, ValueError):
+            cache = {}
+        self.fonts = cache.get('fonts', {})
+        self.folders = cache.get('folders', {})
+        changed = False
+        for directory in self.directories:
+            if self.is_stale(directory):
+                self.scan(directory)
+                changed = True
+        if changed:
+            self.save()
+        self.set_names()
+        self.loaded = True
+
+    def is_stale(self, directory: str) -> bool:
+        """Check if a directory, or any of its sub-directories, has changed."""
+        folders = [
+            folder for folder in self.folders
+            if folder == directory or folder.startswith(directory + os.sep)]
+        if not folders:
+            return True
+        for folder in folders:
+            try:
+                if os.stat(folder).st_mtime != self.folders[folder]:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def scan(self, directory: str):
+        """Walk a directory and parse any new or changed font files in it."""
+        # tools.feedback(f'*** Scanning fonts in {directory}')
+        for folder in list(self.folders.keys()):
+            if folder == directory or folder.startswith(directory + os.sep):
+                del self.folders[folder]
+        for path in list(self.fonts.keys()):
+            if path.startswith(directory + os.sep) and not os.path.exists(path):
+                del self.fonts[path]
+        for root, _, files in os.walk(directory):
+            try:
+                self.folders[root] = os.stat(root).st_mtime
+            except OSError:
+                continue
+            for filename in files:
+                if not filename.lower().endswith(FONT_EXTENSIONS):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    mtime = os.stat(path).st_mtime
+                except OSError:
+                    continue
+                existing = self.fonts.get(path)
+                if existing and existing.get('mtime') == mtime:
+                    continue
+                self.fonts[path] = self.parse(path, mtime)
+
+    def parse(self, path: str, mtime: float) -> dict:
+        """Extract names and metrics from a font file."""
+        try:
+            ttf = TTFontFile(path, validate=0)
+            name = ttf.name.decode('latin-1') if isinstance(ttf.name, bytes) \
+                else str(ttf.name)
+            family = ttf.familyName.decode('latin-1') \
+                if isinstance(ttf.familyName, bytes) else str(ttf.familyName)
+            style = ttf.styleName.decode('latin-1') \
+                if isinstance(ttf.styleName, bytes) else str(ttf.styleName)
+            return {
+                'mtime': mtime,
+                'name': name,
+                'family': family,
+                'style': style,
+                'ascent': ttf.ascent,
+                'descent': ttf.descent,
+                'cap_height': ttf.capHeight,
+            }
+        except Exception as err:
+            # unsupported (e.g. CFF-based OTF) - record so it is not re-parsed
+            log.debug('Unable to parse font file %s (%s)', path, err)
+            return {'mtime': mtime, 'error': str(err)}
+
+    def save(self):
+        """Write the index to the on-disk cache."""
+        cache = {
+            'version': CACHE_VERSION,
+            'folders': self.folders,
+            'fonts': self.fonts,
+        }
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.cache_file, 'w', encoding='utf-8') as cache_file:
+                json.dump(cache, cache_file)
+        except OSError as err:
+            log.warning('Unable to save font cache %s (%s)', self.cache_file, err)
+
+    def set_names(self):
+        """Create lookup of normalised names for all valid font files.
+
+        A font can be found by its file name, PostScript name, full name
+        (family plus style) or - for a "regular" style - just its family name.
+        """
+        self.names = {}
+        for path in sorted(self.fonts.keys()):
+            details = self.fonts[path]
+            if details.get('error'):
+                continue
+            keys = [
+                font_key(os.path.basename(path)),
+                font_key(details['name']),
+                font_key(f"{details['family']} {details['style']}"),
+            ]
+            if details['style'].lower() in ['regular', 'book', 'normal', 'roman']:
+                keys.append(font_key(details['family']))
+            for key in keys:
+                self.names.setdefault(key, path)
+
+    def find(self, name: str) -> str:
+        """Return path to the font file matching a name (or None)."""
+        self.load()
+        return self.names.get(font_key(name))
+
+    def metrics(self, name: str) -> dict:
+        """Return cached details (incl. ascent and descent) for a named font."""
+        path = self.find(name)
+        return self.fonts.get(path) if path else None
+
+
+class LRUCache(OrderedDict):
+    """A dict that only keeps the `maxsize` most recently used items.
+
+    Doc Test:
+
+    >>> cache = LRUCache(2)
+    >>> cache['a'], cache['b'] = 1, 2
+    >>> cache.get('a')
+    1
+    >>> cache['c'] = 3
+    >>> list(cache)
+    ['a', 'c']
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def get(self, key, default=None):
+        if key in self:
+            self.move_to_end(key)
+            return self[key]
+        return default
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+_index = None
+_files = {}  # user-supplied font name -> file
+_metrics = {}  # font name -> ascent & descent
+_layouts = LRUCache(2048)  # text & style -> (wrapped Paragraph, width, height)
+_fits = LRUCache(8192)  # text, box & font -> best-fit font size
+
+
+def get_index() -> FontIndex:
+    """Return the font index (created on first use)."""
+    global _index
+    if _index is None:
+        _index = FontIndex()
+    return _index
+
+
+def add_font(name: str, filename: str = None):
+    """Make a font available for use; it is only registered when first used.
+
+    Args:
+        name: the name that will be used for the `font_face` property
+        filename: optional font file (full path or file name); if not supplied,
+            the font index will be used to find a matching file
+    """
+    if not name:
+        feedback('No font name supplied!', True)
+    _files[name] = filename
+
+
+def is_registered(name: str) -> bool:
+    """Check if font is a standard font or has already been registered."""
+    return name in pdfmetrics.standardFonts or \
+        name in pdfmetrics.getRegisteredFontNames()
+
+
+def register_font(name: str, filename: str = None) -> bool:
+    """Register a named font with ReportLab, if not already done.
+
+    Args:
+        name: the name of the font
+        filename: optional font file (full path or file name)
+
+    Returns:
+        True if the font is available for use; False otherwise
+    """
+    if not name:
+        raise ValueError('No font name supplied for registration!')
+    if is_registered(name):
+        return True
+    filename = filename or _files.get(name)
+    candidates = []
+    if filename and os.path.isabs(filename):
+        candidates.append(filename)
+    else:
+        if filename:
+            candidates.append(get_index().find(filename))
+        candidates.append(get_index().find(name))
+        # fallback to ReportLab's own font search path
+        candidates.append(filename or BASE_FONTS.get(name) or name + '.ttf')
+    for candidate in candidates:
+        if not candidate:
+            continue
+        try:
+            pdfmetrics.registerFont(TTFont(name, candidate))
+            log.debug('Registered font %s from %s', name, candidate)
+            return True
+        except Exception as err:
+            log.debug('Unable to register %s from %s (%s)', name, candidate, err)
+    return False
+
+
+def font_metrics(name: str) -> dict:
+    """Return ascent and descent (per 1000 units) for a named font."""
+    metrics = _metrics.get(name)
+    if metrics:
+        return metrics
+    details = None
+    if not is_registered(name):
+        details = get_index().metrics(name)
+        if not details:
+            register_font(name)
+    if not details:
+        face = pdfmetrics.getFont(name).face
+        details = {'ascent': face.ascent, 'descent': face.descent}
+    metrics = {'ascent': details['ascent'], 'descent': details['descent']}
+    _metrics[name] = metrics
+    return metrics
+
+
+def font_height(name: str, size: float) -> float:
+    """Return the height (ascent less descent) of a font at a given size."""
+    metrics = font_metrics(name)
+    return (metrics['ascent'] - metrics['descent']) / 1000 * size
+
+
+@lru_cache(maxsize=65536)
+def reference_width(text: str, name: str) -> float:
+    """Return width of a string for a font name, at the REFERENCE_SIZE."""
+    if not is_registered(name):
+        register_font(name)
+    return pdfmetrics.stringWidth(text, name, REFERENCE_SIZE)
+
+
+def string_width(text: str, name: str, size: float) -> float:
+    """Return width of a string for font name and size.
+
+    Notes:
+        * widths are proportional to the font size, so each string is only
+          measured once per font (see `reference_width`)
+
+    Doc Test:
+
+    >>> round(string_width('protograf', 'Helvetica', 10), 2)
+    40.02
+    """
+    return reference_width(text, name) * size / REFERENCE_SIZE
+
+
+def _hashable(value):
+    """Ensure a style value can be used as part of a cache key."""
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+def paragraph_layout(
+        text: str, width: float, height: float, font_name: str, font_size: float,
+        leading: float = None, alignment: int = 0, text_color=None,
+        back_color=None, border_color=None, border_width: float = 0) -> tuple:
+    """Return a Paragraph, already wrapped into a box, with its measured size.
+
+    Notes:
+        * Layouts are cached, so each unique text and style combination is
+          only wrapped once; the wrapped Paragraph (and its line breaks) can
+          then be drawn many times onto any canvas
+
+    Returns:
+        tuple of (Paragraph, wrapped width, wrapped height)
+    """
+    key = (
+        text, font_name, font_size, leading, alignment, width, height,
+        _hashable(text_color), _hashable(back_color), _hashable(border_color),
+        border_width)
+    layout = _layouts.get(key)
+    if layout is None:
+        if not is_registered(font_name):
+            register_font(font_name)
+        _style = ParagraphStyle(name="sc")
+        _style.textColor = text_color
+        _style.backColor = back_color
+        _style.borderColor = border_color
+        _style.borderWidth = border_width
+        _style.alignment = alignment
+        _style.fontSize = font_size
+        _style.fontName = font_name
+        _style.leading = leading if leading is not None else font_size
+        para = Paragraph(text, style=_style)
+        _width, _height = para.wrap(width, height)
+        layout = (para, _width, _height)
+        _layouts[key] = layout
+    return layout
+
+
+def measure_text(text: str, name: str, wrap: bool = True) -> list:
+    """Return the (text, reference width) of each word, or line, of each paragraph.
+
+    Notes:
+        * any markup (e.g. ``<b>``) is ignored for measurement purposes
+        * if wrap is False, text is only split at newlines
+
+    Doc Test:
+
+    >>> measure_text('one two', 'Helvetica')
+    [[('one', 1668.0), ('two', 1556.0)]]
+    """
+    paragraphs = MARKUP.sub('', text).split('\n')
+    if wrap:
+        return [[(word, reference_width(word, name)) for word in paragraph.split()]
+                for paragraph in paragraphs]
+    return [[(paragraph, reference_width(paragraph, name))] for paragraph in paragraphs]
+
+
+def break_lines(paragraphs: list, space: float, scale: float, width: float) -> list:
+    """Break measured paragraphs into lines that fit a width (greedy word-wrap).
+
+    Args:
+        paragraphs: words, with their reference widths (see `measure_text`)
+        space: reference width of a space
+        scale: ratio of the font size to the REFERENCE_SIZE
+
+    Notes:
+        * a word wider than the width is kept on a line of its own
+    """
+    lines = []
+    space = space * scale
+    for words in paragraphs:
+        line, line_width = [], 0
+        for word, word_width in words:
+            word_width = word_width * scale
+            if line and line_width + space + word_width > width:
+                lines.append(' '.join(line))
+                line, line_width = [], 0
+            line_width = line_width + space + word_width if line else word_width
+            line.append(word)
+        lines.append(' '.join(line))
+    return lines
+
+
+def wrap_lines(text: str, name: str, size: float, width: float) -> list:
+    """Break text into lines that fit a width (simple greedy word-wrap).
+
+    Doc Test:
+
+    >>> wrap_lines('one two three', 'Helvetica', 10, 40)
+    ['one two', 'three']
+    """
+    return break_lines(
+        measure_text(text, name), reference_width(' ', name), size / REFERENCE_SIZE,
+        width)
+
+
+def measured_fits(
+        paragraphs: list, space: float, size: float, width: float,
+        height: float = None, leading: float = 1.0, wrap: bool = True) -> bool:
+    """Check if measured text (see `measure_text`) fits a box at a font size."""
+    scale = size / REFERENCE_SIZE
+    for words in paragraphs:
+        for _, word_width in words:
+            if word_width * scale > width:
+                return False  # single word (or unwrapped line) is too wide
+    if height:
+        count = len(break_lines(paragraphs, space, scale, width)) if wrap \
+            else len(paragraphs)
+        return count * size * leading <= height
+    return True
+
+
+def text_fits(
+        text: str, name: str, size: float, width: float, height: float = None,
+        leading: float = 1.0, wrap: bool = True) -> bool:
+    """Check if text, at a given font size, fits inside a box.
+
+    Args:
+        leading: the line spacing as a multiple of the font size
+        wrap: if False, text is only split at newlines
+
+    Doc Test:
+
+    >>> text_fits('one two three', 'Helvetica', 10, 40, height=15)
+    False
+    >>> text_fits('one two three', 'Helvetica', 10, 40, height=20)
+    True
+    """
+    return measured_fits(
+        measure_text(text, name, wrap), reference_width(' ', name), size, width,
+        height, leading, wrap)
+
+
+def fit_font_size(
+        text: str, name: str, width: float, height: float = None,
+        min_size: float = 4, max_size: float = 72, leading: float = 1.0,
+        wrap: bool = True, precision: float = 0.5) -> float:
+    """Find the largest font size, between min and max, for text to fit a box.
+
+    Notes:
+        * the text is measured once, and then a binary search scales those
+          widths for each size; rather than creating and wrapping Paragraphs
+        * results are cached, so the search is only done once for each unique
+          text, box and font combination
+        * if text does not fit even at min_size, then min_size is returned
+
+    Doc Test:
+
+    >>> fit_font_size('protograf', 'Helvetica', 40, min_size=4, max_size=20)
+    9.5
+    >>> fit_font_size('protograf', 'Helvetica', 400, min_size=4, max_size=20)
+    20
+    """
+    key = (text, name, width, height, min_size, max_size, leading, wrap, precision)
+    size = _fits.get(key)
+    if size is not None:
+        return size
+    paragraphs, space = measure_text(text, name, wrap), reference_width(' ', name)
+    if measured_fits(paragraphs, space, max_size, width, height, leading, wrap):
+        size = max_size
+    else:
+        low, high = 0, int((max_size - min_size) / precision)  # steps
+        while low < high:
+            middle = (low + high + 1) // 2
+            if measured_fits(paragraphs, space, min_size + middle * precision,
+                             width, height, leading, wrap):
+                low = middle
+            else:
+                high = middle - 1
+        size = min_size + low * precision
+    _fits[key] = size
+    return size
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
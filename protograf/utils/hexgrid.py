@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+Hexagonal grid coordinates, and queries, for protograf
+
+Cells are stored by their axial (q, r) coordinates - see
+https://www.redblobgames.com/grids/hexagons/ - so that neighbours, distances,
+ranges, lines and paths do not need a search of the whole grid.
+"""
+# lib
+from collections import namedtuple
+import heapq
+import itertools
+import logging
+import math
+# local
+from protograf.utils.locations import LocationTable
+from protograf.utils.support import feedback
+
+log = logging.getLogger(__name__)
+
+DEBUG = False
+DIRECTIONS = [(1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1)]
+NUDGE = 1e-6  # used to move a line off the edges between two hexagons
+
+Hex = namedtuple('Hex', ['q', 'r'])  # axial coordinates
+
+
+def offset_to_axial(col: int, row: int, orientation: str = 'flat',
+                    hex_offset: str = 'even') -> Hex:
+    """Convert the (col, row) of a hexagon in a Hexagons() layout to axial.
+
+    Doc Test:
+    >>> offset_to_axial(3, 2)
+    Hex(q=3, r=1)
+    >>> axial_to_offset(*offset_to_axial(3, 2, 'pointy', 'odd'), 'pointy', 'odd')
+    (3, 2)
+    """
+    odd = str(hex_offset).lower() in ['o', 'odd']
+    if str(orientation).lower() in ['p', 'pointy']:
+        return Hex(col - ((row + 1) // 2 if odd else row // 2), row)
+    return Hex(col, row - ((col + 1) // 2 if odd else col // 2))
+
+
+def axial_to_offset(q: int, r: int, orientation: str = 'flat',
+                    hex_offset: str = 'even') -> tuple:
+    """Convert axial coordinates to the (col, row) of a Hexagons() layout."""
+    odd = str(hex_offset).lower() in ['o', 'odd']
+    if str(orientation).lower() in ['p', 'pointy']:
+        return q + ((r + 1) // 2 if odd else r // 2), r
+    return q, r + ((q + 1) // 2 if odd else q // 2)
+
+
+def hex_distance(first: Hex, second: Hex) -> int:
+    """Return the number of steps between two hexagons.
+
+    Doc Test:
+    >>> hex_distance(Hex(0, 0), Hex(2, -3))
+    3
+    """
+    dq, dr = first[0] - second[0], first[1] - second[1]
+    return (abs(dq) + abs(dr) + abs(dq + dr)) // 2
+
+
+def hex_round(q: float, r: float) -> Hex:
+    """Return the hexagon containing fractional axial coordinates.
+
+    Doc Test:
+    >>> hex_round(0.4, 0.4)
+    Hex(q=0, r=1)
+    """
+    s = -q - r
+    rq, rr, rs = round(q), round(r), round(s)
+    dq, dr, ds = abs(rq - q), abs(rr - r), abs(rs - s)
+    if dq > dr and dq > ds:
+        rq = -rr - rs
+    elif dr > ds:
+        rr = -rq - rs
+    return Hex(int(rq), int(rr))
+
+
+def hex_line(first: Hex, second: Hex, nudge: float = NUDGE) -> list:
+    """Return the hexagons on a straight line between the centres of two hexagons.
+
+    Doc Test:
+    >>> hex_line(Hex(0, 0), Hex(3, -1))
+    [Hex(q=0, r=0), Hex(q=1, r=0), Hex(q=2, r=-1), Hex(q=3, r=-1)]
+    """
+    steps = hex_distance(first, second)
+    if not steps:
+        return [Hex(*first)]
+    q1, r1 = first[0] + nudge, first[1] + nudge
+    q2, r2 = second[0] + nudge, second[1] + nudge
+    return [hex_round(q1 + (q2 - q1) * step / steps, r1 + (r2 - r1) * step / steps)
+            for step in range(steps + 1)]
+
+
+class HexGrid(LocationTable):
+    """The Locales of the hexagons in a Hexagons() layout; with spatial queries.
+
+    A HexGrid is a LocationTable - a list, in drawing order - so it can be used
+    anywhere that a list of Locales is.  A hexagon can be referred to by its label, its Locale,
+    or a (col, row) tuple.
+
+    Doc Test:
+    >>> from protograf.utils.geoms import Locale
+    >>> cells = [Locale(col=c, row=r, x=c * 1.5, y=r * 1.732 + (c % 2) * 0.866,
+    ...          label=f'{c}{r}') for r in range(4) for c in range(5)]
+    >>> grid = HexGrid(cells, orientation='flat', hex_offset='even', side=1)
+    >>> [cell.label for cell in grid.neighbours('22')]
+    ['32', '31', '21', '11', '12', '23']
+    >>> grid.distance('00', '43')
+    5
+    >>> len(grid.within('22', 1))
+    7
+    >>> grid.at(3.0, 3.5).label
+    '22'
+    >>> grid.at(30, 30) is None
+    True
+    >>> [cell.label for cell in grid.path('00', '40')[0]]
+    ['00', '10', '21', '30', '40']
+    >>> route, cost = grid.path('00', '40', cost={'20': 5, '21': 5})
+    >>> [cell.label for cell in route], cost
+    (['00', '10', '11', '22', '31', '41', '40'], 6)
+    >>> grid.line_of_sight('00', '40', blocked=['20'])
+    False
+    """
+
+    def __init__(self, locales=(), orientation: str = 'flat', hex_offset: str = 'even',
+                 side: float = None):
+        self.orientation = 'pointy' if str(orientation).lower() in ['p', 'pointy'] \
+            else 'flat'
+        self.hex_offset = 'odd' if str(hex_offset).lower() in ['o', 'odd'] else 'even'
+        self.side = side  # in the same units as the Locale x and y
+        super().__init__(locales)
+
+    def reindex(self):
+        self.cells = {}  # Hex: Locale
+        self.positions = {}  # Hex: index in the list
+        self.offsets = {}  # (col, row): Hex
+        super().reindex()
+
+    def add_index(self, index: int, locale):
+        super().add_index(index, locale)
+        key = offset_to_axial(locale.col, locale.row, self.orientation, self.hex_offset)
+        self.cells[key] = locale
+        self.positions[key] = index
+        self.offsets[(locale.col, locale.row)] = key
+
+    # ---- coordinates
+
+    def hex(self, key) -> Hex:
+        """Return the axial coordinates for a label, Locale, (col, row) or Hex."""
+        if isinstance(key, Hex):
+            return key
+        if isinstance(key, tuple) and hasattr(key, 'col'):  # Locale
+            found = self.offsets.get((key.col, key.row))
+        elif isinstance(key, tuple) and len(key) == 2:
+            found = self.offsets.get(tuple(key))
+        else:
+            locale = self.find(key)
+            found = None if locale is None else self.offsets.get((locale.col, locale.row))
+        if found is None:
+            feedback(f'The location "{key}" is not in the grid!', True)
+        return found
+
+    def cell(self, key):
+        """Return the Locale for a label, Locale, (col, row) or Hex; or None."""
+        if isinstance(key, Hex):
+            return self.cells.get(key)
+        return self.cells[self.hex(key)]
+
+    def at(self, x: float, y: float):
+        """Return the Locale of the hexagon containing a point; or None.
+
+        The point is in the same units as the Locale x and y (i.e. points).
+        """
+        if not self.cells or not self.side:
+            return None
+        origin = next(iter(self.cells))
+        locale = self.cells[origin]
+        dx, dy = (x - locale.x) / self.side, (y - locale.y) / self.side
+        if self.orientation == 'flat':  # x = 3/2 q; y = sqrt(3) (r + q/2)
+            q = dx * 2.0 / 3.0
+            r = dy / math.sqrt(3) - q / 2.0
+        else:  # x = sqrt(3) (q + r/2); y = 3/2 r
+            r = dy * 2.0 / 3.0
+            q = dx / math.sqrt(3) - r / 2.0
+        return self.cells.get(hex_round(origin.q + q, origin.r + r))
+
+    # ---- queries
+
+    def neighbours(self, key) -> list:
+        """Return the Locales of the hexagons next to a hexagon."""
+        q, r = self.hex(key)
+        return [self.cells[near] for near in (Hex(q + dq, r + dr) for dq, dr in DIRECTIONS)
+                if near in self.cells]
+
+    def distance(self, first, second) -> int:
+        """Return the number of steps between two hexagons."""
+        return hex_distance(self.hex(first), self.hex(second))
+
+    def within(self, key, steps: int) -> list:
+        """Return the Locales of all hexagons up to `steps` away from a hexagon."""
+        q, r = self.hex(key)
+        found = []
+        for dq in range(-steps, steps + 1):
+            for dr in range(max(-steps, -dq - steps), min(steps, -dq + steps) + 1):
+                near = Hex(q + dq, r + dr)
+                if near in self.cells:
+                    found.append(self.cells[near])
+        return found
+
+    def line(self, first, second) -> list:
+        """Return the Locales of the hexagons on a line between two hexagons."""
+        return [self.cells[near] for near in hex_line(self.hex(first), self.hex(second))
+                if near in self.cells]
+
+    def line_of_sight(self, first, second, blocked=None) -> bool:
+        """Check if a line between two hexagons is not blocked.
+
+        Args:
+            blocked: list of hexagons that block sight; or a function that is
+                given a Locale and returns True if it blocks sight
+
+        Notes:
+            Hexagons outside the grid block sight.  If the line runs along
+            the edge between two hexagons, it is clear if either side is.
+        """
+        blocking = self.test(blocked)
+        start, end = self.hex(first), self.hex(second)
+        for nudge in [NUDGE, -NUDGE]:
+            hexes = hex_line(start, end, nudge)[1:-1]
+            if all(near in self.cells and not blocking(near) for near in hexes):
+                return True
+        return False
+
+    def test(self, keys):
+        """Return a function that checks if a Hex is one of the keys."""
+        if keys is None:
+            return lambda near: False
+        if callable(keys):
+            return lambda near: bool(keys(self.cells[near]))
+        chosen = {self.hex(key) for key in keys}
+        return lambda near: near in chosen
+
+    def costs(self, cost=None, default: float = 1):
+        """Return a function giving the cost to enter a Hex; None if impassable.
+
+        Args:
+            cost: dict of hexagon (e.g. label): cost; or a function that is
+                given a Locale and returns its cost
+        """
+        if cost is None:
+            return lambda near: default
+        if callable(cost):
+            return lambda near: cost(self.cells[near])
+        values = {self.hex(key): value for key, value in cost.items()}
+        return lambda near: values.get(near, default)
+
+    def path(self, start, goal, cost=None, default: float = 1) -> tuple:
+        """Find the cheapest path between two hexagons (using A* search).
+
+        Args:
+            cost: the cost to enter each hexagon (see `costs`); a cost of None
+                means the hexagon cannot be entered
+            default: cost for a hexagon with no other cost
+
+        Returns:
+            tuple of (list of Locales, total cost); or (None, None) if the
+            goal cannot be reached
+        """
+        price = self.costs(cost, default)
+        start, goal = self.hex(start), self.hex(goal)
+        lowest = self.lowest_cost(cost, default)
+        counter = itertools.count()  # tie-breaker so that Hexes are not compared
+        frontier = [(0, next(counter), start)]
+        spent, came_from = {start: 0}, {start: None}
+        while frontier:
+            _, _, current = heapq.heappop(frontier)
+            if current == goal:
+                route = []
+                while current is not None:
+                    route.append(self.cells[current])
+                    current = came_from[current]
+                return route[::-1], spent[goal]
+            for dq, dr in DIRECTIONS:
+                near = Hex(current.q + dq, current.r + dr)
+                if near not in self.cells:
+                    continue
+                step = price(near)
+                if step is None:
+                    continue
+                total = spent[current] + step
+                if near not in spent or total < spent[near]:
+                    spent[near], came_from[near] = total, current
+                    heapq.heappush(frontier, (
+                        total + lowest * hex_distance(near, goal), next(counter), near))
+        return None, None
+
+    def reachable(self, start, budget: float, cost=None, default: float = 1) -> dict:
+        """Return every hexagon that can be reached, from a hexagon, within a budget.
+
+        Returns:
+            dict of Locale: lowest total cost to reach it
+        """
+        price = self.costs(cost, default)
+        start = self.hex(start)
+        counter = itertools.count()
+        frontier, spent = [(0, next(counter), start)], {start: 0}
+        while frontier:
+            total, _, current = heapq.heappop(frontier)
+            if total > spent[current]:
+                continue
+            for dq, dr in DIRECTIONS:
+                near = Hex(current.q + dq, current.r + dr)
+                if near not in self.cells:
+                    continue
+                step = price(near)
+                if step is None or total + step > budget:
+                    continue
+                if near not in spent or total + step < spent[near]:
+                    spent[near] = total + step
+                    heapq.heappush(frontier, (total + step, next(counter), near))
+        return {self.cells[key]: total for key, total in spent.items()}
+
+    def lowest_cost(self, cost=None, default: float = 1) -> float:
+        """Return the lowest cost of entering any hexagon; used by `path`."""
+        if cost is None:
+            return default
+        price = self.costs(cost, default)
+        values = [price(key) for key in self.cells] if callable(cost) \
+            else list(cost.values()) + [default]
+        values = [value for value in values if value is not None]
+        return max(0, min(values)) if values else 0
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Indexes for finding records in a dataset (a list of dicts) for protograf
+"""
+# lib
+import logging
+# local
+from protograf.utils.support import feedback
+
+log = logging.getLogger(__name__)
+
+DEBUG = False
+
+
+def as_columns(columns) -> tuple:
+    """Return one, or more, column names as a tuple.
+
+    Doc Test:
+    >>> as_columns('Name')
+    ('Name',)
+    >>> as_columns(['Name', 'Rank'])
+    ('Name', 'Rank')
+    """
+    if isinstance(columns, str):
+        return (columns,)
+    return tuple(columns)
+
+
+def index_key(record: dict, columns: tuple):
+    """Return the value in a record of one column; or a tuple for many columns.
+
+    Doc Test:
+    >>> index_key({'a': 1, 'b': 2}, ('a',))
+    1
+    >>> index_key({'a': 1, 'b': 2}, ('a', 'b'))
+    (1, 2)
+    """
+    if len(columns) == 1:
+        return record.get(columns[0])
+    return tuple(record.get(column) for column in columns)
+
+
+class DataIndex:
+    """Hash indexes, each on one or more columns, of a dataset.
+
+    Each index is built, in a single pass, the first time it is needed; and is
+    then shared by all lookups against the same column(s).  If a key occurs
+    in more than one record, the last of those records is used.
+
+    Doc Test:
+    >>> idx = DataIndex([{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}])
+    >>> idx.find('id', 2)['name']
+    'b'
+    >>> idx.index('id') is idx.index(['id'])
+    True
+    >>> idx.find(['id', 'name'], (1, 'a'))['id']
+    1
+    """
+
+    def __init__(self, dataset: list, label: str = 'dataset'):
+        self.dataset = dataset or []
+        self.label = label
+        self.indexes = {}  # key: tuple of columns
+
+    def validate(self, columns, label: str = ''):
+        """Stop if any of the column(s) is not in the dataset."""
+        if not self.dataset:
+            return
+        for column in as_columns(columns):
+            if column not in self.dataset[0].keys():
+                _label = f' for {label}' if label else ''
+                feedback(
+                    f'The "{column}" column{_label} is not available in the {self.label}.',
+                    True)
+
+    def index(self, columns) -> dict:
+        """Return the index - key value(s): record - for one or more columns."""
+        _columns = as_columns(columns)
+        if _columns not in self.indexes:
+            self.validate(_columns)
+            index = {}
+            for record in self.dataset:
+                index[index_key(record, _columns)] = record
+            self.indexes[_columns] = index
+            log.debug("Indexed %s rows on %s", len(self.dataset), _columns)
+        return self.indexes[_columns]
+
+    def find(self, columns, key, default=None):
+        """Return the record whose column(s) match the key value(s)."""
+        return self.index(columns).get(key, default)
+
+    def join(self, records: list, lookup, target, columns: list = None,
+             prefix: str = '') -> list:
+        """Add columns, from the matching record in this dataset, to each record.
+
+        Args:
+            lookup: column(s) in `records` used to find the match
+            target: column(s) in this dataset matched by the lookup value(s)
+            columns: names of columns to add; by default, all that are not
+                in the target
+            prefix: added to the name of each new column
+
+        Returns:
+            list of new records; a record without a match gets None values
+
+        Doc Test:
+        >>> idx = DataIndex([{'id': 1, 'color': 'red'}])
+        >>> idx.join([{'name': 'x', 'ref': 1}, {'name': 'y', 'ref': 2}], 'ref', 'id')
+        [{'name': 'x', 'ref': 1, 'color': 'red'}, {'name': 'y', 'ref': 2, 'color': None}]
+        """
+        _lookup, _target = as_columns(lookup), as_columns(target)
+        if len(_lookup) != len(_target):
+            feedback(
+                f'Cannot join on {list(_lookup)} - it must have the same number of'
+                f' columns as {list(_target)}.', True)
+        index = self.index(_target)
+        if columns is None:
+            columns = [
+                column for column in (self.dataset[0].keys() if self.dataset else [])
+                if column not in _target]
+        else:
+            self.validate(columns)
+        joined = []
+        for record in records:
+            match = index.get(index_key(record, _lookup)) or {}
+            joined.append(
+                record | {f'{prefix}{column}': match.get(column) for column in columns})
+        return joined
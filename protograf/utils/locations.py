@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Location tables - lists of Locales, indexed by label, id and sequence - for protograf
+"""
+# lib
+import logging
+
+log = logging.getLogger(__name__)
+
+DEBUG = False
+
+
+class LocationTable(list):
+    """A list of Locales, e.g. from Hexagons(), with indexes for fast lookups.
+
+    Locales can be found by label, id, sequence or corner (e.g. 'nw').
+
+    Labels are matched ignoring case; if two Locales have the same label, the
+    first one is found.  The indexes are updated if the list is changed.
+
+    Doc Test:
+    >>> from protograf.utils.geoms import Locale
+    >>> table = LocationTable([
+    ...     Locale(col=0, row=0, id='0:0', sequence=0, label='A1'),
+    ...     Locale(col=1, row=0, id='1:0', sequence=1, label='B1')])
+    >>> table.find('b1').col
+    1
+    >>> table.find('C1') is None
+    True
+    >>> table.by_id('0:0').label
+    'A1'
+    >>> table.append(Locale(col=2, row=0, id='2:0', sequence=2, corner='ne', label='C1'))
+    >>> table.by_corner('ne').col
+    2
+    >>> table.by_sequence(2).label
+    'C1'
+    >>> del table[0]
+    >>> table.find('a1') is None
+    True
+    """
+
+    def __init__(self, locales=()):
+        super().__init__(locales)
+        self.reindex()
+
+    @classmethod
+    def of(cls, grid):
+        """Return a grid as a LocationTable; only creating one if needed."""
+        return grid if isinstance(grid, LocationTable) else cls(grid)
+
+    def reindex(self):
+        """Create the indexes for all the Locales."""
+        self.labels = {}  # lower-case label: index in list
+        self.ids = {}  # id: index in list
+        self.sequences = {}  # sequence: index in list
+        self.corners = {}  # corner: index in list
+        for index, locale in enumerate(self):
+            self.add_index(index, locale)
+
+    def add_index(self, index: int, locale):
+        label = getattr(locale, 'label', None)
+        if label is not None:
+            self.labels.setdefault(str(label).lower(), index)
+        if getattr(locale, 'id', None) is not None:
+            self.ids.setdefault(locale.id, index)
+        if getattr(locale, 'sequence', None) is not None:
+            self.sequences.setdefault(locale.sequence, index)
+        if getattr(locale, 'corner', None) is not None:
+            self.corners.setdefault(locale.corner, index)
+
+    def find(self, label):
+        """Return the Locale with a label (ignoring case); or None."""
+        index = self.labels.get(str(label).lower())
+        return None if index is None else self[index]
+
+    def by_id(self, _id):
+        """Return the Locale with an id (e.g. '2:3'); or None."""
+        index = self.ids.get(_id)
+        return None if index is None else self[index]
+
+    def by_sequence(self, sequence: int):
+        """Return the Locale with a sequence number; or None."""
+        index = self.sequences.get(sequence)
+        return None if index is None else self[index]
+
+    def by_corner(self, corner: str):
+        """Return the Locale at a corner (e.g. 'nw'); or None."""
+        index = self.corners.get(corner)
+        return None if index is None else self[index]
+
+    # ---- keep indexes up-to-date
+
+    def append(self, locale):
+        super().append(locale)
+        self.add_index(len(self) - 1, locale)
+
+    def extend(self, locales):
+        start = len(self)
+        super().extend(locales)
+        for index in range(start, len(self)):
+            self.add_index(index, self[index])
+
+    def __iadd__(self, locales):
+        self.extend(locales)
+        return self
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self.reindex()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self.reindex()
+
+    def insert(self, index, locale):
+        super().insert(index, locale)
+        self.reindex()
+
+    def pop(self, index=-1):
+        locale = super().pop(index)
+        self.reindex()
+        return locale
+
+    def remove(self, locale):
+        super().remove(locale)
+        self.reindex()
+
+    def clear(self):
+        super().clear()
+        self.reindex()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self.reindex()
+
+    def reverse(self):
+        super().reverse()
+        self.reindex()
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Path (arc-length) tables - for placing items evenly along a line - for protograf
+
+A path is described by a tuple of commands, each being a tuple:
+
+    ('M', x, y) - move to a point
+    ('L', x, y) - line to a point
+    ('C', x1, y1, x2, y2, x, y) - cubic Bezier curve, via two control points
+    ('A', cx, cy, rx, ry, start, extent) - elliptical arc, in degrees
+        anti-clockwise from East; a line joins it to any previous point
+    ('Z',) - close the path
+
+All values are in points.
+"""
+# lib
+from bisect import bisect_right
+from functools import lru_cache
+import logging
+import math
+# local
+from protograf.utils.geoms import Ray  # named tuple
+
+log = logging.getLogger(__name__)
+
+DEBUG = False
+
+STEP = 1.0  # longest straight part (in points) used to flatten a curve
+ARC_STEP = 0.5  # largest change of angle (in degrees) used to flatten an arc
+
+
+class PathTable:
+    """Points along a flattened path, with their cumulative arc-lengths.
+
+    Doc Test:
+    >>> table = PathTable([(0, 0), (10, 0), (10, 10), (0, 10)], closed=True)
+    >>> table.length
+    40.0
+    >>> table.at(15)
+    Ray(x=10.0, y=5.0, angle=90.0)
+    >>> table.at(45)
+    Ray(x=5.0, y=0.0, angle=0.0)
+    >>> table.spaced(8)
+    [0.0, 5.0, 10.0, 15.0, 20.0, 25.0, 30.0, 35.0]
+    >>> table.clockwise
+    False
+    >>> table.reversed().at(5)
+    Ray(x=0.0, y=5.0, angle=90.0)
+    >>> table.normal(90.0)
+    0.0
+    >>> line = PathTable([(0, 0), (3, 4)])
+    >>> line.spaced(3)
+    [0.0, 2.5, 5.0]
+    >>> line.at(99)
+    Ray(x=3.0, y=4.0, angle=53.13010235415598)
+    """
+
+    def __init__(self, points: list, closed: bool = False):
+        self.points = []
+        for point in points:  # ignore repeated points; they have no direction
+            if not self.points or tuple(point) != self.points[-1]:
+                self.points.append((float(point[0]), float(point[1])))
+        self.closed = closed
+        if closed and len(self.points) > 1 and self.points[0] != self.points[-1]:
+            self.points.append(self.points[0])
+        self.lengths = [0.0]
+        for (x0, y0), (x1, y1) in zip(self.points, self.points[1:]):
+            self.lengths.append(self.lengths[-1] + math.hypot(x1 - x0, y1 - y0))
+        self.length = self.lengths[-1]
+        area = sum(
+            x0 * y1 - x1 * y0
+            for (x0, y0), (x1, y1) in zip(self.points, self.points[1:]))
+        self.clockwise = closed and area < 0
+        self._reversed = None
+
+    def __repr__(self):
+        return (
+            f'PathTable({len(self.points)} points, length={self.length:.2f},'
+            f' closed={self.closed})')
+
+    def at(self, distance: float) -> Ray:
+        """Return the point, and direction of travel, at a distance along the path.
+
+        A closed path wraps around; for an open path the distance is limited
+        to its ends.
+        """
+        if len(self.points) < 2:
+            x, y = self.points[0] if self.points else (0.0, 0.0)
+            return Ray(x, y, 0.0)
+        if self.closed:
+            distance = distance % self.length
+        else:
+            distance = min(max(distance, 0.0), self.length)
+        index = min(bisect_right(self.lengths, distance) - 1, len(self.points) - 2)
+        (x0, y0), (x1, y1) = self.points[index], self.points[index + 1]
+        fraction = (distance - self.lengths[index]) / (
+            self.lengths[index + 1] - self.lengths[index])
+        angle = math.degrees(math.atan2(y1 - y0, x1 - x0)) % 360.0
+        return Ray(x0 + fraction * (x1 - x0), y0 + fraction * (y1 - y0), angle)
+
+    def spaced(self, count: int) -> list:
+        """Return distances for a number of items spaced evenly along the path.
+
+        The items on an open path include both of its ends; on a closed path
+        the first item is at the start.
+        """
+        if count < 1:
+            return []
+        if self.closed:
+            return [key * self.length / count for key in range(count)]
+        if count == 1:
+            return [0.0]
+        return [key * self.length / (count - 1) for key in range(count)]
+
+    def normal(self, angle: float) -> float:
+        """Return the direction, away from its "inside", for a direction of travel.
+
+        The inside of an open path is taken to be on its left.
+        """
+        return (angle + (90.0 if self.clockwise else -90.0)) % 360.0
+
+    def reversed(self) -> 'PathTable':
+        """Return the table for travelling along the path in the other direction."""
+        if self._reversed is None:
+            self._reversed = PathTable(list(reversed(self.points)), self.closed)
+            self._reversed._reversed = self
+        return self._reversed
+
+
+def arc_points(
+        cx: float, cy: float, rx: float, ry: float, start: float, extent: float,
+        step: float = STEP) -> list:
+    """Return points along an elliptical arc.
+
+    Doc Test:
+    >>> points = arc_points(0, 0, 1, 1, 0, 90, 1)
+    >>> len(points)
+    181
+    >>> [(round(x, 3), round(y, 3)) for x, y in points[::90]]
+    [(1.0, 0.0), (0.707, 0.707), (0.0, 1.0)]
+    """
+    radius = max(abs(rx), abs(ry))
+    steps = max(
+        2,
+        math.ceil(abs(math.radians(extent)) * radius / step),
+        math.ceil(abs(extent) / ARC_STEP))
+    return [
+        (cx + rx * math.cos(math.radians(start + extent * key / steps)),
+         cy + ry * math.sin(math.radians(start + extent * key / steps)))
+        for key in range(steps + 1)]
+
+
+def bezier_points(
+        x0: float, y0: float, x1: float, y1: float, x2: float, y2: float,
+        x3: float, y3: float, step: float = STEP) -> list:
+    """Return points along a cubic Bezier curve.
+
+    Doc Test:
+    >>> bezier_points(0, 0, 1, 1, 2, 1, 3, 0, 10)
+    [(0.0, 0.0), (1.5, 0.75), (3.0, 0.0)]
+    """
+    hull = math.hypot(x1 - x0, y1 - y0) + math.hypot(x2 - x1, y2 - y1) + \
+        math.hypot(x3 - x2, y3 - y2)
+    steps = max(2, math.ceil(hull / step))
+    points = []
+    for key in range(steps + 1):
+        t = key / steps
+        a, b, c, d = (1 - t) ** 3, 3 * t * (1 - t) ** 2, 3 * t ** 2 * (1 - t), t ** 3
+        points.append((
+            a * x0 + b * x1 + c * x2 + d * x3,
+            a * y0 + b * y1 + c * y2 + d * y3))
+    return points
+
+
+@lru_cache(maxsize=64)
+def path_table(commands: tuple, step: float = STEP) -> PathTable:
+    """Flatten a path's commands into a PathTable; only once for each path.
+
+    Doc Test:
+    >>> path_table((('M', 0, 0), ('L', 4, 0), ('L', 4, 3), ('Z',))).length
+    12.0
+    >>> round(path_table((('A', 0, 0, 10, 10, 0, 360), ('Z',))).length, 1)
+    62.8
+    """
+    points, closed = [], False
+    for command in commands:
+        match command[0]:
+            case 'M' | 'L':
+                points.append((command[1], command[2]))
+            case 'C':
+                x0, y0 = points[-1] if points else (command[1], command[2])
+                points.extend(bezier_points(x0, y0, *command[1:7], step=step)[1:])
+            case 'A':
+                points.extend(arc_points(*command[1:7], step=step))
+            case 'Z':
+                closed = True
+            case _:
+                raise ValueError(f'"{command[0]}" is not a valid path command!')
+    return PathTable(points, closed)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
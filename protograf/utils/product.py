@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Lazy cartesian product of data (used by Matrix) for protograf
+"""
+# lib
+from array import array
+from collections.abc import Sequence
+import itertools
+import logging
+import math
+import random
+# local
+from protograf.utils import rng, tools
+from protograf.utils.support import feedback
+
+log = logging.getLogger(__name__)
+
+DEBUG = False
+
+
+class Product(Sequence):
+    """Every combination of the items in each list of `data`, as records (dicts).
+
+    Records are in the same order as `itertools.product`; and each one is only
+    created when it is needed, so the full list is never built.  A filtered,
+    sampled, or sliced Product keeps only the positions of its records.
+
+    Doc Test:
+    >>> combos = Product(['SUIT', 'VALUE'], [['S', 'H'], [1, 2, 3]])
+    >>> len(combos)
+    6
+    >>> combos[4]
+    {'SUIT': 'H', 'VALUE': 2}
+    >>> combos[-1]
+    {'SUIT': 'H', 'VALUE': 3}
+    >>> list(combos.filter(lambda row: row['VALUE'] > 2))
+    [{'SUIT': 'S', 'VALUE': 3}, {'SUIT': 'H', 'VALUE': 3}]
+    >>> [row['VALUE'] for row in combos.filter("{{ SUIT == 'H' }}")[1:]]
+    [2, 3]
+    >>> len(combos.filter("{{ VALUE != 2 }}", limit=3))
+    3
+    >>> len(combos.sample(4, seed=1))
+    4
+    """
+
+    def __init__(self, labels: list, data: list, positions=None):
+        self.labels = list(labels)
+        self.data = [list(items) for items in data]
+        if len(self.labels) != len(self.data):
+            feedback(
+                "The number of labels must equal the number of combinations!", True)
+        self.sizes = [len(items) for items in self.data]
+        self.total = math.prod(self.sizes) if self.data else 0
+        self.positions = positions  # None, range or array of positions in the total
+
+    def view(self, positions):
+        """Return a Product with a subset of these records."""
+        return Product(self.labels, self.data, positions)
+
+    def position(self, index: int) -> int:
+        """Return the position, in the full product, of this Product's record."""
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('Matrix index out of range')
+        return self.positions[index] if self.positions is not None else index
+
+    def record(self, position: int) -> dict:
+        """Return the record at a position in the full product."""
+        values = [None] * len(self.data)
+        for key in range(len(self.data) - 1, -1, -1):  # last item changes fastest
+            position, item = divmod(position, self.sizes[key])
+            values[key] = self.data[key][item]
+        return dict(zip(self.labels, values))
+
+    def __len__(self):
+        return self.total if self.positions is None else len(self.positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            positions = self.positions if self.positions is not None \
+                else range(self.total)
+            return self.view(positions[index])
+        return self.record(self.position(index))
+
+    def __iter__(self):
+        if self.positions is None:
+            for values in itertools.product(*self.data):
+                yield dict(zip(self.labels, values))
+        else:
+            for position in self.positions:
+                yield self.record(position)
+
+    def __repr__(self):
+        return f'Product({self.labels}, {len(self)} records)'
+
+    def filter(self, predicate, limit: int = None) -> 'Product':
+        """Return a Product of the records for which the predicate is True.
+
+        The predicate is a function of a record; or an expression, as used for
+        a Deck mask e.g. "{{ VALUE > 5 }}".  If a `limit` is given, checking
+        stops once that many records are found.
+        """
+        func = predicate if callable(predicate) else \
+            tools.compile_expression(predicate)
+        positions = self.positions if self.positions is not None \
+            else range(self.total)
+        kept = array('Q')
+        for position, record in zip(positions, self):
+            if tools.as_truth(func(record)):
+                kept.append(position)
+                if limit is not None and len(kept) >= limit:
+                    break
+        return self.view(kept)
+
+    def sample(self, count: int, seed=None) -> 'Product':
+        """Return a Product of `count` records chosen at random, in their order.
+
+        By default, the `seed` is based on the seed set for Create().
+        """
+        count = min(int(count), len(self))
+        generator = rng.generator('sample') if seed is None else random.Random(seed)
+        chosen = generator.sample(range(len(self)), count)
+        return self.view(array('Q', sorted(self.position(key) for key in chosen)))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Seeded, and repeatable, streams of random numbers for protograf
+
+Each stream is derived - by hashing - from the document seed, the "scope" it
+is used in (for example, a card in a deck) and a counter of the streams
+already used in that scope.  So the random numbers used for a card, or for a
+shape on that card, do not depend on what was drawn before; any card can be
+drawn again, by itself or in another process, with the same result.
+"""
+# lib
+from contextlib import contextmanager
+import hashlib
+import logging
+import os
+import random
+
+log = logging.getLogger(__name__)
+
+DEBUG = False
+
+
+class Streams:
+    """A hierarchy of random number streams, derived from a single seed.
+
+    Doc Test:
+    >>> streams = Streams(seed=42)
+    >>> first = streams.generator('dice').random()
+    >>> second = streams.generator('dice').random()
+    >>> first == second
+    False
+    >>> with streams.scope('card', 3):
+    ...     on_card = streams.generator('starfield').random()
+    >>> with streams.scope('card', 3):
+    ...     again = streams.generator('starfield').random()
+    >>> on_card == again
+    True
+    >>> Streams(seed=42).number('card', 3) == Streams(seed=42).number('card', 3)
+    True
+    >>> Streams(seed='42').number('card', 3) == Streams(seed=42).number('card', 3)
+    True
+    """
+
+    def __init__(self, seed=None):
+        self.set_seed(seed)
+
+    def set_seed(self, seed=None):
+        """Set the document seed; if None, a new one is chosen at random.
+
+        A seed that is a whole number, also as a string, is used as an int;
+        so that '42' (e.g. from the command-line) matches 42.
+        """
+        if seed is None:
+            seed = int.from_bytes(os.urandom(4), 'big')
+            log.info("Random number seed: %s", seed)
+        elif isinstance(seed, str) and seed.strip().lstrip('+-').isdigit():
+            seed = int(seed)
+        self.seed = seed
+        self.path = ()  # keys of the current scope
+        self.counters = {}  # path: number of streams used
+
+    def derive(self, *keys) -> int:
+        """Return a 64-bit number based on the seed and the keys."""
+        source = repr((self.seed,) + keys).encode('utf-8')
+        return int.from_bytes(hashlib.blake2b(source, digest_size=8).digest(), 'big')
+
+    @contextmanager
+    def scope(self, *keys):
+        """Use the keys - e.g. 'card', 12 - for all streams in a block of code.
+
+        A scope always starts afresh; so the streams used within it are the same
+        each time it is used.
+        """
+        saved = self.path
+        self.path = saved + tuple(keys)
+        size = len(self.path)
+        self.counters = {
+            path: count for path, count in self.counters.items()
+            if path[:size] != self.path}
+        try:
+            yield self
+        finally:
+            self.path = saved
+
+    def number(self, *keys) -> int:
+        """Return the seed for the next stream in the current scope."""
+        path = self.path + tuple(keys)
+        count = self.counters.get(path, 0)
+        self.counters[path] = count + 1
+        return self.derive(*path, count)
+
+    def generator(self, *keys) -> random.Random:
+        """Return a random number generator for the next stream in the current scope."""
+        return random.Random(self.number(*keys))
+
+
+STREAMS = Streams()
+
+
+def set_seed(seed=None):
+    """Set the document seed for all streams."""
+    STREAMS.set_seed(seed)
+
+
+def scope(*keys):
+    """Use the keys for all streams in a block of code (see Streams.scope)."""
+    return STREAMS.scope(*keys)
+
+
+def number(*keys) -> int:
+    """Return the seed for the next stream in the current scope."""
+    return STREAMS.number(*keys)
+
+
+def generator(*keys) -> random.Random:
+    """Return a random number generator for the next stream in the current scope."""
+    return STREAMS.generator(*keys)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""
+Read-only, streaming, spreadsheet (XLS, XLSX and ODS) readers for protograf
+
+Each reader yields one row at a time as a tuple of (row number, values, kinds);
+where the kind of each value is one of:
+
+- 'n' - number (as text or float)
+- 's' - index into an XLSX file's shared strings
+- 'b' - boolean
+- 'str' - text
+- None - empty
+"""
+# lib
+import logging
+import os
+import posixpath
+import xml.etree.ElementTree as ET
+import zipfile
+# third party
+import xlrd
+# local
+from protograf.utils.support import feedback
+
+log = logging.getLogger(__name__)
+
+DEBUG = False
+ODS_OFFICE = '{urn:oasis:names:tc:opendocument:xmlns:office:1.0}'
+ODS_TABLE = '{urn:oasis:names:tc:opendocument:xmlns:table:1.0}'
+ODS_TEXT = '{urn:oasis:names:tc:opendocument:xmlns:text:1.0}'
+RELATIONSHIPS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+XLS_KINDS = {
+    xlrd.XL_CELL_NUMBER: 'n', xlrd.XL_CELL_DATE: 'n', xlrd.XL_CELL_TEXT: 'str',
+    xlrd.XL_CELL_BOOLEAN: 'b', xlrd.XL_CELL_ERROR: 'str'}
+XLSX_KINDS = {'n': 'n', 's': 's', 'b': 'b', 'str': 'str', 'e': 'str', 'd': 'str'}
+
+
+class SheetError(Exception):
+    """A sheet, or cell range, cannot be found or read."""
+
+
+def column_index(ref: str) -> int:
+    """Return the zero-based column of a cell reference e.g. AB12 or AB.
+
+    Doc Test:
+    >>> column_index('A1'), column_index('AB12'), column_index('c')
+    (0, 27, 2)
+    """
+    col = 0
+    for char in ref:
+        if char.isdigit():
+            break
+        col = col * 26 + (ord(char.upper()) - 64)
+    return col - 1
+
+
+def cell_range(cells: str) -> tuple:
+    """Return zero-based (first row, first col, last row, last col) of a range.
+
+    Any part that is not given is None e.g. a range of columns only.
+
+    Doc Test:
+    >>> cell_range('B2:D100')
+    (1, 1, 99, 3)
+    >>> cell_range('A:C')
+    (None, 0, None, 2)
+    >>> cell_range('C5')
+    (4, 2, None, None)
+    """
+    def position(ref):
+        ref = ref.strip().replace('$', '')
+        letters = ref.rstrip('0123456789')
+        digits = ref[len(letters):]
+        if not (letters or digits) or not letters.isalpha() and letters:
+            raise SheetError(f'"{cells}" is not a valid cell range')
+        return (int(digits) - 1 if digits else None,
+                column_index(letters) if letters else None)
+
+    first, _, last = (cells or '').partition(':')
+    first_row, first_col = position(first)
+    last_row, last_col = position(last) if last else (None, None)
+    return first_row, first_col, last_row, last_col
+
+
+def number(value):
+    """Return a number, as an int if it is a whole number.
+
+    Doc Test:
+    >>> number('3'), number('2.5'), number(4.0)
+    (3, 2.5, 4)
+    """
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def xls_rows(filename: str, sheet=None):
+    """Yield rows from a sheet (name, or zero-based index) of an XLS file."""
+    book = xlrd.open_workbook(filename, on_demand=True)
+    try:
+        try:
+            if isinstance(sheet, str):
+                worksheet = book.sheet_by_name(sheet)
+            else:
+                worksheet = book.sheet_by_index(sheet or 0)
+        except (IndexError, xlrd.biffh.XLRDError) as err:
+            raise SheetError(f'Unable to open sheet "{sheet}"') from err
+        for row in range(worksheet.nrows):
+            yield row, worksheet.row_values(row), [
+                XLS_KINDS.get(kind) for kind in worksheet.row_types(row)]
+    finally:
+        book.release_resources()
+
+
+def xlsx_shared_strings(archive: zipfile.ZipFile) -> list:
+    """Return all of the shared strings in an XLSX file."""
+    strings = []
+    try:
+        source = archive.open('xl/sharedStrings.xml')
+    except KeyError:
+        return strings
+    with source:
+        for _, elem in ET.iterparse(source):
+            if elem.tag.endswith('}si'):
+                texts = [child.text or '' for child in elem if child.tag.endswith('}t')]
+                texts += [
+                    run.text or '' for child in elem if child.tag.endswith('}r')
+                    for run in child if run.tag.endswith('}t')]
+                strings.append(''.join(texts))
+                elem.clear()
+    return strings
+
+
+def xlsx_sheet_path(archive: zipfile.ZipFile, sheet=None) -> str:
+    """Return the path, in an XLSX file, of a sheet (name, or zero-based index)."""
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    sheets = [elem for elem in workbook.iter() if elem.tag.endswith('}sheet')]
+    relations = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    targets = {rel.get('Id'): rel.get('Target') for rel in relations}
+    try:
+        if isinstance(sheet, str):
+            found = [elem for elem in sheets if elem.get('name') == sheet][0]
+        else:
+            found = sheets[sheet or 0]
+    except IndexError as err:
+        raise SheetError(f'Unable to open sheet "{sheet}"') from err
+    target = targets[found.get(f'{RELATIONSHIPS}id')]
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join('xl', target))
+
+
+def xlsx_rows(filename: str, sheet=None, shared: list = None):
+    """Yield rows from a sheet (name, or zero-based index) of an XLSX file.
+
+    Rows are parsed one at a time and then cleared, so memory use does not
+    grow with the amount of data in the sheet.
+    """
+    with zipfile.ZipFile(filename) as archive:
+        path = xlsx_sheet_path(archive, sheet)
+        if shared is not None:
+            shared.extend(xlsx_shared_strings(archive))
+        with archive.open(path) as source:
+            row_number, ns, columns = -1, None, {}  # columns; key: letters
+            for _, elem in ET.iterparse(source):
+                if ns is None:  # either the strict or the transitional namespace
+                    ns = elem.tag[:elem.tag.index('}') + 1] if '}' in elem.tag else ''
+                    ROW, CELL, VALUE, TEXT = f'{ns}row', f'{ns}c', f'{ns}v', f'{ns}t'
+                if elem.tag != ROW:
+                    continue
+                ref = elem.get('r')
+                row_number = int(ref) - 1 if ref else row_number + 1
+                values, kinds = [], []
+                for cell in elem:
+                    if cell.tag != CELL:
+                        continue
+                    ref = cell.get('r')
+                    if ref:
+                        letters = ref.rstrip('0123456789')
+                        col = columns.get(letters)
+                        if col is None:
+                            col = columns[letters] = column_index(letters)
+                        if col > len(values):
+                            values.extend([''] * (col - len(values)))
+                            kinds.extend([None] * (col - len(kinds)))
+                    kind = cell.get('t', 'n')
+                    if kind == 'inlineStr':
+                        values.append(''.join(text.text or '' for text in cell.iter(TEXT)))
+                        kinds.append('str')
+                        continue
+                    value = cell.find(VALUE)
+                    if value is None or value.text is None:
+                        values.append('')
+                        kinds.append(None)
+                    else:
+                        values.append(value.text)
+                        kinds.append(XLSX_KINDS.get(kind, 'str'))
+                yield row_number, values, kinds
+                elem.clear()
+
+
+def ods_cell(cell) -> tuple:
+    """Return the (value, kind) of an ODS table cell."""
+    value_type = cell.get(f'{ODS_OFFICE}value-type')
+    if value_type is None:
+        return '', None
+    if value_type in ['float', 'percentage', 'currency']:
+        return cell.get(f'{ODS_OFFICE}value'), 'n'
+    if value_type == 'boolean':
+        return cell.get(f'{ODS_OFFICE}boolean-value'), 'b'
+    if value_type in ['date', 'time']:
+        return cell.get(f'{ODS_OFFICE}{value_type}-value'), 'str'
+    paragraphs = [''.join(para.itertext()) for para in cell.iter(f'{ODS_TEXT}p')]
+    return '\n'.join(paragraphs), 'str'
+
+
+def ods_rows(filename: str, sheet=None):
+    """Yield rows from a sheet (name, or zero-based index) of an ODS file.
+
+    Rows are parsed one at a time and then discarded; repeated empty rows and
+    cells - which pad a sheet out to its full size - are skipped.
+    """
+    TABLE, ROW = f'{ODS_TABLE}table', f'{ODS_TABLE}table-row'
+    REPEAT_ROWS = f'{ODS_TABLE}number-rows-repeated'
+    REPEAT_COLS = f'{ODS_TABLE}number-columns-repeated'
+    with zipfile.ZipFile(filename) as archive, archive.open('content.xml') as source:
+        index, active, found = -1, None, False
+        row_number = 0
+        for event, elem in ET.iterparse(source, events=('start', 'end')):
+            if elem.tag == TABLE:
+                if event == 'start':
+                    index += 1
+                    if (isinstance(sheet, str) and elem.get(f'{ODS_TABLE}name') == sheet) \
+                            or (not isinstance(sheet, str) and index == (sheet or 0)):
+                        active, found = elem, True
+                elif active is not None:
+                    break  # finished the required sheet
+                continue
+            if event != 'end' or elem.tag != ROW or active is None:
+                continue
+            values, kinds, empty = [], [], 0
+            for cell in elem:
+                value, kind = ods_cell(cell)
+                repeat = int(cell.get(REPEAT_COLS, 1))
+                if kind is None:
+                    empty += repeat  # only kept if followed by a value
+                    continue
+                if empty:
+                    values.extend([''] * empty)
+                    kinds.extend([None] * empty)
+                    empty = 0
+                values.extend([value] * repeat)
+                kinds.extend([kind] * repeat)
+            repeat = int(elem.get(REPEAT_ROWS, 1))
+            if values:
+                for _ in range(repeat):
+                    yield row_number, values, kinds
+                    row_number += 1
+            else:
+                row_number += repeat
+            elem.clear()
+            active.clear()
+        if not found:
+            raise SheetError(f'Unable to open sheet "{sheet}"')
+
+
+def convert_column(values: list, kinds: list, shared: list = None) -> list:
+    """Return the values of a column converted, as per their kind, to Python types.
+
+    If every value in the column is of the same kind, the column is converted
+    in one pass; otherwise each value is converted as per its own kind.
+
+    Doc Test:
+    >>> convert_column(['1', '2.5'], ['n', 'n'])
+    [1, 2.5]
+    >>> convert_column(['0', 'x', '', '1'], ['s', 'str', None, 'b'], shared=['a'])
+    ['a', 'x', '', True]
+    """
+    converters = {
+        'n': number,
+        's': lambda value: shared[int(value)],
+        'b': lambda value: str(value).lower() in ['1', '1.0', 'true'],
+        'str': str,
+    }
+    column_kinds = set(kinds)
+    if len(column_kinds) == 1:
+        kind = column_kinds.pop()
+        if kind is None:
+            return values
+        return list(map(converters[kind], values))
+    return [converters[kind](value) if kind else value
+            for value, kind in zip(values, kinds)]
+
+
+def read_sheet(filename: str, sheet=None, cells: str = None, headers: list = None,
+               selected: list = None) -> list:
+    """Read a sheet of an XLS, XLSX or ODS file into a list of dictionaries.
+
+    Args:
+        sheet: name, or zero-based index, of the sheet; by default, the first
+        cells: the range of cells to read e.g. 'B2:F500' or 'A:D'; by
+            default, all of them
+        headers: a list of names to use instead of the first row (of the range)
+        selected: a list of the (spreadsheet) row numbers to keep e.g. [2,4,7]
+
+    Note:
+        Values are collected by column, and each column is converted to
+        numbers, text or booleans as a whole.  Values in a column without
+        a header are kept (with a warning), under a blank key; but values
+        beyond a supplied list of headers are an error.
+    """
+    _, ext = os.path.splitext(filename)
+    shared = []
+    match ext.lower():
+        case '.xls':
+            rows = xls_rows(filename, sheet)
+        case '.xlsx' | '.xlsm':
+            rows = xlsx_rows(filename, sheet, shared=shared)
+        case '.ods':
+            rows = ods_rows(filename, sheet)
+        case _:
+            raise SheetError(f'Unable to read a spreadsheet of type "{ext}"')
+    first_row, first_col, last_row, last_col = cell_range(cells) if cells else \
+        (None, None, None, None)
+    first_row, first_col = first_row or 0, first_col or 0
+    end_col = last_col + 1 if last_col is not None else None
+    keys, columns, kinds = list(headers) if headers else None, None, None
+    for row_number, values, value_kinds in rows:
+        if row_number < first_row:
+            continue
+        if last_row is not None and row_number > last_row:
+            break
+        values = values[first_col:end_col]
+        value_kinds = value_kinds[first_col:end_col]
+        if keys is None:
+            keys = [convert_column([value], [kind], shared)[0]
+                    for value, kind in zip(values, value_kinds)]
+            continue
+        if not any(value_kinds):
+            continue  # blank row
+        if selected and row_number + 1 not in selected:
+            continue
+        if columns is None:
+            columns = [[] for _ in keys]
+            kinds = [[] for _ in keys]
+        # ---- values beyond the last header
+        if any(value_kinds[len(keys):]):
+            if headers:
+                raise SheetError(
+                    f'Too few headers supplied for the existing columns (row {row_number + 1})')
+            used = max(col for col, kind in enumerate(value_kinds) if kind) + 1
+            rows_read = len(columns[0]) if columns else 0
+            for _ in range(len(keys), used):
+                keys.append('')
+                columns.append([''] * rows_read)
+                kinds.append([None] * rows_read)
+        size = len(values)
+        for col, column in enumerate(columns):
+            if col < size:
+                column.append(values[col])
+                kinds[col].append(value_kinds[col])
+            else:
+                column.append('')
+                kinds[col].append(None)
+    # ---- unused columns without a header
+    while keys and keys[-1] == '' and not any(kinds[-1] if kinds else []):
+        keys.pop()
+        if columns:
+            columns.pop()
+            kinds.pop()
+    if not keys or not columns:
+        return []
+    if '' in keys and any(any(kinds[col]) for col, key in enumerate(keys) if key == ''):
+        feedback(f'Some values in "{filename}" are in a column without a header',
+                 False, True)
+    columns = [convert_column(column, column_kinds, shared)
+               for column, column_kinds in zip(columns, kinds)]
+    return [dict(zip(keys, row)) for row in zip(*columns)]
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
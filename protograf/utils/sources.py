@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+Database (SQLite) and Parquet data sources for protograf
+
+A simple Deck `mask` - comparisons of columns with values, combined with
+and / or / not - is "pushed down" to the source, so that rows which would be
+masked are never loaded.  The translated filter only ever removes rows that the
+mask itself would remove; any part of a mask that cannot be translated is
+left out; and the mask is still checked, as normal, for all loaded rows.
+"""
+# lib
+import ast
+import logging
+import os
+import re
+import sqlite3
+# third party
+import jinja2
+from jinja2 import meta
+# local
+from protograf.utils.support import feedback
+from protograf.utils.tools import EXPRESSION_NODES, script_path
+
+log = logging.getLogger(__name__)
+
+DEBUG = False
+OPERATORS = {
+    ast.Eq: '==', ast.NotEq: '!=', ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>',
+    ast.GtE: '>=', ast.In: 'in', ast.NotIn: 'not in'}
+REVERSED = {'==': '==', '!=': '!=', '<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+
+def mask_tree(mask) -> ast.expr:
+    """Return the parsed Python expression of a mask; or None.
+
+    Doc Test:
+    >>> mask_tree("{{ Race == 'Hobbit' }}").__class__.__name__
+    'Compare'
+    >>> mask_tree("{{ Race | lower == 'elf' }}") is None
+    True
+    """
+    if not isinstance(mask, str):
+        return None
+    source = mask.strip()
+    match = re.fullmatch(r'\{\{(.*)\}\}', source, re.DOTALL)
+    expression = match.group(1).strip() if match else source
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError:
+        return None
+    if all(isinstance(node, EXPRESSION_NODES) for node in ast.walk(tree)):
+        return tree.body
+    return None
+
+
+def mask_columns(mask) -> list:
+    """Return the names of the columns used in a mask.
+
+    Doc Test:
+    >>> mask_columns("{{ Race == 'Hobbit' and Age < 39 }}")
+    ['Age', 'Race']
+    >>> mask_columns("Race | lower == 'elf'")
+    ['Race']
+    """
+    if not isinstance(mask, str):
+        return []
+    source = mask.strip()
+    if '{{' not in source:
+        source = '{{ %s }}' % source
+    try:
+        return sorted(meta.find_undeclared_variables(jinja2.Environment().parse(source)))
+    except jinja2.exceptions.TemplateSyntaxError:
+        return []
+
+
+def constant(node):
+    """Return the value of a constant, or list of constants; else raise ValueError."""
+    if isinstance(node, ast.Constant) and node.value is not None:
+        return node.value
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return [constant(item) for item in node.elts]
+    raise ValueError('not a constant')
+
+
+def comparisons(node) -> list:
+    """Return the (column, operator, value) parts of a - possibly chained - compare."""
+    parts = []
+    left = node.left
+    for op, right in zip(node.ops, node.comparators):
+        operator = OPERATORS.get(type(op))
+        if operator is None:
+            raise ValueError('unknown operator')
+        if isinstance(left, ast.Name):
+            parts.append((left.id, operator, constant(right)))
+        elif isinstance(right, ast.Name) and operator in REVERSED:
+            parts.append((right.id, REVERSED[operator], constant(left)))
+        else:
+            raise ValueError('not a comparison of a column with a value')
+        left = right
+    return parts
+
+
+def translate(node, builder, subset: bool = True):
+    """Translate a mask's expression via a builder; or return None.
+
+    If `subset` is True, the result is only true where the mask is true; if
+    False, the result is true wherever the mask is true.  Parts that cannot be
+    translated are left out if the result stays a subset (or superset).
+    """
+    try:
+        if isinstance(node, ast.Compare):
+            terms = [builder.compare(*part) for part in comparisons(node)]
+            return terms[0] if len(terms) == 1 else builder.and_(terms)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            term = translate(node.operand, builder, not subset)
+            return None if term is None else builder.not_(term)
+        if isinstance(node, ast.BoolOp):
+            terms = [translate(value, builder, subset) for value in node.values]
+            found = [term for term in terms if term is not None]
+            optional = isinstance(node.op, ast.Or) == subset  # can leave parts out
+            if not found or (len(found) < len(terms) and not optional):
+                return None
+            if len(found) == 1:
+                return found[0]
+            return builder.or_(found) if isinstance(node.op, ast.Or) \
+                else builder.and_(found)
+    except ValueError:
+        pass
+    return None
+
+
+class SQLBuilder:
+    """Build an SQLite WHERE clause, with parameters, from a mask.
+
+    Note:
+        * a column is used as +"name" so that the column's type affinity is
+          not applied; e.g. the TEXT '5' is not equal to 5, as in Python
+
+    Doc Test:
+    >>> where = mask_filter("{{ Race == 'Hobbit' or Age < 39 }}", SQLBuilder())
+    >>> where
+    ('(+"Race" = ? OR +"Age" < ?)', ['Hobbit', 39])
+    >>> import sqlite3
+    >>> db = sqlite3.connect(':memory:')
+    >>> _ = db.execute('CREATE TABLE t (ID INTEGER, N TEXT, M INTEGER)')
+    >>> _ = db.executemany('INSERT INTO t VALUES (?, ?, ?)', [(1, '5', 5), (2, 'x', 7)])
+    >>> def masked(mask):
+    ...     sql, params = mask_filter(mask, SQLBuilder())
+    ...     return [row[0] for row in db.execute(f'SELECT ID FROM t WHERE {sql}', params)]
+    >>> masked("{{ N == 5 }}"), masked("{{ N in [5] }}"), masked("{{ M == '5' }}")
+    ([], [], [])
+    >>> masked("{{ N == '5' }}"), masked("{{ M == 5 }}"), masked("{{ N not in ['5'] }}")
+    ([1], [1], [2])
+    """
+
+    @staticmethod
+    def quote(name: str) -> str:
+        return '"%s"' % name.replace('"', '""')
+
+    def column(self, name: str) -> str:
+        return '+' + self.quote(name)  # NB: the unary + removes any type affinity
+
+    def compare(self, column, operator, value):
+        if operator in ['in', 'not in']:
+            if not isinstance(value, list):
+                raise ValueError('not a list')
+            marks = ', '.join('?' * len(value))
+            return f'{self.column(column)} {operator.upper()} ({marks})', list(value)
+        if isinstance(value, list):
+            raise ValueError('not a value')
+        operator = '=' if operator == '==' else operator
+        return f'{self.column(column)} {operator} ?', [value]
+
+    def and_(self, terms):
+        return self.combine(terms, 'AND')
+
+    def or_(self, terms):
+        return self.combine(terms, 'OR')
+
+    def not_(self, term):
+        return f'NOT ({term[0]})', term[1]
+
+    @staticmethod
+    def combine(terms, joiner):
+        return (f'({f" {joiner} ".join(term[0] for term in terms)})',
+                [param for term in terms for param in term[1]])
+
+
+class ArrowBuilder:
+    """Build a pyarrow compute expression from a mask."""
+
+    def __init__(self):
+        import pyarrow.compute as pc
+        self.pc = pc
+
+    def compare(self, column, operator, value):
+        field = self.pc.field(column)
+        if operator in ['in', 'not in']:
+            if not isinstance(value, list):
+                raise ValueError('not a list')
+            term = field.isin(value)
+            return ~term if operator == 'not in' else term
+        if isinstance(value, list):
+            raise ValueError('not a value')
+        match operator:
+            case '==':
+                return field == value
+            case '!=':
+                return field != value
+            case '<':
+                return field < value
+            case '<=':
+                return field <= value
+            case '>':
+                return field > value
+            case '>=':
+                return field >= value
+
+    def and_(self, terms):
+        result = terms[0]
+        for term in terms[1:]:
+            result = result & term
+        return result
+
+    def or_(self, terms):
+        result = terms[0]
+        for term in terms[1:]:
+            result = result | term
+        return result
+
+    def not_(self, term):
+        return ~term
+
+
+def mask_filter(mask, builder):
+    """Return a builder's filter that is only true for rows the mask is true for."""
+    tree = mask_tree(mask)
+    return None if tree is None else translate(tree, builder, subset=True)
+
+
+def projection(columns: list = None, mask=None) -> list:
+    """Return the columns to load; including any used by the mask.
+
+    Doc Test:
+    >>> projection(['Name'], "{{ Race == 'Elf' }}")
+    ['Name', 'Race']
+    >>> projection(['Name', 'Race'], "{{ Race == 'Elf' }}")
+    ['Name', 'Race']
+    >>> projection(None, "{{ Race == 'Elf' }}") is None
+    True
+    """
+    if not columns:
+        return None
+    return list(dict.fromkeys(list(columns) + mask_columns(mask)))
+
+
+def locate(filename: str, label: str) -> str:
+    """Return the path to a file; if not found, look in the script's directory."""
+    if os.path.exists(filename):
+        return filename
+    _filename = os.path.join(script_path(), filename)
+    if not os.path.exists(_filename):
+        feedback(f'Unable to find the {label} "{filename}", including in {script_path()}',
+                 True)
+    return _filename
+
+
+def read_database(database: str, query: str = None, table: str = None,
+                  columns: list = None, mask=None) -> list:
+    """Read records from an SQLite database, using a query or a table.
+
+    Args:
+        query: an SQL SELECT statement
+        table: name of a table (if no query is given)
+        columns: names of the columns to load; by default, all of them
+        mask: a Deck mask; rows it would mask are not loaded, if possible
+
+    Returns:
+        list of dicts; one per row
+    """
+    if not query and not table:
+        feedback('A query or table must be supplied to read from a database!', True)
+    database = locate(database, 'database')
+    source = query.strip().rstrip(';') if query else f'SELECT * FROM {SQLBuilder.quote(table)}'
+    _columns = projection(columns, mask)
+    select = ', '.join(SQLBuilder.quote(column) for column in _columns) if _columns else '*'
+    sql, params = f'SELECT {select} FROM ({source})', []
+    where = mask_filter(mask, SQLBuilder())
+    if where:
+        sql, params = f'{sql} WHERE ({where[0]}) IS NOT 1', where[1]
+    log.debug("Database query: %s %s", sql, params)
+    try:
+        with sqlite3.connect(f'file:{database}?mode=ro', uri=True) as connection:
+            cursor = connection.execute(sql, params)
+            names = [item[0] for item in cursor.description]
+            return [dict(zip(names, row)) for row in cursor]
+    except sqlite3.Error as err:
+        feedback(f'Unable to read from the database "{database}" ({err})', True)
+    return []
+
+
+def read_parquet(filename: str, columns: list = None, mask=None) -> list:
+    """Read records from a Parquet file; needs the pyarrow library.
+
+    Args:
+        columns: names of the columns to load; by default, all of them
+        mask: a Deck mask; rows it would mask are not loaded, if possible
+
+    Returns:
+        list of dicts; one per row
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        feedback('Please install the "pyarrow" library to read Parquet files.', True)
+    filename = locate(filename, 'Parquet file')
+    _columns = projection(columns, mask)
+    masked = mask_filter(mask, ArrowBuilder())
+    keep = None if masked is None else ~masked | masked.is_null()
+    try:
+        table = pq.read_table(filename, columns=_columns, filters=keep)
+    except (TypeError, NotImplementedError) as err:  # e.g. compare of text and number
+        log.debug("Unable to filter %s with %s: %s", filename, mask, err)
+        table = pq.read_table(filename, columns=_columns)
+    except (OSError, ValueError, KeyError) as err:
+        feedback(f'Unable to read the Parquet file "{filename}" ({err})', True)
+    return table.to_pylist()
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
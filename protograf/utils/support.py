@@ -4,9 +4,14 @@ Support utilities for draw module
 """
 # lib
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import hashlib
 import itertools
+import json
 import os
 import math
+import re
 import sys
 import string
 from typing import Any
@@ -14,7 +19,10 @@ from typing import Any
 import imageio
 import pymupdf
 
-LookupType = namedtuple("LookupType", ["column", "lookups"])
+MIN_IMAGE_PIXELS = 32  # an image is never downsampled to fewer pixels on a side
+
+LookupType = namedtuple(
+    "LookupType", ["column", "lookups", "result", "default"], defaults=[None, None])
 
 
 def feedback(item, stop=False, warn=False):
@@ -215,6 +223,11 @@ def combinations(_object, size=2, repeat=1, delimiter=','):
         repeat: int
             how many times to repeat item in original list
 
+    Note:
+        Unlike Matrix (see utils.product), the full list is created; the
+        combinations are returned without duplicates, and sorted, which
+        needs all of them.
+
     Doc Test:
 
     >>> combinations([1,2,3])
@@ -343,9 +356,14 @@ def pdf_to_png(
         dpi: int = 300,
         names: list = None,
         directory: str = None,
-        framerate: float = 1.0):
+        framerate: float = 1.0,
+        document=None):
     """Extract pages from PDF as PNG image(s).  Optionally, assemble into a GIF.
 
+    Note:
+        * an already open pymupdf document can be supplied, to avoid
+          reloading the PDF from file
+
     Uses:
         * https://pymupdf.io/
         * https://pypi.org/project/imageio/
@@ -374,7 +392,7 @@ def pdf_to_png(
             feedback(f'The names setting "{names}" does not contain a unique list of names.',
                      False, True)
     try:
-        doc = pymupdf.open(filename)
+        doc = document or pymupdf.open(filename)
         pages = doc.page_count
         all_pngs = []  # track full and final name of each saved .png
         # save pages as .png files
@@ -409,6 +427,556 @@ def pdf_to_png(
         feedback(f'Unable to extract images for {filename} - {err}!')
 
 
+def preview_images(
+        document,
+        dpi: int = 50,
+        pages: list = None,
+        frames: dict = None) -> list:
+    """Rasterize pages - or card frames - of an open pymupdf document.
+
+    Args:
+        pages: list of page numbers to render; default is all pages
+        frames: dict of card number: (page number, (x, y, width, height));
+            a frame is in points, with origin at the page's bottom-left
+
+    Returns:
+        list of tuples of (label, pymupdf.Pixmap); a label is a page number
+        or, for a card, 'card-' plus the card number
+
+    Note:
+        * page numbers start at 1
+    """
+    images = []
+    if frames:
+        for number, (page_number, frame) in frames.items():
+            if page_number < 1 or page_number > document.page_count:
+                continue
+            page = document[page_number - 1]
+            clip = frame_clip(page, frame)
+            images.append((f'card-{number}', page.get_pixmap(dpi=dpi, clip=clip)))
+        return images
+    for page_number in pages or range(1, document.page_count + 1):
+        if page_number < 1 or page_number > document.page_count:
+            feedback(f'Cannot preview page {page_number} - there are only'
+                     f' {document.page_count} page(s).', False, True)
+            continue
+        images.append((page_number, document[page_number - 1].get_pixmap(dpi=dpi)))
+    return images
+
+
+def frame_clip(page, frame: tuple) -> pymupdf.Rect:
+    """Convert a frame (x, y, width, height) - in points, with the origin at
+    the page's bottom-left - into a pymupdf Rect (origin at top-left)."""
+    x, y, width, height = frame
+    top = page.rect.height - y - height
+    return pymupdf.Rect(x, top, x + width, top + height)
+
+
+def definition(value, memo: dict = None) -> str:
+    """Return a description of a value, which is the same between runs.
+
+    Shapes are described by their class and settings (kwargs); functions by
+    their code; other objects by their public attributes; and the name of an
+    existing file also includes its size and the time it was changed.
+
+    Args:
+        memo: descriptions of objects, already created, by their id
+
+    Doc Test:
+
+    >>> definition({'b': [1, 2.5], 'a': (None, 'x')})
+    "{'a': (None, 'x'), 'b': [1, 2.5]}"
+    >>> definition(lambda row: row['X']) == definition(lambda row: row['X'])
+    True
+    >>> definition(lambda row: row['X']) == definition(lambda row: row['Y'])
+    False
+    """
+    memo = {} if memo is None else memo
+    if isinstance(value, str):
+        if len(value) < 1024 and os.path.isfile(value):
+            stat = os.stat(value)
+            return repr((value, stat.st_size, stat.st_mtime_ns))
+        return repr(value)
+    if value is None or isinstance(value, (bool, int, float, complex, bytes)):
+        return repr(value)
+    if isinstance(value, dict):
+        items = sorted(
+            (definition(key, memo), definition(item, memo)) for key, item in value.items())
+        return '{' + ', '.join(f'{key}: {item}' for key, item in items) + '}'
+    if isinstance(value, (list, tuple)):
+        items = ', '.join(definition(item, memo) for item in value)
+        return f'[{items}]' if isinstance(value, list) else f'({items})'
+    if isinstance(value, (set, frozenset)):
+        return '{' + ', '.join(sorted(definition(item, memo) for item in value)) + '}'
+    key = id(value)
+    if key in memo:
+        return memo[key]
+    memo[key] = f'<{type(value).__name__}>'  # in case an object refers to itself
+    code = getattr(value, '__code__', None) or getattr(
+        getattr(value, 'root_render_func', None), '__code__', None)  # Jinja2 Template
+    if code is not None:
+        result = f'{type(value).__name__}:{code_digest(code)}'
+    elif isinstance(getattr(value, 'kwargs', None), dict):  # a shape
+        result = f'{type(value).__name__}{definition(value.kwargs, memo)}'
+    elif hasattr(value, '__dict__'):
+        attributes = {
+            name: item for name, item in vars(value).items()
+            if not name.startswith('_') and name not in ('dataset', 'deck_data')}
+        result = f'{type(value).__name__}{definition(attributes, memo)}'
+    else:
+        result = re.sub(r' at 0x[0-9a-fA-F]+', '', repr(value))
+    memo[key] = result
+    return result
+
+
+def code_digest(code) -> str:
+    """Return a digest of compiled code, including that of any nested functions."""
+    digest = hashlib.sha1(code.co_code)
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            digest.update(code_digest(const).encode())
+        else:
+            digest.update(repr(const).encode())
+    digest.update(repr(code.co_names).encode())
+    return digest.hexdigest()
+
+
+def render_frame(page, frame: tuple, size: tuple) -> pymupdf.Pixmap:
+    """Rasterize a frame of a page to an image of exactly size (width, height) pixels."""
+    clip = frame_clip(page, frame)
+    width, height = size
+    matrix = pymupdf.Matrix(width / clip.width, height / clip.height)
+    pix = page.get_pixmap(matrix=matrix, clip=clip)
+    if (pix.width, pix.height) != (width, height):
+        pix = pymupdf.Pixmap(pix, width, height, None)
+    return pix
+
+
+def render_frames(source: bytes, jobs: list) -> list:
+    """Rasterize frames of a PDF; used by worker processes (see save_atlas).
+
+    Args:
+        source: PDF, as bytes
+        jobs: list of (card number, page number, frame, size, filename)
+
+    Returns:
+        list of (card number, width, height, samples) for each image; each is
+        also saved as a PNG file
+    """
+    document = pymupdf.open(stream=source, filetype='pdf')
+    results = []
+    for number, page_number, frame, size, filename in jobs:
+        pix = render_frame(document[page_number - 1], frame, size)
+        pix.save(filename)
+        results.append((number, pix.width, pix.height, pix.samples))
+    return results
+
+
+def save_atlas(
+        filename: str,
+        frames: dict,
+        digests: dict,
+        draw,
+        directory: str = None,
+        grid: tuple = (10, 7),
+        size: tuple = None,
+        dpi: int = 300,
+        rows: list = None,
+        workers: int = None) -> dict:
+    """Save card images as sprite sheet(s) ("atlas"), card images and a manifest.
+
+    Args:
+        filename: the PDF file; its name is used as a prefix for all the files
+        frames: dict of card number: list of (page number, frame) - as drawn
+            in the PDF; used for the number of copies, and size, of each card
+        digests: dict of card number: digest of all that is used to draw the
+            card (see DeckShape.card_digests)
+        draw: function that draws only the cards in a list of card numbers,
+            and returns (pymupdf document, dict of card number: (page number,
+            frame))
+        directory: where files are saved; by default, that of the PDF file
+        grid: number of (columns, rows) of cards in each sheet
+        size: (width, height) of each card image in pixels; by default, this
+            is set from the first frame and the dpi
+        rows: the dataset (list of dicts); used to link each card to its
+            data row; or None
+        workers: number of processes to render with; default is one per CPU
+            (only where "fork" is the default way to start a process, as on
+            Linux; otherwise cards are rendered in turn)
+
+    Returns:
+        the manifest, as a dict; this is also saved as a JSON file
+
+    Note:
+        * a card is only drawn, and its image rendered, again if the card's
+          digest is not the same as in the existing manifest (or its image
+          is missing); the PDF itself is not read
+    """
+    basename = os.path.splitext(os.path.basename(filename))[0]
+    directory = directory or os.path.dirname(filename) or '.'
+    if not os.path.exists(directory):
+        feedback(f'Cannot find the directory "{directory}" - please create this first.',
+                 True)
+    cols, rows_per = grid
+    firsts = {number: items[0] for number, items in sorted(frames.items()) if items}
+    if not firsts:
+        feedback('There are no cards to save in an atlas.', True)
+    if not size:
+        _, (_, _, width, height) = next(iter(firsts.values()))
+        size = (round(width * dpi / 72.0), round(height * dpi / 72.0))
+    size = tuple(int(value) for value in size)
+    # ---- previous manifest
+    manifest_name = os.path.join(directory, f'{basename}-atlas.json')
+    previous = {}
+    if os.path.exists(manifest_name):
+        try:
+            with open(manifest_name, encoding='utf-8') as manifest_file:
+                old = json.load(manifest_file)
+            if tuple(old.get('size', [])) == size:
+                previous = {card['card']: card for card in old.get('cards', [])}
+        except (ValueError, OSError) as err:
+            feedback(f'Unable to read "{manifest_name}" - {err}', False, True)
+    # ---- render changed cards
+    cards, changed, images = [], [], {}
+    for key, number in enumerate(firsts):
+        sheet, cell = divmod(key, cols * rows_per)
+        filename = os.path.join(directory, f'{basename}-card-{number}.png')
+        cards.append({
+            'card': number,
+            'data_row': number if rows and number <= len(rows) else None,
+            'copies': len(frames[number]),
+            'sheet': sheet + 1,
+            'col': cell % cols,
+            'row': cell // cols,
+            'x': (cell % cols) * size[0],
+            'y': (cell // cols) * size[1],
+            'file': os.path.basename(filename),
+            'hash': digests[number]})
+        old = previous.get(number)
+        if old and old.get('hash') == digests[number] and os.path.exists(filename):
+            images[number] = pymupdf.Pixmap(filename)
+        else:
+            changed.append((number, filename))
+    jobs = []
+    if changed:
+        document, drawn = draw([number for number, _ in changed])
+        jobs = [(number, *drawn[number], size, filename)
+                for number, filename in changed if number in drawn]
+    if jobs:
+        workers = workers or os.cpu_count() or 1
+        chunks = [jobs[key::workers] for key in range(min(workers, len(jobs)))]
+        source = document.tobytes()
+        # NB: a "spawn" worker re-imports (and re-runs) the script; and "fork" is
+        #     only safe where it is the default (e.g. not on macOS)
+        method = multiprocessing.get_start_method(allow_none=True) or \
+            multiprocessing.get_all_start_methods()[0]
+        if len(chunks) > 1 and method == 'fork':
+            with ProcessPoolExecutor(
+                    max_workers=len(chunks),
+                    mp_context=multiprocessing.get_context('fork')) as executor:
+                results = list(executor.map(render_frames, [source] * len(chunks), chunks))
+        else:
+            results = [render_frames(source, chunk) for chunk in chunks]
+        for number, width, height, samples in itertools.chain(*results):
+            images[number] = pymupdf.Pixmap(pymupdf.csRGB, width, height, samples, 0)
+    # ---- assemble sheets
+    sheets = []
+    lines = rows_per  # a single sheet only needs enough rows for its cards
+    if len(cards) <= cols * rows_per:
+        lines = (len(cards) + cols - 1) // cols
+    for sheet, sheet_cards in itertools.groupby(cards, key=lambda card: card['sheet']):
+        sheet_cards = list(sheet_cards)
+        atlas = pymupdf.Pixmap(
+            pymupdf.csRGB, pymupdf.IRect(0, 0, cols * size[0], lines * size[1]), 0)
+        atlas.clear_with(255)
+        for card in sheet_cards:
+            pix = images[card['card']]
+            if pix.alpha or pix.n != 3:
+                pix = pymupdf.Pixmap(pymupdf.csRGB, pix, 0)
+            pix.set_origin(card['x'], card['y'])
+            atlas.copy(pix, pix.irect)
+        name = f'{basename}-atlas-{sheet}.png'
+        atlas.save(os.path.join(directory, name))
+        sheets.append({'sheet': sheet, 'file': name, 'cards': len(sheet_cards),
+                       'width': atlas.width, 'height': atlas.height})
+    manifest = {
+        'source': basename,
+        'size': list(size),
+        'grid': [cols, rows_per],
+        'sheets': sheets,
+        'cards': cards,
+        'rendered': [job[0] for job in jobs]}
+    with open(manifest_name, 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    feedback(
+        f'Saved {len(cards)} card(s) in {len(sheets)} atlas sheet(s);'
+        f' {len(jobs)} card image(s) rendered.')
+    return manifest
+
+
+def pdf_sizes(document) -> dict:
+    """Return the size, in bytes, of a PDF's objects grouped by kind.
+
+    The kinds are 'images', 'fonts', 'content' (page drawing) and 'other'.
+    """
+    sizes = {'images': 0, 'fonts': 0, 'content': 0, 'other': 0}
+    contents = set()
+    for page in document:
+        contents.update(page.get_contents())
+    for xref in range(1, document.xref_length()):
+        try:
+            obj = document.xref_object(xref, compressed=True)
+            size = len(obj)
+            if document.xref_is_stream(xref):
+                size += len(document.xref_stream_raw(xref))
+        except Exception:
+            continue
+        if '/Subtype/Image' in obj.replace(' ', ''):
+            sizes['images'] += size
+        elif xref in contents:
+            sizes['content'] += size
+        elif document.xref_is_font(xref) or '/Length1' in obj or \
+                '/FontFile' in obj or '/Subtype/Type1C' in obj.replace(' ', ''):
+            sizes['fonts'] += size
+        else:
+            sizes['other'] += size
+    return sizes
+
+
+def image_placements(document) -> dict:
+    """Return the largest placed width and height, in points, of each image.
+
+    Returns:
+        dict of image xref: (width, height, first page the image is on)
+
+    Note:
+        An image that is not visible (e.g. drawn with a fill alpha of 0) is
+        not found by get_image_rects(); its bounding box, as set by the page's
+        drawing commands, is used instead.  An image with no known placement
+        is left out.
+    """
+    placements = {}
+    for page in document:
+        for item in page.get_images(full=True):
+            xref = item[0]
+            width, height, first = placements.get(xref, (0, 0, page))
+            rects = page.get_image_rects(xref)
+            if not rects:
+                try:
+                    rects = [page.get_image_bbox(item)]
+                except (RuntimeError, ValueError):
+                    rects = []
+            for rect in rects:
+                if rect.is_valid and not rect.is_infinite:
+                    width, height = max(width, rect.width), max(height, rect.height)
+            placements[xref] = (width, height, first)
+    return {xref: placement for xref, placement in placements.items()
+            if placement[0] > 0 and placement[1] > 0}
+
+
+def resample_image(
+        document, xref: int, width: float, height: float, dpi: int,
+        quality: int = 80, lossy: bool = False) -> bytes:
+    """Return a new image, for one placed at width by height points, if
+    resampling and recompressing it would make it smaller; else None.
+
+    Note:
+        Each image is processed once, no matter how often it is used, so
+        that the same image is never resampled more than once.
+    """
+    try:
+        smask = document.xref_get_key(xref, 'SMask')
+        original = len(document.xref_stream_raw(xref))
+        if smask[0] == 'xref':
+            smask = int(smask[1].split()[0])
+            original += len(document.xref_stream_raw(smask))
+        else:
+            smask = None
+        jpeg = 'DCTDecode' in document.xref_get_key(xref, 'Filter')[1]
+        pix = pymupdf.Pixmap(document, xref)
+        if pix.colorspace is None:
+            return None  # stencil mask
+        if pix.colorspace.n > 3:
+            pix = pymupdf.Pixmap(pymupdf.csRGB, pix)
+        if smask:
+            pix = pymupdf.Pixmap(pix, pymupdf.Pixmap(document, smask))
+        # ---- downsample
+        threshold = 1.2  # avoid resampling images that are only just over
+        cols = max(MIN_IMAGE_PIXELS, math.ceil(width * dpi / 72.0))
+        rows = max(MIN_IMAGE_PIXELS, math.ceil(height * dpi / 72.0))
+        if pix.width > cols * threshold and pix.height > rows * threshold:
+            pix = pymupdf.Pixmap(pix, cols, rows, None)
+        # ---- recompress
+        if (jpeg or lossy) and not pix.alpha:
+            image = pix.tobytes('jpeg', jpg_quality=quality)
+        else:
+            image = pix.tobytes('png')
+    except (RuntimeError, ValueError) as err:
+        feedback(f'Unable to optimize image {xref} - {err}', False, True)
+        return None
+    return image if len(image) < original else None
+
+
+def optimize_pdf(
+        filename: str,
+        dpi: int = 150,
+        quality: int = 80,
+        lossy: bool = False,
+        fonts: bool = True) -> dict:
+    """Reduce the size of a PDF file, in place; and report on the change.
+
+    Args:
+        dpi: images that print at more than this resolution, given their
+            placed size on the page, are downsampled to it
+        quality: quality (1 to 100) of any JPEG-compressed image
+        lossy: if True, allow images that use lossless compression (e.g. PNG
+            line art) to become JPEG, if smaller; otherwise they stay lossless
+        fonts: if True, embedded fonts keep only the characters used
+
+    Returns:
+        dict of 'before' and 'after' sizes; each a dict as per pdf_sizes()
+
+    Note:
+        * an image is only replaced if the result is smaller
+        * an image used many times is resampled for its largest placement
+        * identical objects are stored once
+    """
+    feedback(f'Optimizing "{filename}"...', False)
+    document = pymupdf.open(filename)
+    before = pdf_sizes(document)
+    before['file'] = os.path.getsize(filename)
+    # ---- images
+    for xref, (width, height, page) in image_placements(document).items():
+        image = resample_image(document, xref, width, height, dpi, quality, lossy)
+        if image:
+            page.replace_image(xref, stream=image)
+    # ---- fonts
+    if fonts:
+        try:
+            document.subset_fonts()
+        except Exception as err:
+            feedback(f'Unable to subset fonts - {err}', False, True)
+    # ---- save, with duplicates removed
+    temporary = f'{filename}.tmp'
+    document.save(temporary, garbage=4, deflate=True, deflate_images=True,
+                  deflate_fonts=True, use_objstms=1)
+    document.close()
+    os.replace(temporary, filename)
+    with pymupdf.open(filename) as document:
+        after = pdf_sizes(document)
+    after['file'] = os.path.getsize(filename)
+    # ---- report
+    for kind in ['images', 'fonts', 'content', 'other', 'file']:
+        feedback(f'{kind:>8}: {before[kind] / 1024:10.1f} KB -> {after[kind] / 1024:10.1f} KB')
+    return {'before': before, 'after': after}
+
+
+def tile_layout(width: float, height: float, area: tuple, overlap: float) -> tuple:
+    """Return the (columns, rows) of tiles, each with a printable area, needed
+    to cover a page of width by height; tiles overlap by `overlap`.
+
+    Doc Test:
+    >>> tile_layout(1000, 500, (400, 300), 50)
+    (3, 2)
+    >>> tile_layout(400, 300, (400, 300), 50)
+    (1, 1)
+    """
+    step_x, step_y = area[0] - overlap, area[1] - overlap
+    if step_x <= 0 or step_y <= 0:
+        feedback(f'The tile overlap of {overlap} is too large for the tile size.', True)
+    cols = max(1, math.ceil((width - overlap) / step_x - 1e-9))
+    rows = max(1, math.ceil((height - overlap) / step_y - 1e-9))
+    return cols, rows
+
+
+def tile_label(row: int, col: int) -> str:
+    """Return the assembly label of a tile e.g. B3.
+
+    Doc Test:
+    >>> tile_label(1, 2)
+    'B3'
+    """
+    return f'{excel_column(row + 1)}{col + 1}'
+
+
+def save_tiles(
+        filename: str,
+        paper: tuple,
+        margin: float = 36.0,
+        overlap: float = 18.0,
+        marks: bool = True,
+        labels: bool = True,
+        document=None) -> str:
+    """Split each page of a PDF into overlapping tiles, each on a page of `paper` size.
+
+    Args:
+        paper: (width, height) of a tile page, in points; the orientation
+            that needs the fewest tiles is used
+        margin: blank border, in points, around the printed area of a tile
+        overlap: distance, in points, by which neighbouring tiles overlap
+        marks: draw registration (crop) marks at the corners of each tile, and
+            lines showing the overlap
+        labels: write an assembly label, such as "B3", on each tile
+
+    Returns:
+        name of the new PDF file - the PDF filename, with a "-tiles" suffix
+
+    Note:
+        * each page is added to the new PDF only once (as a form XObject);
+          every tile then shows a clipped part of it
+    """
+    feedback(f'Saving page(s) from "{filename}" as tiles...', False)
+    source = document or pymupdf.open(filename)
+    tiles = pymupdf.open()
+    name = f'{os.path.splitext(filename)[0]}-tiles.pdf'
+    for page in source:
+        width, height = page.rect.width, page.rect.height
+        # ---- orientation with fewest tiles
+        options = []
+        for tile_w, tile_h in [paper, (paper[1], paper[0])]:
+            area = (tile_w - 2.0 * margin, tile_h - 2.0 * margin)
+            if area[0] <= 0 or area[1] <= 0:
+                feedback(f'The tile margin of {margin} is too large for the tile size.',
+                         True)
+            cols, rows = tile_layout(width, height, area, overlap)
+            options.append((cols * rows, (tile_w, tile_h), area, cols, rows))
+        _, (tile_w, tile_h), area, cols, rows = min(options, key=lambda item: item[0])
+        for row in range(rows):
+            for col in range(cols):
+                x0 = col * (area[0] - overlap)
+                y0 = row * (area[1] - overlap)
+                clip = pymupdf.Rect(x0, y0, x0 + area[0], y0 + area[1]) & page.rect
+                tile = tiles.new_page(width=tile_w, height=tile_h)
+                rect = pymupdf.Rect(
+                    margin, margin, margin + clip.width, margin + clip.height)
+                tile.show_pdf_page(rect, source, page.number, clip=clip)  # shared XObject
+                if marks:
+                    mark = min(margin * 0.75, 18.0)
+                    for x, y in [rect.tl, rect.tr, rect.bl, rect.br]:
+                        dx = -1 if x == rect.x0 else 1
+                        dy = -1 if y == rect.y0 else 1
+                        tile.draw_line((x + dx * 3, y), (x + dx * mark, y), width=0.5)
+                        tile.draw_line((x, y + dy * 3), (x, y + dy * mark), width=0.5)
+                    if col > 0:  # overlap with the tile on the left
+                        tile.draw_line(
+                            (rect.x0 + overlap, rect.y0), (rect.x0 + overlap, rect.y1),
+                            color=(0.6, 0.6, 0.6), width=0.3, dashes='[3 3] 0')
+                    if row > 0:  # overlap with the tile above
+                        tile.draw_line(
+                            (rect.x0, rect.y0 + overlap), (rect.x1, rect.y0 + overlap),
+                            color=(0.6, 0.6, 0.6), width=0.3, dashes='[3 3] 0')
+                if labels:
+                    label = tile_label(row, col)
+                    text = (f'{label}  (row {row + 1} of {rows}, column {col + 1} of'
+                            f' {cols}; page {page.number + 1})')
+                    tile.insert_text(
+                        (margin, tile_h - margin / 2.0 + 3), text, fontsize=8,
+                        color=(0.4, 0.4, 0.4))
+    tiles.save(name, garbage=3, deflate=True)
+    feedback(f'Saved {tiles.page_count} tile(s) in "{name}"', False)
+    return name
+
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
@@ -3,25 +3,28 @@
 General purpose utility functions for protograf
 """
 # lib
+import ast
 from collections import namedtuple
 import cmath
 import csv
 import collections
 from enum import Enum
+from functools import lru_cache
 from itertools import zip_longest
 import jinja2
 import logging
 import math
 import os
 import pathlib
+import re
 import string
 import sys
 from urllib.parse import urlparse
+import xml.etree.ElementTree as ET
+import zipfile
 import xlrd
-# third party
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 # local
+from protograf.utils import sheets
 from protograf.utils.support import numbers, feedback
 
 log = logging.getLogger(__name__)
@@ -66,27 +69,29 @@ def script_path():
 
 def load_data(datasource=None, **kwargs):
     """
-    Load data from a 'tabular' source (CSV, XLS) into a dict
+    Load data from a 'tabular' source (CSV, XLS, XLSX, ODS) into a dict
     """
     dataset = {}
-    log.debug("Load data from a 'tabular' source (CSV, XLS) %s", datasource)
+    log.debug("Load data from a 'tabular' source (CSV, XLS, XLSX, ODS) %s", datasource)
     if datasource:
         filename, file_ext = os.path.splitext(datasource)
         if file_ext.lower() == ".csv":
             headers = kwargs.get("headers", None)
             selected = kwargs.get("selected", None)
             dataset = open_csv(datasource, headers=headers, selected=selected)
-        elif file_ext.lower() == ".xls":
+        elif file_ext.lower() in [".xls", ".xlsx", ".xlsm", ".ods"]:
             headers = kwargs.get("headers", None)
             selected = kwargs.get("selected", None)
             sheet = kwargs.get("sheet", 0)
             sheetname = kwargs.get("sheetname", None)
+            cells = kwargs.get("cells", None)
             dataset = open_xls(
                 datasource,
                 sheet=sheet,
                 sheetname=sheetname,
                 headers=headers,
                 selected=selected,
+                cells=cells,
             )
         else:
             feedback('Unable to process a file %s of type "%s"' % (filename, file_ext))
@@ -200,6 +205,21 @@ def as_bool(value, label=None, allow_none=True) -> bool:
     return result
 
 
+def as_truth(value) -> bool:
+    """Convert the outcome of a test - a boolean or text - to a boolean
+
+    Doc Test:
+
+    >>> as_truth(False)
+    False
+    >>> as_truth('True')
+    True
+    """
+    if isinstance(value, bool):
+        return value
+    return as_bool(value, allow_none=False)
+
+
 def as_float(value, label, maximum=None, minimum=None, stop=True, default=None) -> int:
     """Set a value to an float; or end program if an invalid value and stop is True
 
@@ -511,8 +531,9 @@ def open_csv(filename, headers=None, selected=None):
     return dict_list
 
 
-def open_xls(filename, sheet=0, sheetname=None, headers=None, selected=None):
-    """Read data from XLS file into a list of dictionaries
+def open_xls(filename, sheet=0, sheetname=None, headers=None, selected=None,
+             cells=None):
+    """Read data from an Excel (XLS or XLSX) or ODS file into a list of dictionaries
 
     Supply:
 
@@ -520,15 +541,8 @@ def open_xls(filename, sheet=0, sheetname=None, headers=None, selected=None):
       * sheetname to select a sheet by name (otherwise first is used)
       * headers is a list of strings to use instead of the first row
       * selected is a list of desired rows e.g. [2,4,7]
+      * cells is a range of cells to use e.g. 'B2:F200' (otherwise all are used)
     """
-    def cleaned(value):
-        if isinstance(value, float):
-            if float(value) == float(int(value)):
-                return int(value)
-        # if isinstance(value, str):
-        #     return value.encode('utf8')
-        return value
-
     if not filename:
         feedback("A valid Excel filename must be supplied!")
 
@@ -544,42 +558,21 @@ def open_xls(filename, sheet=0, sheetname=None, headers=None, selected=None):
 
     try:
         excel_filename = _file_with_path or norm_filename
-        book = xlrd.open_workbook(excel_filename)
         if sheet:
-            sheet = sheet - 1
-            sheet = book.sheet_by_index(sheet)
+            _sheet = sheet - 1
         elif sheetname:
-            sheet = book.sheet_by_name(sheetname)
-        else:
-            sheet = book.sheet_by_index(0)
-        start = 1
-        if not headers:
-            keys = [sheet.cell(0, col_index).value for col_index in range(sheet.ncols)]
-        else:
-            start = 0
-            keys = headers
-        if len(keys) < sheet.ncols:
-            feedback(
-                'Too few headers supplied for the existing columns in "%s"' % filename
-            )
+            _sheet = sheetname
         else:
-            dict_list = []
-            for row_index in range(start, sheet.nrows):
-                item = {
-                    keys[col_index]: cleaned(sheet.cell(row_index, col_index).value)
-                    for col_index in range(sheet.ncols)
-                }
-                if not selected:
-                    dict_list.append(item)
-                else:
-                    if row_index + 1 in selected:
-                        dict_list.append(item)
+            _sheet = 0
+        dict_list = sheets.read_sheet(
+            excel_filename, sheet=_sheet, cells=cells, headers=headers,
+            selected=selected)
     except IOError:
         feedback('Unable to find or open Excel "%s"' % excel_filename)
-    except IndexError:
-        feedback('Unable to open sheet "%s"' % (sheet or sheetname))
-    except xlrd.biffh.XLRDError:
-        feedback('Unable to open sheet "%s"' % sheetname)
+    except (zipfile.BadZipFile, ET.ParseError, xlrd.biffh.XLRDError) as err:
+        feedback(f'Unable to read "{excel_filename}" ({err})')
+    except sheets.SheetError as err:
+        feedback(f'{err} in "{filename}"')
     return dict_list
 
 
@@ -786,26 +779,16 @@ def sheet_column(num: int, lower: bool = False) -> string:
     return converter(num, lower)
 
 
-def base_fonts():
-    """On Ubuntu: sudo apt-get install ttf-mscorefonts-installer"""
-    fonts = [
-        {'name': 'Ubuntu', 'file': 'Ubuntu-R.ttf'},
-        {'name': 'Arial', 'file': 'Arial.ttf'},
-        {'name': 'Verdana', 'file': 'Verdana.ttf'},
-        {'name': 'Courier New', 'file': 'Courier_New.ttf'},
-        {'name': 'Times New Roman', 'file': 'Times_New_Roman.ttf'},
-        {'name': 'Trebuchet_MS', 'file': 'Trebuchet_MS.ttf'},
-        {'name': 'Georgia', 'file': 'Georgia.ttf'},
-        {'name': 'Webdings', 'file': 'Webdings.ttf'},
-        #{'name': '', 'file': '.ttf'},
-    ]
-    for _font in fonts:
-        try:
-            pdfmetrics.registerFont(TTFont(_font['name'], _font['file']))
-        except Exception as err:
-            pass
-            #log.error('Unable to register %s from %s (%s)',
-            #    _font['name'], _font['file'], err)
+@lru_cache(maxsize=1024)
+def compile_template(string: str) -> jinja2.Template:
+    """Compile - once - a jinja2 template from a string.
+
+    Doc Test:
+    >>> compile_template("{{x}}") is compile_template("{{x}}")
+    True
+    """
+    environment = jinja2.Environment()
+    return environment.from_string(string)
 
 
 def eval_template(string: str, data: dict = None, label: str = ''):
@@ -827,8 +810,7 @@ def eval_template(string: str, data: dict = None, label: str = ''):
     if not isinstance(data, dict):
         feedback('The data must be in the form of a dictionary', True)
     try:
-        environment = jinja2.Environment()
-        template = environment.from_string(str(string))
+        template = compile_template(str(string))
         custom_value = template.render(data)
         return custom_value
     except jinja2.exceptions.TemplateSyntaxError:
@@ -840,6 +822,122 @@ def eval_template(string: str, data: dict = None, label: str = ''):
             f'Unable to process "{string}" data with this template', True)
 
 
+# node types allowed in a compiled (Python) expression
+EXPRESSION_NODES = (
+    ast.Expression, ast.Load, ast.Name, ast.Constant, ast.Tuple, ast.List,
+    ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.In, ast.NotIn, ast.IfExp,
+)
+
+
+# jinja2 literals; these are never names in the data row
+EXPRESSION_CONSTANTS = {'true': True, 'false': False, 'none': None}
+
+
+class ExpressionConstants(ast.NodeTransformer):
+    """Replace names of jinja2 literals (e.g. true) with their values."""
+
+    def visit_Name(self, node):
+        if node.id in EXPRESSION_CONSTANTS:
+            return ast.copy_location(ast.Constant(EXPRESSION_CONSTANTS[node.id]), node)
+        return node
+
+
+class ExpressionRow(dict):
+    """Data row used as the names for an expression; missing names are None."""
+
+    def __missing__(self, key):
+        return None
+
+
+@lru_cache(maxsize=256)
+def compile_expression(string: str):
+    """Compile - once - an expression into a function of a row (dict) of data.
+
+    The expression can be wrapped in {{ }}, as per a template.  A "simple"
+    expression - names, numbers, strings, arithmetic, comparisons, and/or/not
+    - becomes Python code; any other (e.g. with filters) is evaluated by
+    jinja2; and anything else is rendered as a template.
+
+    Doc Test:
+    >>> compile_expression("{{ Race == 'Hobbit' and Age < 50 }}")({'Race': 'Hobbit', 'Age': 33})
+    True
+    >>> compile_expression("Count * 2")({'Count': 3})
+    6
+    >>> compile_expression("{{ Race | lower == 'elf' }}")({'Race': 'ELF'})
+    True
+    >>> compile_expression("{{ Race }} card")({'Race': 'Elf'})
+    'Elf card'
+    >>> compile_expression("{{ X == true and Y != none }}")({'X': True, 'Y': 0})
+    True
+    >>> compile_expression("{{ 2 ** 3 ** 2 }}")({})  # jinja2: ** is left-to-right
+    64
+    """
+    source = str(string).strip()
+    match = re.fullmatch(r'\{\{(.*)\}\}', source, re.DOTALL)
+    expression = match.group(1).strip() if match else source
+    if match and ('{{' in expression or '}}' in expression):
+        expression = None  # more than one {{ }} in source
+    # ---- Python expression
+    try:
+        tree = ast.parse(expression, mode='eval') if expression else None
+    except SyntaxError:
+        tree = None
+    if tree and all(isinstance(node, EXPRESSION_NODES) for node in ast.walk(tree)):
+        tree = ast.fix_missing_locations(ExpressionConstants().visit(tree))
+        code = compile(tree, '<expression>', 'eval')
+        return lambda row: eval(code, {'__builtins__': {}}, ExpressionRow(row))
+    # ---- jinja2 expression
+    if match and expression:
+        try:
+            jinja_expression = jinja2.Environment().compile_expression(expression)
+            return lambda row: jinja_expression(**row)
+        except jinja2.exceptions.TemplateSyntaxError:
+            pass
+    # ---- jinja2 template
+    try:
+        template = compile_template(source)
+    except jinja2.exceptions.TemplateSyntaxError:
+        feedback(f'Unable to use "{string}" - please check its grammar', True)
+    return template.render
+
+
+def evaluate_rows(expression, rows: list, label: str = '', convert=None) -> list:
+    """Evaluate an expression for every row (dict) of data, in a single pass.
+
+    Args:
+        expression: string (see compile_expression) or function of a row
+        convert: function applied to each result; it should raise an Exception
+            (e.g. ValueError) for an invalid result
+
+    Returns:
+        list of results; one per row
+
+    Doc Test:
+    >>> evaluate_rows("{{ n > 1 }}", [{'n': 1}, {'n': 2}], 'mask')
+    [False, True]
+    """
+    func = expression if callable(expression) else compile_expression(expression)
+    results, failed = [], []
+    for number, row in enumerate(rows, start=1):
+        try:
+            result = func(row)
+            results.append(convert(result) if convert else result)
+        except Exception as err:
+            failed.append((number, err))
+            results.append(None)
+    if failed:
+        row_numbers = ', '.join(str(number) for number, _ in failed[:20])
+        if len(failed) > 20:
+            row_numbers += f' (and {len(failed) - 20} more)'
+        feedback(
+            f'Unable to evaluate the {label or expression} for data row(s)'
+            f' {row_numbers} - {failed[0][1]}', True)
+    return results
+
+
 def validated_directions(
         value: list | str,
         direction_group: DirectionGroup,